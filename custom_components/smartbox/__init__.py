@@ -1,19 +1,71 @@
 """The Smartbox integration."""
 
-from dataclasses import dataclass
+import asyncio
+from collections.abc import Awaitable, Callable
+from contextlib import suppress
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from functools import partial
+from http import HTTPStatus
 import logging
+from pathlib import Path
+import time
 from typing import Any
 
-from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import CONF_PASSWORD, CONF_USERNAME, Platform
-from homeassistant.core import HomeAssistant
+from aiohttp import ClientResponseError
+from homeassistant.config_entries import ConfigEntry, ConfigEntryState
+from homeassistant.const import CONF_PASSWORD, CONF_TOKEN, CONF_USERNAME, Platform
+from homeassistant.core import CALLBACK_TYPE, HassJob, HomeAssistant, callback
 from homeassistant.exceptions import ConfigEntryAuthFailed, ConfigEntryNotReady
 from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
 from smartbox import AsyncSmartboxSession
 from smartbox.error import APIUnavailableError, InvalidAuthError, SmartboxError
 
-from .const import CONF_API_NAME
-from .models import SmartboxDevice, SmartboxNode, get_devices
+from .coalescing import CoalescedReads
+from .const import (
+    CONF_API_NAME,
+    CONF_CONNECTED_DEBOUNCE,
+    CONF_DISPLAY_ENTITY_PICTURES,
+    CONF_HISTORY_CONSUMPTION,
+    CONF_MAX_CONCURRENT_DEVICES,
+    CONF_READ_CACHE_TTL,
+    CONF_RECORD_TRAFFIC,
+    CONF_STALE_AFTER,
+    CONF_STATE_WRITE_WINDOW,
+    CONF_TIMEDELTA_POWER,
+    DEFAULT_CONNECTED_DEBOUNCE,
+    DEFAULT_MAX_CONCURRENT_DEVICES,
+    DEFAULT_READ_CACHE_TTL,
+    DEFAULT_STALE_AFTER,
+    DEVICE_RETRY_MAX_DELAY,
+    DEVICE_RETRY_MIN_DELAY,
+    DOMAIN,
+    JOURNAL_FILENAME,
+    SESSION_TOKEN_MIN_VALIDITY,
+    SMARTBOX_NEW_DEVICE,
+    SMARTBOX_OPTIONS_UPDATED,
+    SMARTBOX_SESSIONS,
+    SNAPSHOT_STORAGE_KEY,
+    SNAPSHOT_STORAGE_VERSION,
+    TOKEN_REFRESH_RETRY_DELAY,
+    HistoryConsumptionStatus,
+)
+from .models import (
+    Device,
+    SmartboxDevice,
+    SmartboxNode,
+    SmartboxUpdateHub,
+    devices_from_snapshot,
+    devices_snapshot,
+    get_session_devices,
+    initialise_devices,
+    reconcile_devices,
+    record_duration,
+)
 
 __version__ = "2.1.2"
 
@@ -27,6 +79,22 @@ PLATFORMS: list[Platform] = [
     Platform.SWITCH,
 ]
 
+# Options applied in place by the entities, without reloading the entry.
+# The concurrency only applies to the next initialisation of the devices.
+HOT_APPLIED_OPTIONS = frozenset(
+    {
+        CONF_CONNECTED_DEBOUNCE,
+        CONF_DISPLAY_ENTITY_PICTURES,
+        CONF_HISTORY_CONSUMPTION,
+        CONF_MAX_CONCURRENT_DEVICES,
+        CONF_READ_CACHE_TTL,
+        CONF_RECORD_TRAFFIC,
+        CONF_STALE_AFTER,
+        CONF_STATE_WRITE_WINDOW,
+        CONF_TIMEDELTA_POWER,
+    }
+)
+
 type SmartboxConfigEntry = ConfigEntry[SmartboxData]
 
 
@@ -37,6 +105,35 @@ class SmartboxData:
     client: AsyncSmartboxSession
     devices: list[SmartboxDevice]
     nodes: list[SmartboxNode]
+    # Socket updates of the session, routed to the devices
+    hub: SmartboxUpdateHub
+    # Identical reads of the session, sharing one request
+    reads: CoalescedReads = field(default_factory=CoalescedReads)
+    store: Store[dict[str, Any]] | None = field(default=None)
+    options: dict[str, Any] = field(default_factory=dict)
+    initialise_task: asyncio.Task[None] | None = field(default=None)
+    cancel_token_refresh: CALLBACK_TYPE | None = field(default=None)
+    # Whether the session uses the persisted token, until a request succeeds
+    token_restored: bool = field(default=False)
+    # Monotonic durations of the startup phases of the entry, in seconds
+    timings: dict[str, float] = field(default_factory=dict)
+    # Whether the history of the nodes is imported in this run, as asked by
+    # the options, and the nodes whose history was imported. The options are
+    # set back to auto by the first import, the other nodes import it anyway.
+    history_import: bool = field(default=False)
+    history_imported: set[str] = field(default_factory=set)
+    # State writes of the entities, and the updates coalesced into them
+    state_writes: dict[str, int] = field(
+        default_factory=lambda: {"written": 0, "coalesced": 0}
+    )
+
+    def startup_timings(self) -> dict[str, Any]:
+        """Return the startup timings of the entry, its devices and nodes."""
+        return {
+            "entry": self.timings,
+            "devices": {device.dev_id: device.timings for device in self.devices},
+            "nodes": {node.node_id: node.timings for node in self.nodes},
+        }
 
 
 async def create_smartbox_session_from_entry(
@@ -57,8 +154,13 @@ async def create_smartbox_session_from_entry(
             password=data[CONF_PASSWORD],
             websession=websession,
         )
-        await session.health_check()
-        await session.check_refresh_auth()
+        if (token := data.get(CONF_TOKEN)) is not None:
+            # Restored tokens skip the login, the token is refreshed if needed
+            _restore_token(session, token)
+            await _async_check_refresh_auth(session)
+        else:
+            await session.health_check()
+            await session.check_refresh_auth()
     except APIUnavailableError as ex:
         raise APIUnavailableError(ex) from ex
     except InvalidAuthError as ex:
@@ -69,40 +171,464 @@ async def create_smartbox_session_from_entry(
         return session
 
 
+def _restore_token(session: AsyncSmartboxSession, token: dict[str, str]) -> None:
+    """Restore a persisted token into a new session."""
+    # The smartbox session has no public API to set its token, these private
+    # attributes are the ones of smartbox 2.3, as pinned in manifest.json
+    session._access_token = token["access_token"]  # noqa: SLF001
+    session._refresh_token = token["refresh_token"]  # noqa: SLF001
+    session._expires_at = dt_util.parse_datetime(token["expires_at"])  # noqa: SLF001
+    session._headers["Authorization"] = f"Bearer {token['access_token']}"  # noqa: SLF001
+
+
+def _session_token(session: AsyncSmartboxSession) -> dict[str, str]:
+    """Return the token of a session, to be persisted."""
+    return {
+        "access_token": session.access_token,
+        "refresh_token": session.refresh_token,
+        "expires_at": session.expiry_time.isoformat(),
+    }
+
+
+async def _async_check_refresh_auth(
+    session: AsyncSmartboxSession, force: bool = False
+) -> None:
+    """Refresh the token of a session, logging in again if it is rejected."""
+    # The private calls and attributes are the ones of smartbox 2.3, as pinned
+    # in manifest.json, it has no public API to force a refresh
+    try:
+        if force:
+            await session._authentication(  # noqa: SLF001
+                {
+                    "grant_type": "refresh_token",
+                    "refresh_token": session.refresh_token,
+                }
+            )
+        else:
+            await session.check_refresh_auth()
+    except InvalidAuthError:
+        _LOGGER.debug("Refresh token rejected, logging in again")
+        session._access_token = ""  # noqa: SLF001
+        await session.check_refresh_auth()
+
+
+def _is_rejected_token(ex: SmartboxError) -> bool:
+    """Return whether a request failed as its token was rejected."""
+    # smartbox 2.3, as pinned in manifest.json, wraps the response error
+    cause = ex.__cause__
+    return isinstance(cause, ClientResponseError) and (
+        cause.status == HTTPStatus.UNAUTHORIZED
+    )
+
+
+async def _async_first_request[T](
+    hass: HomeAssistant,
+    entry: SmartboxConfigEntry,
+    request: Callable[[], Awaitable[T]],
+) -> T:
+    """Make the first request of a setup, logging in again if needed.
+
+    A persisted token may be revoked before its expiry, e.g. by a change of
+    the password. It is then dropped and the session logs in again.
+    """
+    runtime_data = entry.runtime_data
+    try:
+        return await request()
+    except SmartboxError as ex:
+        if not (runtime_data.token_restored and _is_rejected_token(ex)):
+            raise
+    finally:
+        runtime_data.token_restored = False
+    _LOGGER.info("Persisted token rejected, logging in again")
+    hass.config_entries.async_update_entry(
+        entry,
+        data={key: value for key, value in entry.data.items() if key != CONF_TOKEN},
+    )
+    # The private attribute is the one of smartbox 2.3, as pinned in
+    # manifest.json, an empty token makes the session log in
+    runtime_data.client._access_token = ""  # noqa: SLF001
+    await runtime_data.client.check_refresh_auth()
+    _async_save_token(hass, entry)
+    return await request()
+
+
+@callback
+def _async_save_token(hass: HomeAssistant, entry: SmartboxConfigEntry) -> None:
+    """Persist the token of the session of an entry, if it changed."""
+    token = _session_token(entry.runtime_data.client)
+    if entry.data.get(CONF_TOKEN) != token:
+        hass.config_entries.async_update_entry(
+            entry, data={**entry.data, CONF_TOKEN: token}
+        )
+
+
+@callback
+def _async_schedule_token_refresh(
+    hass: HomeAssistant, entry: SmartboxConfigEntry
+) -> None:
+    """Schedule the refresh of the token ahead of its expiry."""
+    remaining = entry.runtime_data.client.expiry_time - dt_util.utcnow()
+    delay = max(
+        remaining.total_seconds() - SESSION_TOKEN_MIN_VALIDITY,
+        TOKEN_REFRESH_RETRY_DELAY,
+    )
+    entry.runtime_data.cancel_token_refresh = async_call_later(
+        hass,
+        delay,
+        HassJob(
+            partial(_async_refresh_token, hass, entry),
+            f"{DOMAIN}_refresh_token",
+            cancel_on_shutdown=True,
+        ),
+    )
+
+
+async def _async_refresh_token(
+    hass: HomeAssistant, entry: SmartboxConfigEntry, _: datetime
+) -> None:
+    """Refresh the token, so that requests never wait for it."""
+    try:
+        await _async_check_refresh_auth(entry.runtime_data.client, force=True)
+    except InvalidAuthError:
+        entry.async_start_reauth(hass)
+        return
+    except (SmartboxError, APIUnavailableError) as ex:
+        _LOGGER.warning("Unable to refresh the token: %s", ex)
+    else:
+        _async_save_token(hass, entry)
+    _async_schedule_token_refresh(hass, entry)
+
+
+async def async_get_smartbox_session(
+    hass: HomeAssistant, entry: SmartboxConfigEntry
+) -> AsyncSmartboxSession:
+    """Return the session handed over for an entry, or create a new one.
+
+    A session validated by the config flow, or kept from the previous setup of
+    the entry, is reused while its token is valid, without any round-trip.
+    """
+    sessions: dict[str, AsyncSmartboxSession] = hass.data.get(SMARTBOX_SESSIONS, {})
+    session = sessions.pop(entry.unique_id, None) if entry.unique_id else None
+    if session is not None and _has_valid_token(session):
+        _LOGGER.debug("Reusing the authenticated session")
+        return session
+    return await create_smartbox_session_from_entry(hass, entry)
+
+
+def _has_valid_token(session: AsyncSmartboxSession) -> bool:
+    """Return whether the session holds a token which is not about to expire."""
+    return bool(session.access_token) and session.expiry_time > dt_util.utcnow() + (
+        timedelta(seconds=SESSION_TOKEN_MIN_VALIDITY)
+    )
+
+
+@callback
+def async_hand_over_session(
+    hass: HomeAssistant, unique_id: str | None, session: AsyncSmartboxSession
+) -> None:
+    """Hand an authenticated session over to the next setup of an entry."""
+    if unique_id:
+        hass.data.setdefault(SMARTBOX_SESSIONS, {})[unique_id] = session
+
+
 async def async_setup_entry(hass: HomeAssistant, entry: SmartboxConfigEntry) -> bool:
     """Set up Smartbox from a config entry."""
+    started = time.monotonic()
+    timings: dict[str, float] = {}
     try:
-        entry.runtime_data = SmartboxData(
-            client=(await create_smartbox_session_from_entry(hass, entry)),
-            devices=[],
-            nodes=[],
-        )
+        with record_duration(timings, "session"):
+            session = await async_get_smartbox_session(hass, entry)
     except InvalidAuthError as ex:
         raise ConfigEntryAuthFailed from ex
     except (SmartboxError, APIUnavailableError) as ex:
         raise ConfigEntryNotReady from ex
+    max_concurrency = entry.options.get(
+        CONF_MAX_CONCURRENT_DEVICES, DEFAULT_MAX_CONCURRENT_DEVICES
+    )
+    entry.runtime_data = SmartboxData(
+        client=session,
+        devices=[],
+        nodes=[],
+        hub=SmartboxUpdateHub(session, hass, max_concurrency),
+        timings=timings,
+        token_restored=entry.data.get(CONF_TOKEN) == _session_token(session),
+    )
 
-    devices = await get_devices(session=entry.runtime_data.client, hass=hass)
-    for device in devices:
-        _LOGGER.info("Setting up configured device %s", device.dev_id)
-        entry.runtime_data.devices.append(device)
-    for device in entry.runtime_data.devices:
-        nodes = device.get_nodes()
-        _LOGGER.debug("Configuring nodes for device %s %s", device.dev_id, nodes)
-        entry.runtime_data.nodes.extend(nodes)
-    await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    entry.runtime_data.options = dict(entry.options)
+    entry.runtime_data.history_import = (
+        entry.options.get(CONF_HISTORY_CONSUMPTION, HistoryConsumptionStatus.START)
+        == HistoryConsumptionStatus.START
+    )
+    entry.runtime_data.hub.stale_after = entry.options.get(
+        CONF_STALE_AFTER, DEFAULT_STALE_AFTER
+    )
+    entry.runtime_data.reads.ttl = entry.options.get(
+        CONF_READ_CACHE_TTL, DEFAULT_READ_CACHE_TTL
+    )
+    entry.runtime_data.reads.attach(session, hass)
+    await _async_update_journal(hass, entry)
+    # The unload is not called after a failed setup, these callbacks are
+    entry.async_on_unload(entry.runtime_data.hub.async_stop_journal)
+    _async_save_token(hass, entry)
+    entry.runtime_data.store = _get_snapshot_store(hass, entry)
+    if (snapshot := await entry.runtime_data.store.async_load()) is not None:
+        # Warm start: entities are built from the last known state and the
+        # live API is reconciled in the background.
+        _LOGGER.debug("Restoring devices from snapshot")
+        with record_duration(timings, "snapshot"):
+            for device in devices_from_snapshot(
+                snapshot, session=entry.runtime_data.client, hass=hass
+            ):
+                _async_add_device(hass, entry, device)
+        entry.async_create_background_task(
+            hass,
+            _async_reconcile_snapshot(
+                hass, entry, snapshot.get("pending", []), max_concurrency, started
+            ),
+            f"{DOMAIN}_reconcile_snapshot",
+        )
+        with record_duration(timings, "platforms"):
+            await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+        _log_startup_timings(entry, started)
+    else:
+        try:
+            with record_duration(timings, "get_homes"):
+                session_devices = await _async_first_request(
+                    hass,
+                    entry,
+                    partial(get_session_devices, entry.runtime_data.client),
+                )
+        except InvalidAuthError as ex:
+            raise ConfigEntryAuthFailed from ex
+        except (SmartboxError, APIUnavailableError) as ex:
+            raise ConfigEntryNotReady from ex
+        # Platforms are forwarded first, each device then publishes its
+        # entities as soon as its own nodes are ready.
+        with record_duration(timings, "platforms"):
+            await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+        entry.runtime_data.initialise_task = entry.async_create_task(
+            hass,
+            _async_initialise_devices(
+                hass, entry, session_devices, max_concurrency, started
+            ),
+            f"{DOMAIN}_initialise_devices",
+        )
 
+    # Last, as the unload cancelling it is not called after a failed setup
+    _async_schedule_token_refresh(hass, entry)
     entry.async_on_unload(entry.add_update_listener(update_listener))
     return True
 
 
+@callback
+def _async_add_device(
+    hass: HomeAssistant, entry: SmartboxConfigEntry, device: SmartboxDevice
+) -> None:
+    """Add a ready device to the entry and publish it to the platforms."""
+    _LOGGER.info("Setting up configured device %s", device.dev_id)
+    entry.runtime_data.devices.append(device)
+    device.connected_debounce = entry.options.get(
+        CONF_CONNECTED_DEBOUNCE, DEFAULT_CONNECTED_DEBOUNCE
+    )
+    entry.runtime_data.hub.add_device(device)
+    nodes = device.get_nodes()
+    _LOGGER.debug("Configuring nodes for device %s %s", device.dev_id, nodes)
+    entry.runtime_data.nodes.extend(nodes)
+    async_dispatcher_send(
+        hass, f"{DOMAIN}_{entry.entry_id}_{SMARTBOX_NEW_DEVICE}", device
+    )
+
+
+async def _async_initialise_devices(
+    hass: HomeAssistant,
+    entry: SmartboxConfigEntry,
+    session_devices: list[Device],
+    max_concurrency: int,
+    started: float,
+) -> None:
+    """Initialise the devices, retrying the failed ones with a backoff.
+
+    The devices ready after the first pass are saved along with the failed
+    ones, so that a device failing for long does not prevent a warm start.
+    """
+    runtime_data = entry.runtime_data
+    delay = DEVICE_RETRY_MIN_DELAY
+    while True:
+        with record_duration(runtime_data.timings, "devices"):
+            failures = await initialise_devices(
+                session_devices,
+                runtime_data.client,
+                hass,
+                max_concurrency,
+                on_device=partial(_async_add_device, hass, entry),
+            )
+        if "startup" not in runtime_data.timings:
+            _log_startup_timings(entry, started)
+        if not failures:
+            break
+        if any(isinstance(error, InvalidAuthError) for _, error in failures):
+            entry.async_start_reauth(hass)
+            return
+        session_devices = [session_device for session_device, _ in failures]
+        if delay == DEVICE_RETRY_MIN_DELAY:
+            # after the first pass
+            await runtime_data.store.async_save(
+                devices_snapshot(runtime_data.devices, session_devices)
+            )
+        _LOGGER.info(
+            "Retrying to initialise %s device(s) in %s seconds",
+            len(session_devices),
+            delay,
+        )
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, DEVICE_RETRY_MAX_DELAY)
+    await runtime_data.store.async_save(devices_snapshot(runtime_data.devices))
+
+
+def _log_startup_timings(entry: SmartboxConfigEntry, started: float) -> None:
+    """Record the total startup time and log the timings of every phase."""
+    runtime_data = entry.runtime_data
+    runtime_data.timings["startup"] = round(time.monotonic() - started, 3)
+    if _LOGGER.isEnabledFor(logging.DEBUG):
+        timings = runtime_data.startup_timings()
+        _LOGGER.debug("Startup of entry %s: %s", entry.entry_id, timings["entry"])
+        for dev_id, device_timings in timings["devices"].items():
+            _LOGGER.debug("Startup of device %s: %s", dev_id, device_timings)
+        for node_id, node_timings in timings["nodes"].items():
+            _LOGGER.debug("Startup of node %s: %s", node_id, node_timings)
+
+
+def _get_snapshot_store(
+    hass: HomeAssistant, entry: SmartboxConfigEntry
+) -> Store[dict[str, Any]]:
+    """Return the store holding the snapshot of the devices of an entry."""
+    return Store(
+        hass, SNAPSHOT_STORAGE_VERSION, f"{SNAPSHOT_STORAGE_KEY}.{entry.entry_id}"
+    )
+
+
+async def _async_reconcile_snapshot(
+    hass: HomeAssistant,
+    entry: SmartboxConfigEntry,
+    pending: list[Device],
+    max_concurrency: int,
+    started: float,
+) -> None:
+    """Reconcile the devices restored from the snapshot with the live API.
+
+    The pending devices of the snapshot, not ready when it was saved, are
+    initialised once the restored ones are reconciled.
+    """
+    runtime_data = entry.runtime_data
+    try:
+        up_to_date = await _async_first_request(
+            hass,
+            entry,
+            partial(
+                reconcile_devices,
+                runtime_data.devices,
+                runtime_data.client,
+                max_concurrency,
+                pending,
+            ),
+        )
+    except InvalidAuthError:
+        entry.async_start_reauth(hass)
+        return
+    except (SmartboxError, APIUnavailableError) as ex:
+        _LOGGER.warning("Unable to reconcile devices with the API: %s", ex)
+        return
+    if not up_to_date:
+        _LOGGER.info("Devices or nodes changed since the snapshot, reloading")
+        await runtime_data.store.async_remove()
+        # the unload must not save the outdated devices again
+        runtime_data.store = None
+        hass.config_entries.async_schedule_reload(entry.entry_id)
+        return
+    if pending:
+        runtime_data.initialise_task = entry.async_create_task(
+            hass,
+            _async_initialise_devices(hass, entry, pending, max_concurrency, started),
+            f"{DOMAIN}_initialise_devices",
+        )
+        return
+    await runtime_data.store.async_save(devices_snapshot(runtime_data.devices))
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: SmartboxConfigEntry) -> bool:
     """Unload a config entry."""
-    for device in entry.runtime_data.devices:
-        await device.update_manager.cancel()
+    runtime_data = entry.runtime_data
+    if runtime_data.cancel_token_refresh is not None:
+        runtime_data.cancel_token_refresh()
+    if (task := runtime_data.initialise_task) is not None and not task.done():
+        # Some devices are not ready yet, a partial snapshot must not be saved
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    elif runtime_data.store is not None and runtime_data.devices:
+        await runtime_data.store.async_save(devices_snapshot(runtime_data.devices))
+    await runtime_data.hub.async_stop()
+    # after the journal, which records the coalesced reads
+    runtime_data.reads.detach()
+    if entry.unique_id:
+        # Kept for a reload, unless a new session was handed over already
+        hass.data.setdefault(SMARTBOX_SESSIONS, {}).setdefault(
+            entry.unique_id, runtime_data.client
+        )
     return await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
 
 
+async def async_remove_entry(hass: HomeAssistant, entry: SmartboxConfigEntry) -> None:
+    """Remove the snapshot and the session of a removed config entry."""
+    hass.data.get(SMARTBOX_SESSIONS, {}).pop(entry.unique_id, None)
+    await _get_snapshot_store(hass, entry).async_remove()
+
+
+def _changed_options(entry: SmartboxConfigEntry) -> set[str]:
+    """Return the options changed since they were last applied."""
+    applied = entry.runtime_data.options
+    return {
+        key
+        for key in entry.options.keys() | applied.keys()
+        if entry.options.get(key) != applied.get(key)
+    }
+
+
+async def _async_update_journal(
+    hass: HomeAssistant, entry: SmartboxConfigEntry
+) -> None:
+    """Start or stop recording the traffic of an entry, as in its options."""
+    hub = entry.runtime_data.hub
+    if entry.options.get(CONF_RECORD_TRAFFIC, False):
+        hub.start_journal(
+            Path(hass.config.path(JOURNAL_FILENAME.format(entry_id=entry.entry_id)))
+        )
+    else:
+        await hub.async_stop_journal()
+
+
 async def update_listener(hass: HomeAssistant, entry: SmartboxConfigEntry) -> None:
-    """Reload entity from config entry."""
+    """Apply the options in place, or reload the entry if they can't be."""
+    if entry.state is ConfigEntryState.LOADED:
+        if not (changed := _changed_options(entry)):
+            return
+        if changed <= HOT_APPLIED_OPTIONS:
+            _LOGGER.debug("Applying options in place: %s", sorted(changed))
+            entry.runtime_data.options = dict(entry.options)
+            entry.runtime_data.hub.stale_after = entry.options.get(
+                CONF_STALE_AFTER, DEFAULT_STALE_AFTER
+            )
+            for device in entry.runtime_data.devices:
+                device.connected_debounce = entry.options.get(
+                    CONF_CONNECTED_DEBOUNCE, DEFAULT_CONNECTED_DEBOUNCE
+                )
+            entry.runtime_data.reads.ttl = entry.options.get(
+                CONF_READ_CACHE_TTL, DEFAULT_READ_CACHE_TTL
+            )
+            entry.runtime_data.reads.clear()
+            await _async_update_journal(hass, entry)
+            async_dispatcher_send(
+                hass, f"{DOMAIN}_{entry.entry_id}_{SMARTBOX_OPTIONS_UPDATED}", changed
+            )
+            return
     await hass.config_entries.async_reload(entry.entry_id)
@@ -7,35 +7,37 @@ from homeassistant.components.binary_sensor import (
     BinarySensorEntity,
 )
 from homeassistant.const import EntityCategory
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
 from . import SmartboxConfigEntry
-from .entity import SmartBoxNodeEntity
+from .entity import SmartBoxNodeEntity, async_setup_device_entities
+from .models import SmartboxDevice
 
 _LOGGER = logging.getLogger(__name__)
 
 
 async def async_setup_entry(
-    _: HomeAssistant,
+    hass: HomeAssistant,
     entry: SmartboxConfigEntry,
     async_add_entities: AddEntitiesCallback,
 ) -> None:
     """Set up platform."""
     _LOGGER.debug("Setting up Smartbox binary sensor platform")
 
-    async_add_entities(
-        [Connected(node, entry) for node in entry.runtime_data.nodes],
-        update_before_add=True,
-    )
-    async_add_entities(
-        [
-            LockBinarySensor(node, entry)
-            for node in entry.runtime_data.nodes
-            if node.heater_node
-        ],
-        update_before_add=True,
-    )
+    @callback
+    def _async_add_device(device: SmartboxDevice) -> None:
+        nodes = device.get_nodes()
+        async_add_entities(
+            [Connected(node, entry) for node in nodes],
+            update_before_add=True,
+        )
+        async_add_entities(
+            [LockBinarySensor(node, entry) for node in nodes if node.heater_node],
+            update_before_add=True,
+        )
+
+    async_setup_device_entities(hass, entry, _async_add_device)
     _LOGGER.debug("Finished setting up Smartbox binary sensor platform")
 
 
@@ -44,6 +46,7 @@ class Connected(SmartBoxNodeEntity, BinarySensorEntity):
 
     _attr_key = "connected"
     _attr_websocket_event = "connected"
+    _attr_available_when_stale = True
     device_class = BinarySensorDeviceClass.CONNECTIVITY
     entity_category = EntityCategory.DIAGNOSTIC
 
@@ -58,6 +61,7 @@ class LockBinarySensor(SmartBoxNodeEntity, BinarySensorEntity):
 
     _attr_key = "lock"
     _attr_websocket_event = "status"
+    _attr_websocket_fields = frozenset({"locked", "sync_status"})
     device_class = BinarySensorDeviceClass.LOCK
     entity_category = EntityCategory.DIAGNOSTIC
 
@@ -18,7 +18,7 @@ from homeassistant.components.climate import (
 )
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import ATTR_LOCKED, ATTR_TEMPERATURE, UnitOfTemperature
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
 from . import SmartboxConfigEntry
@@ -29,8 +29,9 @@ from .const import (
     PRESET_SELF_LEARN,
     SmartboxNodeType,
 )
-from .entity import SmartBoxNodeEntity
+from .entity import SmartBoxNodeEntity, async_setup_device_entities
 from .models import (
+    SmartboxDevice,
     SmartboxNode,
     _check_status_key,
     get_hvac_mode,
@@ -45,21 +46,25 @@ _LOGGER = logging.getLogger(__name__)
 
 
 async def async_setup_entry(
-    _: HomeAssistant,
+    hass: HomeAssistant,
     entry: SmartboxConfigEntry,
     async_add_entities: AddEntitiesCallback,
 ) -> None:
     """Set up platform."""
     _LOGGER.info("Setting up Smartbox climate platform")
 
-    async_add_entities(
-        [
-            SmartboxHeater(node, entry)
-            for node in entry.runtime_data.nodes
-            if node.heater_node
-        ],
-        update_before_add=True,
-    )
+    @callback
+    def _async_add_device(device: SmartboxDevice) -> None:
+        async_add_entities(
+            [
+                SmartboxHeater(node, entry)
+                for node in device.get_nodes()
+                if node.heater_node
+            ],
+            update_before_add=True,
+        )
+
+    async_setup_device_entities(hass, entry, _async_add_device)
     _LOGGER.debug("Finished setting up Smartbox climate platform")
 
 
@@ -230,4 +235,4 @@ class SmartboxHeater(SmartBoxNodeEntity, ClimateEntity):
     @property
     def available(self) -> bool:
         """Return True if roller and hub is available."""
-        return self._available
+        return self._available and super().available
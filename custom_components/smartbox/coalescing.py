@@ -0,0 +1,131 @@
+"""Single-flight reads of a smartbox session.
+
+Identical concurrent reads, the same call with the same arguments, share one
+request and its result. The results can be kept for a short time to answer
+the reads following them too.
+"""
+
+import asyncio
+from collections.abc import Callable
+import copy
+import json
+import time
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+from smartbox import AsyncSmartboxSession
+
+from .const import DOMAIN
+
+# Session reads coalesced
+COALESCED_SESSION_CALLS = (
+    "get_node_status",
+    "get_node_setup",
+    "get_node_samples",
+    "get_device_power_limit",
+    "api_version",
+    "health_check",
+)
+# Session writes, dropping the kept results as they may change them
+INVALIDATING_SESSION_CALLS = (
+    "set_node_status",
+    "set_node_setup",
+    "set_device_away_status",
+    "set_device_power_limit",
+)
+
+
+class CoalescedReads:
+    """Coalescing of the identical reads of a session."""
+
+    def __init__(self, ttl: float = 0) -> None:
+        """Initialise the reads, with results kept for ttl seconds."""
+        self.ttl = ttl
+        # Reads answered by a request in flight or a kept result
+        self.coalesced = 0
+        self._session: AsyncSmartboxSession | None = None
+        self._hass: HomeAssistant | None = None
+        self._calls: dict[str, Callable[..., Any]] = {}
+        self._in_flight: dict[tuple[str, str], asyncio.Task] = {}
+        # Monotonic expiry and result of the reads, by call and arguments
+        self._results: dict[tuple[str, str], tuple[float, Any]] = {}
+
+    def attach(self, session: AsyncSmartboxSession, hass: HomeAssistant) -> None:
+        """Coalesce the reads of the session, reading in tasks of hass."""
+        self._session = session
+        self._hass = hass
+        for name in COALESCED_SESSION_CALLS:
+            self._calls[name] = getattr(session, name)
+            setattr(session, name, self._wrap(name, self._calls[name]))
+        for name in INVALIDATING_SESSION_CALLS:
+            self._calls[name] = getattr(session, name)
+            setattr(session, name, self._wrap_write(self._calls[name]))
+
+    def _wrap(self, name: str, call: Callable[..., Any]) -> Callable[..., Any]:
+        """Return a session call sharing the identical reads."""
+
+        async def _coalesced(*args: Any) -> Any:  # noqa: ANN401
+            key = (name, _call_key(args))
+            now = time.monotonic()
+            if (result := self._results.get(key)) is not None:
+                if result[0] > now:
+                    self.coalesced += 1
+                    return copy.deepcopy(result[1])
+                del self._results[key]
+            if key in self._in_flight:
+                self.coalesced += 1
+            else:
+                # not started eagerly, the read drops itself from the reads in
+                # flight once done
+                self._in_flight[key] = self._hass.async_create_background_task(
+                    self._read(key, call, args),
+                    f"{DOMAIN}_read_{name}",
+                    eager_start=False,
+                )
+            # the callers get their own copy, which they may update in place
+            return copy.deepcopy(await asyncio.shield(self._in_flight[key]))
+
+        return _coalesced
+
+    def _wrap_write(self, call: Callable[..., Any]) -> Callable[..., Any]:
+        """Return a session call dropping the kept results."""
+
+        async def _write(*args: Any) -> Any:  # noqa: ANN401
+            self.clear()
+            return await call(*args)
+
+        return _write
+
+    async def _read(
+        self,
+        key: tuple[str, str],
+        call: Callable[..., Any],
+        args: tuple[Any, ...],
+    ) -> Any:  # noqa: ANN401
+        """Read once for all the callers, keeping the result if any ttl."""
+        try:
+            result = await call(*args)
+        finally:
+            del self._in_flight[key]
+        if self.ttl > 0:
+            self._results[key] = (time.monotonic() + self.ttl, result)
+        return result
+
+    def clear(self) -> None:
+        """Drop the kept results."""
+        self._results.clear()
+
+    def detach(self) -> None:
+        """Stop coalescing the reads of the session."""
+        if self._session is not None:
+            for name, call in self._calls.items():
+                setattr(self._session, name, call)
+            self._calls.clear()
+            self._session = None
+            self._hass = None
+        self.clear()
+
+
+def _call_key(args: tuple[Any, ...]) -> str:
+    """Return the key of the arguments of a call."""
+    return json.dumps(args, sort_keys=True, default=str)
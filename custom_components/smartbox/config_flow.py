@@ -4,7 +4,7 @@ import logging
 from typing import Any
 
 from homeassistant.config_entries import ConfigFlow, ConfigFlowResult, OptionsFlow
-from homeassistant.const import CONF_PASSWORD, CONF_USERNAME
+from homeassistant.const import CONF_PASSWORD, CONF_TOKEN, CONF_USERNAME
 from homeassistant.core import callback
 import homeassistant.helpers.config_validation as cv
 from homeassistant.helpers.selector import (
@@ -25,15 +25,28 @@ from . import (
     InvalidAuthError,
     SmartboxConfigEntry,
     SmartboxError,
+    async_hand_over_session,
     create_smartbox_session_from_entry,
 )
 from .const import (
     CONF_API_NAME,
+    CONF_CONNECTED_DEBOUNCE,
     CONF_DISPLAY_ENTITY_PICTURES,
     CONF_HISTORY_CONSUMPTION,
+    CONF_MAX_CONCURRENT_DEVICES,
+    CONF_READ_CACHE_TTL,
+    CONF_RECORD_TRAFFIC,
+    CONF_STALE_AFTER,
+    CONF_STATE_WRITE_WINDOW,
     CONF_TIMEDELTA_POWER,
+    DEFAULT_CONNECTED_DEBOUNCE,
+    DEFAULT_MAX_CONCURRENT_DEVICES,
+    DEFAULT_READ_CACHE_TTL,
+    DEFAULT_STALE_AFTER,
+    DEFAULT_STATE_WRITE_WINDOW,
     DEFAULT_TIMEDELTA_POWER,
     DOMAIN,
+    MAX_READ_CACHE_TTL,
     HistoryConsumptionStatus,
 )
 
@@ -61,6 +74,20 @@ OPTIONS_DATA_SCHEMA = {
     vol.Required(
         CONF_TIMEDELTA_POWER, default=DEFAULT_TIMEDELTA_POWER
     ): cv.positive_int,
+    vol.Required(
+        CONF_MAX_CONCURRENT_DEVICES, default=DEFAULT_MAX_CONCURRENT_DEVICES
+    ): cv.positive_int,
+    vol.Required(
+        CONF_STATE_WRITE_WINDOW, default=DEFAULT_STATE_WRITE_WINDOW
+    ): cv.positive_int,
+    vol.Required(CONF_STALE_AFTER, default=DEFAULT_STALE_AFTER): cv.positive_int,
+    vol.Required(
+        CONF_CONNECTED_DEBOUNCE, default=DEFAULT_CONNECTED_DEBOUNCE
+    ): cv.positive_int,
+    vol.Required(CONF_RECORD_TRAFFIC, default=False): BooleanSelector(),
+    vol.Required(CONF_READ_CACHE_TTL, default=DEFAULT_READ_CACHE_TTL): vol.All(
+        cv.positive_int, vol.Range(max=MAX_READ_CACHE_TTL)
+    ),
 }
 
 
@@ -94,7 +121,9 @@ class SmartboxConfigFlow(ConfigFlow, domain=DOMAIN):
         placeholders: dict[str, str] = {}
         if user_input is not None:
             try:
-                await create_smartbox_session_from_entry(self.hass, user_input)
+                session = await create_smartbox_session_from_entry(
+                    self.hass, user_input
+                )
             except APIUnavailableError as ex:
                 errors["base"] = "cannot_connect"
                 placeholders["error"] = str(ex)
@@ -109,6 +138,7 @@ class SmartboxConfigFlow(ConfigFlow, domain=DOMAIN):
                     f"{AvailableResellers(api_url=user_input[CONF_API_NAME]).api_url}_{user_input[CONF_USERNAME]}"
                 )
                 self._abort_if_unique_id_configured()
+                async_hand_over_session(self.hass, self.unique_id, session)
                 return self.async_create_entry(
                     title=f"{AvailableResellers(api_url=user_input[CONF_API_NAME]).name} {user_input[CONF_USERNAME]}",
                     data=user_input,
@@ -125,7 +155,10 @@ class SmartboxConfigFlow(ConfigFlow, domain=DOMAIN):
 
     async def async_step_reauth(self, entry_data: dict[str, Any]) -> ConfigFlowResult:
         """Perform reauth upon an API authentication error."""
-        self.current_user_inputs = entry_data.copy()
+        # The persisted token must not bypass the new credentials
+        self.current_user_inputs = {
+            key: value for key, value in entry_data.items() if key != CONF_TOKEN
+        }
         return await self.async_step_reauth_confirm()
 
     async def async_step_reauth_confirm(
@@ -138,7 +171,9 @@ class SmartboxConfigFlow(ConfigFlow, domain=DOMAIN):
         if user_input is not None:
             user_input = {**self.current_user_inputs, **user_input}
             try:
-                await create_smartbox_session_from_entry(self.hass, user_input)
+                session = await create_smartbox_session_from_entry(
+                    self.hass, user_input
+                )
             except APIUnavailableError as ex:
                 errors["base"] = "cannot_connect"
                 placeholders["error"] = str(ex)
@@ -153,9 +188,10 @@ class SmartboxConfigFlow(ConfigFlow, domain=DOMAIN):
                     f"{AvailableResellers(api_url=user_input[CONF_API_NAME]).api_url}_{user_input[CONF_USERNAME]}"
                 )
                 self._abort_if_unique_id_mismatch(reason="invalid_auth")
+                async_hand_over_session(self.hass, self.unique_id, session)
                 return self.async_update_reload_and_abort(
                     self._get_reauth_entry(),
-                    data_updates=user_input,
+                    data=user_input,
                 )
             return await self.async_step_user(user_input=user_input)
         return self.async_show_form(
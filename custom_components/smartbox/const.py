@@ -2,6 +2,7 @@
 
 from enum import Enum, StrEnum
 
+from homeassistant.const import CONF_PASSWORD, CONF_TOKEN, CONF_USERNAME
 from smartbox import SmartboxNodeType
 
 DOMAIN = "smartbox"
@@ -11,8 +12,27 @@ SERVICE_SET_BOOST_PARAMS = "set_boost_params"
 CONF_API_NAME = "api_name"
 CONF_DISPLAY_ENTITY_PICTURES = "reseller_entity"
 CONF_TIMEDELTA_POWER = "timedelta_update_power"
+CONF_MAX_CONCURRENT_DEVICES = "max_concurrent_devices"
+CONF_STATE_WRITE_WINDOW = "state_write_window"
+CONF_STALE_AFTER = "stale_after"
+CONF_RECORD_TRAFFIC = "record_traffic"
+CONF_CONNECTED_DEBOUNCE = "connected_debounce"
+CONF_READ_CACHE_TTL = "read_cache_ttl"
 
 DEFAULT_TIMEDELTA_POWER = 60
+DEFAULT_MAX_CONCURRENT_DEVICES = 4
+# Milliseconds websocket updates are coalesced for, 0 for one event loop tick
+DEFAULT_STATE_WRITE_WINDOW = 0
+# Seconds without socket or polled update after which entities are unavailable
+DEFAULT_STALE_AFTER = 900
+# Seconds a connectivity transition must last to be dispatched, 0 for none
+DEFAULT_CONNECTED_DEBOUNCE = 0
+# Seconds the results of the API reads are kept, 0 to only share the reads
+# in flight
+DEFAULT_READ_CACHE_TTL = 0
+# The kept results hide the changes made outside of the integration, such as
+# in the app, so they are kept a few seconds at most
+MAX_READ_CACHE_TTL = 5
 DEFAULT_BOOST_TIME = 60
 DEFAULT_BOOST_TEMP = 21.0
 GITHUB_ISSUES_URL = "https://github.com/ajtudela/hass-smartbox/issues"
@@ -32,6 +52,64 @@ PRESET_BOOST = "boost"
 SMARTBOX_DEVICES = "smartbox_devices"
 SMARTBOX_NODES = "smartbox_nodes"
 SMARTBOX_SESSIONS = "smartbox_sessions"
+SMARTBOX_NEW_DEVICE = "new_device"
+SMARTBOX_OPTIONS_UPDATED = "options_updated"
+
+# A handed over session is only reused if its token stays valid that long,
+# and the token is refreshed in the background before falling below it
+SESSION_TOKEN_MIN_VALIDITY = 300
+TOKEN_REFRESH_RETRY_DELAY = 60
+
+# Delays between attempts to initialise devices that failed at setup
+DEVICE_RETRY_MIN_DELAY = 30
+DEVICE_RETRY_MAX_DELAY = 900
+
+# Supervision of the sockets: a socket disconnected, or connected but silent
+# for too long, is replaced by a jittered polling of the node status, with a
+# backoff on errors, until it gets updates again.
+SOCKET_CHECK_INTERVAL = 30
+SOCKET_SILENCE_TIMEOUT = 600
+POLL_INTERVAL = 60
+POLL_MAX_INTERVAL = 600
+POLL_JITTER = 0.2
+
+# Slow anti-entropy reconciliation: every interval, the state of one node is
+# fetched again, device after device, to correct a drift from missed updates.
+# A device is left alone for a while after a command was sent to it.
+RECONCILE_INTERVAL = 60
+COMMAND_QUIET_PERIOD = 30
+# Seconds the status or setup writes of a node are merged into a single call
+WRITE_MERGE_WINDOW = 0.3
+# Seconds the state received stays fresh enough to skip the commands matching it
+COMMAND_SUPPRESS_MAX_AGE = 300
+# Seconds the values of a command are shown before they are confirmed by an
+# update of the node, they are rolled back after it. The commands not
+# confirmed by then are counted as never confirmed.
+OPTIMISTIC_CONFIRM_TIMEOUT = 30
+
+# Socket metrics: message rates are over the last window in seconds, and the
+# delays from an update to its state write are counted in millisecond buckets.
+METRICS_RATE_WINDOW = 60
+METRICS_UPDATE_INTERVAL = 60
+DISPATCH_LATENCY_BUCKETS = (1, 5, 10, 50, 100, 500, 1000, float("inf"))
+# Delays from a command to its acknowledgement by the API and to its
+# confirmation by the socket, in millisecond buckets
+COMMAND_LATENCY_BUCKETS = (100, 250, 500, 1000, 2500, 5000, 10000, float("inf"))
+
+# Fields redacted from the diagnostics
+TO_REDACT = [CONF_PASSWORD, CONF_TOKEN, CONF_USERNAME, "title", "unique_id"]
+
+# Traffic journal, written to the configuration directory every interval and
+# rotated once it reaches the maximum size in bytes. The fields redacted from
+# the recorded traffic are the ones of the diagnostics, and the identifying
+# fields of the API responses.
+JOURNAL_FILENAME = f"{DOMAIN}_journal_{{entry_id}}.jsonl"
+JOURNAL_FLUSH_INTERVAL = 10
+JOURNAL_MAX_SIZE = 10 * 1024 * 1024
+JOURNAL_REDACT = [*TO_REDACT, "email", "id", "name", "serial_id"]
+
+SNAPSHOT_STORAGE_KEY = f"{DOMAIN}.snapshot"
+SNAPSHOT_STORAGE_VERSION = 1
 
 CONF_HISTORY_CONSUMPTION = "history_consumption"
 
@@ -3,13 +3,11 @@
 from typing import Any
 
 from homeassistant.components.diagnostics import async_redact_data
-from homeassistant.const import CONF_PASSWORD, CONF_USERNAME
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers import device_registry as dr, entity_registry as er
 
 from . import SmartboxConfigEntry
-
-TO_REDACT = [CONF_PASSWORD, CONF_USERNAME, "title", "unique_id"]
+from .const import TO_REDACT
 
 
 async def async_get_config_entry_diagnostics(
@@ -25,6 +23,17 @@ async def async_get_config_entry_diagnostics(
                 for e in config_entry.runtime_data.nodes
             ],
             "devices": [d.device for d in config_entry.runtime_data.devices],
+            "startup_timings": config_entry.runtime_data.startup_timings(),
+            "state_writes": config_entry.runtime_data.state_writes,
+            "polled_devices": config_entry.runtime_data.hub.polled_dev_ids,
+            "coalesced_reads": config_entry.runtime_data.reads.coalesced,
+            "update_metrics": {
+                d.dev_id: d.metrics.as_dict() for d in config_entry.runtime_data.devices
+            },
+            "command_metrics": {
+                d.dev_id: d.command_metrics.as_dict()
+                for d in config_entry.runtime_data.devices
+            },
         },
     }
     diagnostics_data["hass_devices"] = [
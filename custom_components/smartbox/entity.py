@@ -1,24 +1,59 @@
 """Generic entity."""
 
+from collections.abc import Callable
+from datetime import datetime
+import time
 from typing import Any
 
-from homeassistant.core import callback
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
 from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.entity import DeviceInfo, Entity
+from homeassistant.helpers.event import async_call_later
 
 from . import SmartboxConfigEntry
-from .const import CONF_DISPLAY_ENTITY_PICTURES, DOMAIN
+from .const import (
+    CONF_DISPLAY_ENTITY_PICTURES,
+    CONF_STATE_WRITE_WINDOW,
+    DEFAULT_STATE_WRITE_WINDOW,
+    DOMAIN,
+    SMARTBOX_NEW_DEVICE,
+    SMARTBOX_OPTIONS_UPDATED,
+)
 from .models import SmartboxDevice, SmartboxNode
 
 
+@callback
+def async_setup_device_entities(
+    hass: HomeAssistant,
+    entry: SmartboxConfigEntry,
+    add_device: Callable[[SmartboxDevice], None],
+) -> None:
+    """Add the entities of the ready devices, then of each new device."""
+    for device in entry.runtime_data.devices:
+        add_device(device)
+    entry.async_on_unload(
+        async_dispatcher_connect(
+            hass, f"{DOMAIN}_{entry.entry_id}_{SMARTBOX_NEW_DEVICE}", add_device
+        )
+    )
+
+
 class DefaultSmartBoxEntity(Entity):
     """Default Smartbox Entity."""
 
     _node: SmartboxNode
     _attr_key: str
     _attr_websocket_event: str
+    # Status or setup fields the entity depends on, None for all of them
+    _attr_websocket_fields: frozenset[str] | None = None
+    # Whether the entity stays available while the state of its device is
+    # stale, for the entities reporting the connectivity itself
+    _attr_available_when_stale = False
     _attr_should_poll = False
     _attr_has_entity_name = True
+    _cancel_write: CALLBACK_TYPE | None = None
+    # Monotonic time of the first update of the pending write
+    _write_scheduled = 0.0
 
     def __init__(self, entry: SmartboxConfigEntry) -> None:
         """Initialize the default Device Entity."""
@@ -29,8 +64,52 @@ class DefaultSmartBoxEntity(Entity):
         self._attr_unique_id = self._node.node_id
         self._reseller = self._node.session.reseller
         self._configuration_url = f"{self._reseller.web_url}#/{self._node.device.home['id']}/dev/{self._device_id}/{self._node.node_type}/{self._node.addr}/setup"
-        if entry.options.get(CONF_DISPLAY_ENTITY_PICTURES, False) is True:
-            self._attr_entity_picture = f"{self._reseller.web_url}img/favicon.ico"
+        self._entry = entry
+        self._update_entity_picture()
+
+    def _update_entity_picture(self) -> None:
+        """Set the entity picture from the options."""
+        self._attr_entity_picture = (
+            f"{self._reseller.web_url}img/favicon.ico"
+            if self._entry.options.get(CONF_DISPLAY_ENTITY_PICTURES, False) is True
+            else None
+        )
+
+    @property
+    def available(self) -> bool:
+        """Return False while the state of the device is stale."""
+        return super().available and (
+            self._attr_available_when_stale or not self._node.device.stale
+        )
+
+    async def async_added_to_hass(self) -> None:
+        """Register callbacks."""
+        self.async_on_remove(
+            async_dispatcher_connect(
+                self.hass,
+                f"{DOMAIN}_{self._entry.entry_id}_{SMARTBOX_OPTIONS_UPDATED}",
+                self._async_options_updated,
+            )
+        )
+        self.async_on_remove(self._node.subscribe("stale", self._async_stale_update))
+
+    @callback
+    def _async_stale_update(self, _stale: bool) -> None:
+        """Write the availability when the device becomes stale or fresh."""
+        self._async_schedule_write()
+
+    async def async_will_remove_from_hass(self) -> None:
+        """When removed from hass."""
+        if self._cancel_write is not None:
+            self._cancel_write()
+            self._cancel_write = None
+
+    @callback
+    def _async_options_updated(self, changed: set[str]) -> None:
+        """Apply the changed options in place."""
+        if CONF_DISPLAY_ENTITY_PICTURES in changed:
+            self._update_entity_picture()
+            self.async_write_ha_state()
 
     @property
     def unique_id(self) -> str:
@@ -51,9 +130,45 @@ class DefaultSmartBoxEntity(Entity):
         )
 
     @callback
-    def _async_update(self, data: Any) -> None:  # noqa: ANN401
-        """Update the state."""
+    def _async_update(self, data: Any, fields: set[str] | None = None) -> None:  # noqa: ANN401
+        """Update the state, unless none of the changed fields is used."""
+        if (
+            fields is not None
+            and self._attr_websocket_fields is not None
+            and self._attr_websocket_fields.isdisjoint(fields)
+        ):
+            return
         self._attr_state = data
+        self._async_schedule_write()
+
+    @callback
+    def _async_schedule_write(self) -> None:
+        """Write the state once for the updates received within the window."""
+        state_writes = self._entry.runtime_data.state_writes
+        if self._cancel_write is not None:
+            state_writes["coalesced"] += 1
+            return
+        self._write_scheduled = time.monotonic()
+        window = self._entry.options.get(
+            CONF_STATE_WRITE_WINDOW, DEFAULT_STATE_WRITE_WINDOW
+        )
+        if window:
+            self._cancel_write = async_call_later(
+                self.hass, window / 1000, self._async_write_coalesced
+            )
+        else:
+            self._cancel_write = self.hass.loop.call_soon(
+                self._async_write_coalesced
+            ).cancel
+
+    @callback
+    def _async_write_coalesced(self, _now: datetime | None = None) -> None:
+        """Write the coalesced state."""
+        self._cancel_write = None
+        self._entry.runtime_data.state_writes["written"] += 1
+        self._node.device.metrics.record_latency(
+            time.monotonic() - self._write_scheduled
+        )
         self.async_write_ha_state()
 
 
@@ -68,11 +183,12 @@ class SmartBoxDeviceEntity(DefaultSmartBoxEntity):
 
     async def async_added_to_hass(self) -> None:
         """Register callbacks."""
+        await super().async_added_to_hass()
         if self._attr_should_poll is False:
-            async_dispatcher_connect(
-                self.hass,
-                f"{DOMAIN}_{self._device.dev_id}_{self._attr_websocket_event}",
-                self._async_update,
+            self.async_on_remove(
+                self._device.subscribers.subscribe(
+                    (None, None, self._attr_websocket_event), self._async_update
+                )
             )
 
 
@@ -96,9 +212,8 @@ class SmartBoxNodeEntity(DefaultSmartBoxEntity):
 
     async def async_added_to_hass(self) -> None:
         """Register callbacks."""
+        await super().async_added_to_hass()
         if self._attr_should_poll is False:
-            async_dispatcher_connect(
-                self.hass,
-                f"{DOMAIN}_{self._node.node_id}_{self._attr_websocket_event}",
-                self._async_update,
+            self.async_on_remove(
+                self._node.subscribe(self._attr_websocket_event, self._async_update)
             )
@@ -0,0 +1,220 @@
+"""Journal of the socket and session traffic of an entry, and its replay.
+
+The journal is a JSON lines file, with a message per line:
+- t: seconds since the recording started
+- kind: "update" for a socket update, "call" for a session call
+- name: the update of the device, e.g. node_status, or the session call
+- dev: the alias of the device, dev_0, dev_1...
+- args: the arguments of the update or the call, without the device id
+- result: the result of the call
+
+The device ids are replaced by aliases and the sensitive fields redacted when
+recorded, so a journal can be attached to an issue. Once the journal reaches
+its maximum size, it is moved to a .1 file and a new one is started.
+"""
+
+import asyncio
+from collections import defaultdict, deque
+from collections.abc import Callable, Iterable, Mapping
+from datetime import datetime, timedelta
+import json
+from pathlib import Path
+import time
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.event import async_track_time_interval
+from smartbox import AsyncSmartboxSession
+
+from .const import DOMAIN, JOURNAL_FLUSH_INTERVAL, JOURNAL_MAX_SIZE, JOURNAL_REDACT
+
+if TYPE_CHECKING:
+    from .models import SmartboxDevice
+
+
+# Session calls recorded, the samples are left out as they are large
+JOURNAL_SESSION_CALLS = (
+    "get_homes",
+    "get_nodes",
+    "get_node_status",
+    "get_node_setup",
+    "get_device_connected",
+    "get_device_away_status",
+    "get_device_power_limit",
+)
+
+
+class TrafficJournal:
+    """Recording of the traffic of a session to a journal file."""
+
+    def __init__(self, hass: HomeAssistant, path: Path) -> None:
+        """Start recording to a journal file, appended to if it exists."""
+        self._hass = hass
+        self.path = path
+        self._start = time.monotonic()
+        self._aliases: dict[str, str] = {}
+        self._lines: list[str] = []
+        self._session: AsyncSmartboxSession | None = None
+        self._calls: dict[str, Callable[..., Any]] = {}
+        self._cancel_flush = async_track_time_interval(
+            hass,
+            self._async_flush,
+            timedelta(seconds=JOURNAL_FLUSH_INTERVAL),
+            name=f"{DOMAIN}_journal_flush",
+            cancel_on_shutdown=True,
+        )
+
+    def _alias(self, dev_id: str) -> str:
+        """Return the alias of a device id."""
+        return self._aliases.setdefault(dev_id, f"dev_{len(self._aliases)}")
+
+    def _redact(self, data: Any) -> Any:  # noqa: ANN401
+        """Return data with the device ids aliased and sensitive fields redacted."""
+        if isinstance(data, Mapping):
+            data = {
+                key: self._alias(value) if key == "dev_id" else self._redact(value)
+                for key, value in data.items()
+            }
+            return async_redact_data(data, JOURNAL_REDACT)
+        if isinstance(data, list | tuple):
+            return [self._redact(value) for value in data]
+        return data
+
+    @callback
+    def _record(self, message: dict[str, Any]) -> None:
+        """Buffer a message, written at the next flush."""
+        message["t"] = round(time.monotonic() - self._start, 3)
+        self._lines.append(json.dumps(message, separators=(",", ":"), default=str))
+
+    @callback
+    def record_update(self, dev_id: str, update: str, args: Iterable[Any]) -> None:
+        """Record a socket update of a device."""
+        self._record(
+            {
+                "kind": "update",
+                "name": update,
+                "dev": self._alias(dev_id),
+                "args": self._redact(list(args)),
+            }
+        )
+
+    def attach(self, session: AsyncSmartboxSession) -> None:
+        """Record the results of the session calls."""
+        self._session = session
+        for name in JOURNAL_SESSION_CALLS:
+            self._calls[name] = getattr(session, name)
+            setattr(session, name, self._wrap(name, self._calls[name]))
+
+    def _wrap(self, name: str, call: Callable[..., Any]) -> Callable[..., Any]:
+        """Return a session call recording its results."""
+
+        async def _recorded(*args: Any) -> Any:  # noqa: ANN401
+            result = await call(*args)
+            dev_id, *call_args = args or (None,)
+            self._record(
+                {
+                    "kind": "call",
+                    "name": name,
+                    "dev": None if dev_id is None else self._alias(dev_id),
+                    "args": self._redact(call_args),
+                    "result": self._redact(result),
+                }
+            )
+            return result
+
+        return _recorded
+
+    def detach(self) -> None:
+        """Stop recording the session calls."""
+        if self._session is not None:
+            for name, call in self._calls.items():
+                setattr(self._session, name, call)
+            self._calls.clear()
+            self._session = None
+
+    async def _async_flush(self, _now: datetime | None = None) -> None:
+        """Append the buffered messages to the journal file."""
+        if not self._lines:
+            return
+        lines, self._lines = self._lines, []
+        await self._hass.async_add_executor_job(_append_lines, self.path, lines)
+
+    async def async_close(self) -> None:
+        """Stop recording and write the remaining messages."""
+        self._cancel_flush()
+        self.detach()
+        await self._async_flush()
+
+
+def _append_lines(path: Path, lines: list[str]) -> None:
+    """Append lines to a file, rotated once it reaches the maximum size."""
+    if path.exists() and path.stat().st_size >= JOURNAL_MAX_SIZE:
+        path.replace(path.with_name(f"{path.name}.1"))
+    with path.open("a", encoding="utf-8") as file:
+        file.writelines(f"{line}\n" for line in lines)
+
+
+def load_journal(path: Path) -> list[dict[str, Any]]:
+    """Load the messages of a journal file."""
+    with path.open(encoding="utf-8") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+class JournalSession:
+    """Session answering the calls of a journal, in their recorded order.
+
+    The device ids are the aliases of the journal, the results are matched
+    by call, device and arguments.
+    """
+
+    def __init__(self, messages: Iterable[dict[str, Any]]) -> None:
+        """Initialise the session with the results of the recorded calls."""
+        self._results: defaultdict[tuple[str, str | None, str], deque[Any]] = (
+            defaultdict(deque)
+        )
+        for message in messages:
+            if message["kind"] == "call":
+                self._results[
+                    message["name"], message["dev"], _call_key(message["args"])
+                ].append(message["result"])
+
+    def __getattr__(self, name: str) -> Callable[..., Any]:
+        """Return a recorded session call."""
+        if name not in JOURNAL_SESSION_CALLS:
+            raise AttributeError(name)
+
+        async def _replayed(*args: Any) -> Any:  # noqa: ANN401
+            dev_id, *call_args = args or (None,)
+            return self._results[name, dev_id, _call_key(call_args)].popleft()
+
+        return _replayed
+
+
+def _call_key(args: list[Any]) -> str:
+    """Return the key of the arguments of a call."""
+    return json.dumps(args, sort_keys=True, default=str)
+
+
+async def replay_journal(
+    messages: Iterable[dict[str, Any]],
+    devices: Mapping[str, "SmartboxDevice"],
+    speed: float | None = None,
+) -> int:
+    """Replay the socket updates of a journal against devices by alias.
+
+    The updates are replayed at their recorded pace divided by speed, or one
+    after the other without waiting if speed is None. Return their count.
+    """
+    start = time.monotonic()
+    count = 0
+    for message in messages:
+        if message["kind"] != "update":
+            continue
+        if speed:
+            await asyncio.sleep(
+                max(0.0, start + message["t"] / speed - time.monotonic())
+            )
+        getattr(devices[message["dev"]], f"{message['name']}_update")(*message["args"])
+        count += 1
+    return count
@@ -1,9 +1,15 @@
 """Models for Smartbox."""
 
 import asyncio
+from collections import deque
+from collections.abc import Awaitable, Callable, Hashable, Iterator
+from contextlib import contextmanager
 from datetime import datetime, timedelta
+from functools import partial
 import logging
 import math
+from pathlib import Path
+import random
 import time
 from typing import Any, cast
 from unittest.mock import MagicMock
@@ -19,21 +25,39 @@ from homeassistant.components.climate import (
     HVACMode,
 )
 from homeassistant.const import UnitOfTemperature
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later, async_track_time_interval
 from smartbox import AsyncSmartboxSession, SmartboxNodeType, UpdateManager
+from smartbox.error import APIUnavailableError, InvalidAuthError, SmartboxError
 
 from .const import (
+    COMMAND_LATENCY_BUCKETS,
+    COMMAND_QUIET_PERIOD,
+    COMMAND_SUPPRESS_MAX_AGE,
     DEFAULT_BOOST_TEMP,
     DEFAULT_BOOST_TIME,
+    DEFAULT_CONNECTED_DEBOUNCE,
+    DEFAULT_MAX_CONCURRENT_DEVICES,
+    DEFAULT_STALE_AFTER,
+    DISPATCH_LATENCY_BUCKETS,
     DOMAIN,
     GITHUB_ISSUES_URL,
     HEATER_NODE_TYPES,
+    METRICS_RATE_WINDOW,
+    OPTIMISTIC_CONFIRM_TIMEOUT,
+    POLL_INTERVAL,
+    POLL_JITTER,
+    POLL_MAX_INTERVAL,
     PRESET_FROST,
     PRESET_SCHEDULE,
     PRESET_SELF_LEARN,
+    RECONCILE_INTERVAL,
+    SOCKET_CHECK_INTERVAL,
+    SOCKET_SILENCE_TIMEOUT,
+    WRITE_MERGE_WINDOW,
     BoostConfig,
 )
+from .journal import TrafficJournal
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -43,6 +67,353 @@ StatusDict = dict[str, Any]
 SamplesDict = dict[str, Any]
 Node = dict[str, Any]
 Device = dict[str, Any]
+# (node type, addr, kind) of an update, without node for the device updates
+UpdateKey = tuple[str | None, int | None, str]
+
+_MISSING = object()
+# Updates of the device, delivered to the entities of all its nodes
+DEVICE_UPDATES = frozenset({"away_status", "connected", "power_limit", "stale"})
+
+
+class UpdateSubscribers:
+    """Callbacks subscribed to the updates of a device and its nodes.
+
+    The callbacks of a key are kept in a tuple replaced on each change, so an
+    update is delivered in one pass without building a signal name or copying
+    the subscribers.
+    """
+
+    def __init__(self) -> None:
+        """Initialise the subscribers."""
+        self._subscribers: dict[UpdateKey, tuple[Callable[..., None], ...]] = {}
+
+    def subscribe(
+        self, key: UpdateKey, subscriber: Callable[..., None]
+    ) -> Callable[[], None]:
+        """Subscribe to an update, return the callback unsubscribing."""
+        self._subscribers[key] = (*self._subscribers.get(key, ()), subscriber)
+
+        def _unsubscribe() -> None:
+            subscribers = tuple(
+                other
+                for other in self._subscribers.get(key, ())
+                if other is not subscriber
+            )
+            if subscribers:
+                self._subscribers[key] = subscribers
+            else:
+                self._subscribers.pop(key, None)
+
+        return _unsubscribe
+
+    def notify(self, key: UpdateKey, *args: Any) -> None:  # noqa: ANN401
+        """Call the subscribers of an update."""
+        for subscriber in self._subscribers.get(key, ()):
+            subscriber(*args)
+
+
+class MergedWriter:
+    """Writes merged into a single call, with the last value of each key.
+
+    The writes received within WRITE_MERGE_WINDOW seconds of the first one are
+    sent together, and all their callers resolve with that call. The dict
+    values, such as the extra options of a setup, are merged by key too.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        write: Callable[[dict[str, Any]], Awaitable[Any]],
+    ) -> None:
+        """Initialise the writer of a call, flushing in tasks of hass."""
+        self._hass = hass
+        self._write = write
+        self._pending: dict[str, Any] = {}
+        self._flush: asyncio.Task[None] | None = None
+
+    @property
+    def pending(self) -> dict[str, Any]:
+        """Return the values waiting to be written."""
+        return self._pending
+
+    async def async_write(self, values: dict[str, Any]) -> None:
+        """Write the values, along with the others received within the window."""
+        for key, value in values.items():
+            pending = self._pending.get(key)
+            self._pending[key] = (
+                {**pending, **value}
+                if isinstance(pending, dict) and isinstance(value, dict)
+                else value
+            )
+        if self._flush is None:
+            # not started eagerly, the flush resets it once the window is over
+            self._flush = self._hass.async_create_background_task(
+                self._async_flush(), f"{DOMAIN}_write", eager_start=False
+            )
+        await asyncio.shield(self._flush)
+
+    async def _async_flush(self) -> None:
+        """Send the merged values once the window is over."""
+        await asyncio.sleep(WRITE_MERGE_WINDOW)
+        values, self._pending = self._pending, {}
+        self._flush = None
+        await self._write(values)
+
+
+class UpdateMetrics:
+    """Counters of the socket updates of a device, and their dispatch delays.
+
+    A duplicate is the same payload as the previous message of its event and
+    node, a no-op is a message that changed nothing, duplicates included.
+    """
+
+    def __init__(self) -> None:
+        """Initialise the metrics."""
+        self.messages: dict[str, int] = {}
+        self.duplicates = 0
+        self.noops = 0
+        self.reconnects = 0
+        # Raw connectivity transitions of the device, debounced or not
+        self.flaps = 0
+        # Commands skipped as they matched the fresh state
+        self.suppressed_commands = 0
+        # Counts of the dispatch delays by bucket upper bound, in milliseconds
+        self.latency_histogram = dict.fromkeys(DISPATCH_LATENCY_BUCKETS, 0)
+        self._latency_total = 0.0
+        # Monotonic receipt time and event of the messages of the rate window
+        self._recent: deque[tuple[float, str]] = deque()
+        self._last_payloads: dict[tuple[Any, ...], Any] = {}
+
+    def record_message(
+        self,
+        event: str,
+        payload: Any,  # noqa: ANN401
+        node: tuple[Any, ...] = (),
+        *,
+        changed: bool,
+    ) -> None:
+        """Record a message of an event, for a node if any."""
+        now = time.monotonic()
+        self.messages[event] = self.messages.get(event, 0) + 1
+        self._recent.append((now, event))
+        self._prune(now)
+        key = (event, *node)
+        if self._last_payloads.get(key, _MISSING) == payload:
+            self.duplicates += 1
+        # a copy, as the setup of a node is updated in place by the commands
+        self._last_payloads[key] = (
+            dict(payload) if isinstance(payload, dict) else payload
+        )
+        if not changed:
+            self.noops += 1
+
+    def record_latency(self, seconds: float) -> None:
+        """Record the delay from an update to its state write."""
+        milliseconds = seconds * 1000
+        self._latency_total += milliseconds
+        bucket = next(
+            bound for bound in DISPATCH_LATENCY_BUCKETS if milliseconds <= bound
+        )
+        self.latency_histogram[bucket] += 1
+
+    def _prune(self, now: float) -> None:
+        """Drop the messages older than the rate window."""
+        while self._recent and now - self._recent[0][0] > METRICS_RATE_WINDOW:
+            self._recent.popleft()
+
+    def rates(self) -> dict[str, float]:
+        """Return the messages per second of each event over the rate window."""
+        self._prune(time.monotonic())
+        counts: dict[str, int] = {}
+        for _, event in self._recent:
+            counts[event] = counts.get(event, 0) + 1
+        return {
+            event: round(count / METRICS_RATE_WINDOW, 3)
+            for event, count in counts.items()
+        }
+
+    @property
+    def rate(self) -> float:
+        """Return the messages per second over the rate window."""
+        self._prune(time.monotonic())
+        return round(len(self._recent) / METRICS_RATE_WINDOW, 3)
+
+    @property
+    def mean_latency(self) -> float | None:
+        """Return the mean dispatch delay in milliseconds, if any."""
+        count = sum(self.latency_histogram.values())
+        return round(self._latency_total / count, 3) if count else None
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the metrics, for the diagnostics."""
+        return {
+            "messages": self.messages,
+            "rates": self.rates(),
+            "duplicates": self.duplicates,
+            "noops": self.noops,
+            "reconnects": self.reconnects,
+            "flaps": self.flaps,
+            "suppressed_commands": self.suppressed_commands,
+            "mean_latency_ms": self.mean_latency,
+            "latency_histogram_ms": {
+                str(bound): count for bound, count in self.latency_histogram.items()
+            },
+        }
+
+
+class CommandMetrics:
+    """Latencies of the commands of a device, and counts of their outcomes.
+
+    A command is acknowledged when its API call returns, and confirmed once
+    the socket updates reported the values of all its keys, e.g.
+    ("node_status", "htr", 1, "stemp"). The keys already holding their value
+    when the command was sent, such as the units sent along a temperature,
+    are left out, unless none changes. A command is never confirmed if its
+    values are not reported within the confirmation timeout.
+    """
+
+    def __init__(self) -> None:
+        """Initialise the metrics."""
+        self.sent = 0
+        self.failed = 0
+        self.confirmed = 0
+        self.unconfirmed = 0
+        # Counts of the delays by bucket upper bound, in milliseconds
+        self.ack_histogram = dict.fromkeys(COMMAND_LATENCY_BUCKETS, 0)
+        self.round_trip_histogram = dict.fromkeys(COMMAND_LATENCY_BUCKETS, 0)
+        self._ack_total = 0.0
+        self._round_trip_total = 0.0
+        # Monotonic send time and value of the last command of the keys not
+        # reported yet
+        self._pending: dict[Hashable, tuple[float, Any]] = {}
+
+    def record_command(
+        self,
+        values: dict[Hashable, Any],
+        previous: dict[Hashable, Any] | None = None,
+    ) -> float:
+        """Record a command of values by key, return its send time.
+
+        previous holds the values of the keys when the command is sent.
+        """
+        start = time.monotonic()
+        self._expire(start)
+        previous = previous or {}
+        changed = {
+            key: value
+            for key, value in values.items()
+            if key not in previous or not _value_matches(previous[key], value)
+        }
+        for key, value in (changed or values).items():
+            self._pending[key] = (start, value)
+        self.sent += 1
+        return start
+
+    def record_failed(self, start: float) -> None:
+        """Record the failure of the command sent at start."""
+        self.failed += 1
+        self._drop(start)
+
+    async def async_acknowledge(self, call: Awaitable[Any]) -> Any:  # noqa: ANN401
+        """Await an API call, timing its acknowledgement."""
+        start = time.monotonic()
+        result = await call
+        self._ack_total += _record_bucket(self.ack_histogram, time.monotonic() - start)
+        return result
+
+    async def async_track(
+        self, call: Awaitable[Any], values: dict[Hashable, Any]
+    ) -> None:
+        """Await the API call of a command of values by key."""
+        start = self.record_command(values)
+        try:
+            await self.async_acknowledge(call)
+        except Exception:
+            self.record_failed(start)
+            raise
+
+    def record_update(self, update: str, node: tuple[Any, ...], payload: Any) -> None:  # noqa: ANN401
+        """Confirm the commands of the values a socket update reports."""
+        now = time.monotonic()
+        self._expire(now)
+        if not self._pending:
+            return
+        if isinstance(payload, dict):
+            values = {(update, *node, field): value for field, value in payload.items()}
+        else:
+            values = {(update, *node): payload}
+        reported = [
+            key
+            for key, value in values.items()
+            if key in self._pending and _value_matches(value, self._pending[key][1])
+        ]
+        starts = {self._pending.pop(key)[0] for key in reported}
+        # confirmed once none of their keys is left to report
+        starts -= {sent for sent, _ in self._pending.values()}
+        for start in starts:
+            self.confirmed += 1
+            self._round_trip_total += _record_bucket(
+                self.round_trip_histogram, now - start
+            )
+
+    def _drop(self, start: float) -> None:
+        """Stop waiting for the confirmation of the command sent at start."""
+        for key in [key for key, (sent, _) in self._pending.items() if sent == start]:
+            del self._pending[key]
+
+    def _expire(self, now: float) -> None:
+        """Count the commands not confirmed within the timeout."""
+        expired = {
+            sent
+            for sent, _ in self._pending.values()
+            if now - sent > OPTIMISTIC_CONFIRM_TIMEOUT
+        }
+        for start in expired:
+            self._drop(start)
+        self.unconfirmed += len(expired)
+
+    @property
+    def pending(self) -> int:
+        """Return the count of the commands waiting for a confirmation."""
+        self._expire(time.monotonic())
+        return len({sent for sent, _ in self._pending.values()})
+
+    @property
+    def mean_ack(self) -> float | None:
+        """Return the mean acknowledgement delay in milliseconds, if any."""
+        count = sum(self.ack_histogram.values())
+        return round(self._ack_total / count, 3) if count else None
+
+    @property
+    def mean_round_trip(self) -> float | None:
+        """Return the mean confirmation delay in milliseconds, if any."""
+        count = sum(self.round_trip_histogram.values())
+        return round(self._round_trip_total / count, 3) if count else None
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the metrics, for the diagnostics."""
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "confirmed": self.confirmed,
+            "unconfirmed": self.unconfirmed,
+            "pending": self.pending,
+            "mean_ack_ms": self.mean_ack,
+            "mean_round_trip_ms": self.mean_round_trip,
+            "ack_histogram_ms": {
+                str(bound): count for bound, count in self.ack_histogram.items()
+            },
+            "round_trip_histogram_ms": {
+                str(bound): count for bound, count in self.round_trip_histogram.items()
+            },
+        }
+
+
+def _record_bucket(histogram: dict[float, int], seconds: float) -> float:
+    """Count a delay in the bucket of a histogram, return it in milliseconds."""
+    milliseconds = seconds * 1000
+    histogram[next(bound for bound in histogram if milliseconds <= bound)] += 1
+    return milliseconds
 
 
 class SmartboxDevice:
@@ -60,13 +431,22 @@ class SmartboxDevice:
         self._away: bool = False
         self._power_limit: int = 0
         self._nodes = {}
-        self._watchdog_task: asyncio.Task | None = None
         self._hass = hass
         self._connected_status: bool | None = None
-        self.update_manager: UpdateManager = UpdateManager(
-            self._session,
-            self.dev_id,
-        )
+        # Last connectivity received, dispatched once it lasted the debounce
+        self._connected_raw: bool | None = None
+        self._cancel_connected: CALLBACK_TYPE | None = None
+        self.connected_debounce = DEFAULT_CONNECTED_DEBOUNCE
+        # Monotonic durations of the startup phases of the device, in seconds
+        self.timings: dict[str, float] = {}
+        self.subscribers = UpdateSubscribers()
+        # Monotonic time the state was last received, pushed or polled
+        self.last_seen = time.monotonic()
+        self.stale = False
+        # Monotonic time a command was last sent to the device or its nodes
+        self.last_command = -math.inf
+        self.metrics = UpdateMetrics()
+        self.command_metrics = CommandMetrics()
 
     @classmethod
     async def initialise_nodes(
@@ -77,96 +457,283 @@ class SmartboxDevice:
     ) -> None:
         """Initilaise nodes."""
         self = cls(device=device, session=session, hass=hass)
+        with record_duration(self.timings, "total"):
+            await self._initialise_nodes()
+        return self
+
+    async def _initialise_nodes(self) -> None:
         # Would do in __init__, but needs to be a coroutine
-        self._connected_status = (
-            await self._session.get_device_connected(self.dev_id)
-        )["connected"]
-        session_nodes: list[Node] = await self._session.get_nodes(self.dev_id)
-
-        for node_info in session_nodes:
-            if node_info["type"] == SmartboxNodeType.PMO:
-                self._power_limit = await self._session.get_device_power_limit(
-                    self.dev_id
-                )
-            self._away = (await self._session.get_device_away_status(self.dev_id))[
-                "away"
-            ]
-            node: SmartboxNode = await SmartboxNode.create(
-                device=self, node_info=node_info, session=self._session
+        session_nodes: list[Node]
+        with record_duration(self.timings, "nodes"):
+            session_nodes, connected, away_status = await asyncio.gather(
+                self._session.get_nodes(self.dev_id),
+                self._session.get_device_connected(self.dev_id),
+                self._session.get_device_away_status(self.dev_id),
             )
+        self._connected_status = self._connected_raw = connected["connected"]
+        self._away = away_status["away"]
+
+        # Nodes are independent from each other, bootstrap them all at once
+        node_requests = [
+            SmartboxNode.create(device=self, node_info=node_info, session=self._session)
+            for node_info in session_nodes
+        ]
+        nodes: list[SmartboxNode]
+        with record_duration(self.timings, "node_states"):
+            if any(
+                node_info["type"] == SmartboxNodeType.PMO for node_info in session_nodes
+            ):
+                self._power_limit, *nodes = await asyncio.gather(
+                    self._session.get_device_power_limit(self.dev_id), *node_requests
+                )
+            else:
+                nodes = await asyncio.gather(*node_requests)
+        for node in nodes:
+            self._nodes[(node.node_type, node.addr)] = node
 
+    @classmethod
+    def from_snapshot(
+        cls,
+        snapshot: dict[str, Any],
+        session: AsyncSmartboxSession | MagicMock,
+        hass: HomeAssistant,
+    ) -> "SmartboxDevice":
+        """Restore a device and its nodes from a snapshot without any request."""
+        self = cls(device=snapshot["device"], session=session, hass=hass)
+        # The restored state is not fresh until reconciled with the live API
+        self.last_seen = -math.inf
+        self._connected_status = self._connected_raw = snapshot["connected"]
+        self._away = snapshot["away"]
+        self._power_limit = snapshot["power_limit"]
+        for node_snapshot in snapshot["nodes"]:
+            node = SmartboxNode(
+                self,
+                node_snapshot["node_info"],
+                session,
+                node_snapshot["status"],
+                node_snapshot["setup"],
+            )
             self._nodes[(node.node_type, node.addr)] = node
-        _LOGGER.debug("Creating SocketSession for device %s", self.dev_id)
-        self.update_manager.subscribe_to_device_connected(self._connected)
-        self.update_manager.subscribe_to_device_away_status(self._away_status_update)
-        self.update_manager.subscribe_to_node_setup(self._node_setup_update)
-        self.update_manager.subscribe_to_device_power_limit(self._power_limit_update)
-        self.update_manager.subscribe_to_node_status(self._node_status_update)
-
-        _LOGGER.debug("Starting UpdateManager task for device %s", self.dev_id)
-        self._watchdog_task = asyncio.create_task(self.update_manager.run())
         return self
 
-    def _connected(self, connected: bool) -> None:
-        _LOGGER.debug("Connected connected update: %s", connected)
-        self._connected_status = connected
-        async_dispatcher_send(
-            self._hass,
-            f"{DOMAIN}_{self.dev_id}_connected",
-            self._connected_status,
+    def snapshot(self) -> dict[str, Any]:
+        """Return the last known state of the device and its nodes."""
+        return {
+            "device": dict(self._device),
+            "connected": self._connected_status,
+            "away": self._away,
+            "power_limit": self._power_limit,
+            "nodes": [
+                {
+                    "node_info": dict(node.node_info),
+                    "status": dict(node.status),
+                    "setup": dict(node.setup),
+                }
+                for node in self._nodes.values()
+            ],
+        }
+
+    async def async_reconcile(self) -> bool:
+        """Reconcile the device with the live API, dispatching only differences.
+
+        Return False if the nodes of the device changed, in which case the
+        device has to be set up again.
+        """
+        session_nodes: list[Node]
+        session_nodes, connected, away_status = await asyncio.gather(
+            self._session.get_nodes(self.dev_id),
+            self._session.get_device_connected(self.dev_id),
+            self._session.get_device_away_status(self.dev_id),
+        )
+        if {
+            (node_info["type"], node_info["addr"]) for node_info in session_nodes
+        } != set(self._nodes):
+            return False
+
+        nodes = list(self._nodes.values())
+        node_requests = [self._fetch_node_state(node) for node in nodes]
+        if any(node.node_type == SmartboxNodeType.PMO for node in nodes):
+            power_limit, *node_states = await asyncio.gather(
+                self._session.get_device_power_limit(self.dev_id), *node_requests
+            )
+            self.power_limit_update(power_limit)
+        else:
+            node_states = await asyncio.gather(*node_requests)
+
+        if self._connected_status != connected["connected"]:
+            self.connected_update(connected["connected"])
+        self.away_status_update(away_status)
+        self._apply_node_states(nodes, node_states)
+        self.last_seen = time.monotonic()
+        return True
+
+    async def async_resync(self) -> None:
+        """Fetch the state of all the nodes, dispatching only the changed ones.
+
+        Run after the socket reconnects, as the updates sent while it was
+        down are lost.
+        """
+        nodes = list(self._nodes.values())
+        node_states = await asyncio.gather(
+            *(self._fetch_node_state(node) for node in nodes)
         )
+        self._apply_node_states(nodes, node_states)
+        self.last_seen = time.monotonic()
 
-    def _away_status_update(self, away_status: dict[str, bool]) -> None:
-        _LOGGER.debug("Away status update: %s", away_status)
+    async def async_reconcile_node(self, node: "SmartboxNode") -> None:
+        """Correct the drift of a node, dispatching only the divergent fields.
+
+        The fetched state is dropped if a command was sent meanwhile, as it
+        may predate it.
+        """
+        start = time.monotonic()
+        node_state = await self._fetch_node_state(node)
+        if self.last_command < start:
+            self._apply_node_states([node], [node_state])
 
-        if self._away != away_status["away"]:
-            self._away = away_status["away"]
-            for node in self._nodes.values():
-                async_dispatcher_send(
-                    self._hass, f"{DOMAIN}_{node.node_id}_away_status", self._away
+    def _apply_node_states(
+        self,
+        nodes: list["SmartboxNode"],
+        node_states: list[tuple[StatusDict | None, SetupDict]],
+    ) -> None:
+        """Apply the fetched states of nodes, the updates only notify changes."""
+        for node, (status, setup) in zip(nodes, node_states, strict=True):
+            self.node_status_update(node.node_type, node.addr, status)
+            self.node_setup_update(node.node_type, node.addr, setup)
+
+    async def _fetch_node_state(
+        self, node: "SmartboxNode"
+    ) -> tuple[StatusDict | None, SetupDict]:
+        """Fetch the status and setup of a node, PMO status is polled apart."""
+        if node.node_type == SmartboxNodeType.PMO:
+            return None, await self._session.get_node_setup(self.dev_id, node.node_info)
+        status, setup = await asyncio.gather(
+            self._session.get_node_status(self.dev_id, node.node_info),
+            self._session.get_node_setup(self.dev_id, node.node_info),
+        )
+        return status, setup
+
+    async def async_poll_status(self) -> None:
+        """Poll the status of the nodes, PMO power is polled apart."""
+        nodes = [
+            node
+            for node in self._nodes.values()
+            if node.node_type != SmartboxNodeType.PMO
+        ]
+        statuses = await asyncio.gather(
+            *(
+                self._session.get_node_status(self.dev_id, node.node_info)
+                for node in nodes
+            )
+        )
+        for node, status in zip(nodes, statuses, strict=True):
+            self.node_status_update(node.node_type, node.addr, status)
+        self.last_seen = time.monotonic()
+
+    def set_stale(self, stale: bool) -> None:
+        """Set whether the state of the device is stale."""
+        if self.stale != stale:
+            self.stale = stale
+            self.subscribers.notify((None, None, "stale"), stale)
+
+    def connected_update(self, connected: bool) -> bool:
+        """Update the connection status of the device, return if it changed.
+
+        A transition is only dispatched once it lasted connected_debounce
+        seconds, a flap back within it is dropped and only counted.
+        """
+        _LOGGER.debug("Connected connected update: %s", connected)
+        changed = self._connected_raw != connected
+        if changed and self._connected_raw is not None:
+            self.metrics.flaps += 1
+        self._connected_raw = connected
+        self._cancel_debounce()
+        if connected != self._connected_status:
+            if self.connected_debounce:
+                self._cancel_connected = async_call_later(
+                    self._hass, self.connected_debounce, self._async_debounced
                 )
+            else:
+                self._set_connected(connected)
+        return changed
+
+    @callback
+    def _async_debounced(self, _now: datetime) -> None:
+        """Dispatch the connectivity that lasted the debounce."""
+        self._cancel_connected = None
+        self._set_connected(self._connected_raw)
+
+    def _set_connected(self, connected: bool | None) -> None:
+        """Set and dispatch the connectivity of the device."""
+        self._connected_status = connected
+        self.subscribers.notify((None, None, "connected"), connected)
+
+    def _cancel_debounce(self) -> None:
+        """Cancel the pending connectivity dispatch, if any."""
+        if self._cancel_connected is not None:
+            self._cancel_connected()
+            self._cancel_connected = None
+
+    def cancel_timers(self) -> None:
+        """Cancel the pending connectivity dispatch and node confirmations."""
+        self._cancel_debounce()
+        for node in self._nodes.values():
+            node.cancel_timers()
+
+    def away_status_update(self, away_status: dict[str, bool]) -> bool:
+        """Update the away status of the device, return if it changed."""
+        _LOGGER.debug("Away status update: %s", away_status)
+
+        if self._away == away_status["away"]:
+            return False
+        self._away = away_status["away"]
+        self.subscribers.notify((None, None, "away_status"), self._away)
+        return True
 
-    def _power_limit_update(self, power_limit: int) -> None:
+    def power_limit_update(self, power_limit: int) -> bool:
+        """Update the power limit of the device, return if it changed."""
         _LOGGER.debug("power_limit update: %s", power_limit)
-        if self._power_limit != power_limit:
-            self._power_limit = power_limit
-            async_dispatcher_send(
-                self._hass, f"{DOMAIN}_{self.dev_id}_power_limit", power_limit
-            )
+        if self._power_limit == power_limit:
+            return False
+        self._power_limit = power_limit
+        self.subscribers.notify((None, None, "power_limit"), power_limit)
+        return True
 
-    def _node_status_update(
+    def node_status_update(
         self, node_type: str, addr: int, node_status: StatusDict
-    ) -> None:
+    ) -> bool:
+        """Update the status of a node of the device, return if it changed."""
         if node_type == SmartboxNodeType.PMO:
-            return
+            return False
         _LOGGER.debug("Node status update: %s", node_status)
         if node_status is not None and (node_type, addr) in self._nodes:
             node: SmartboxNode | None = self._nodes.get((node_type, addr), None)
-            if node is not None and node.status != node_status:
-                node.update_status(node_status)
-                async_dispatcher_send(
-                    self._hass, f"{DOMAIN}_{node.node_id}_status", node_status
+            if node is not None and (fields := node.update_status(node_status)):
+                self.subscribers.notify(
+                    (node_type, addr, "status"), node_status, fields
                 )
+                return True
         else:
             _LOGGER.error(
                 "Received status update for unknown node %s %s", node_type, addr
             )
+        return False
 
-    def _node_setup_update(
+    def node_setup_update(
         self, node_type: str, addr: int, node_setup: SetupDict
-    ) -> None:
+    ) -> bool:
+        """Update the setup of a node of the device, return if it changed."""
         _LOGGER.debug("Node setup update: %s", node_setup)
         if (node_type, addr) in self._nodes:
             node: SmartboxNode | None = self._nodes.get((node_type, addr), None)
-            if node is not None and node.setup != node_setup:
-                node.update_setup(node_setup)
-                async_dispatcher_send(
-                    self._hass, f"{DOMAIN}_{node.node_id}_setup", node_setup
-                )
+            if node is not None and (fields := node.update_setup(node_setup)):
+                self.subscribers.notify((node_type, addr, "setup"), node_setup, fields)
+                return True
         else:
             _LOGGER.error(
                 "Received setup update for unknown node %s %s", node_type, addr
             )
+        return False
 
     @property
     def device(self) -> Device:
@@ -188,6 +755,11 @@ class SmartboxDevice:
         """Return the device id."""
         return self._device["dev_id"]
 
+    @property
+    def hass(self) -> HomeAssistant:
+        """Return the Home Assistant instance of the device."""
+        return self._hass
+
     def get_nodes(self) -> list["SmartboxNode"]:
         """Return all nodes."""
         for item in self._nodes:
@@ -219,19 +791,46 @@ class SmartboxDevice:
         """Is the device in away mode."""
         return self._away
 
-    async def set_away_status(self, away: bool) -> None:
-        """Set the away status."""
-        await self._session.set_device_away_status(self.dev_id, {"away": away})
-        self._away_status_update(away_status={"away": away})
+    def skip_command(self, *, matches: bool, force: bool = False) -> bool:
+        """Return whether to skip a command as it matches the fresh state.
+
+        The skipped commands are counted, a forced command is never skipped.
+        """
+        if (
+            force
+            or not matches
+            or self.stale
+            or time.monotonic() - self.last_seen > COMMAND_SUPPRESS_MAX_AGE
+        ):
+            return False
+        self.metrics.suppressed_commands += 1
+        return True
+
+    async def set_away_status(self, away: bool, *, force: bool = False) -> None:
+        """Set the away status, unless it already is."""
+        if self.skip_command(matches=self._away == away, force=force):
+            return
+        self.last_command = time.monotonic()
+        await self.command_metrics.async_track(
+            self._session.set_device_away_status(self.dev_id, {"away": away}),
+            {("away_status", "away"): away},
+        )
+        self.away_status_update(away_status={"away": away})
 
     @property
     def power_limit(self) -> int:
         """Get the power limit of the device."""
         return self._power_limit
 
-    async def set_power_limit(self, power_limit: int) -> None:
-        """Set the power limit of the device."""
-        await self._session.set_device_power_limit(self.dev_id, power_limit)
+    async def set_power_limit(self, power_limit: int, *, force: bool = False) -> None:
+        """Set the power limit of the device, unless it already is."""
+        if self.skip_command(matches=self._power_limit == power_limit, force=force):
+            return
+        self.last_command = time.monotonic()
+        await self.command_metrics.async_track(
+            self._session.set_device_power_limit(self.dev_id, power_limit),
+            {("power_limit",): power_limit},
+        )
         self._power_limit = power_limit
 
 
@@ -245,15 +844,30 @@ class SmartboxNode:
         session: AsyncSmartboxSession | MagicMock,
         status: StatusDict,
         setup: SetupDict,
-        samples: SamplesDict,
+        samples: SamplesDict | None = None,
     ) -> None:
-        """Initialise a smartbox node."""
+        """Initialise a smartbox node.
+
+        Samples are loaded lazily when left to None.
+        """
         self._device = device
         self._node_info = node_info
         self._session = session
         self._status = status
         self._setup = setup
         self._samples = samples
+        self._samples_task: asyncio.Task | None = None
+        # Monotonic durations of the startup phases of the node, in seconds
+        self.timings: dict[str, float] = {}
+        self._status_writer = MergedWriter(device.hass, self._write_status)
+        self._setup_writer = MergedWriter(device.hass, self._write_setup)
+        # Values of the commands applied locally but not confirmed yet, by kind
+        # and key, as the value to roll back to and the value commanded
+        self._optimistic: dict[str, dict[str, tuple[Any, Any]]] = {
+            "status": {},
+            "setup": {},
+        }
+        self._cancel_confirm: dict[str, CALLBACK_TYPE] = {}
 
     @classmethod
     async def create(
@@ -264,23 +878,24 @@ class SmartboxNode:
     ) -> None:
         """Create a smartbox node."""
         if node_info["type"] != SmartboxNodeType.PMO:
-            status: StatusDict = await session.get_node_status(device.dev_id, node_info)
+            status_request = session.get_node_status(device.dev_id, node_info)
         else:
-            status: StatusDict = {
+            status_request = session.get_device_power_limit(device.dev_id, node_info)
+        timings: dict[str, float] = {}
+        with record_duration(timings, "state"):
+            status, setup = await asyncio.gather(
+                status_request,
+                session.get_node_setup(device.dev_id, node_info),
+            )
+        if node_info["type"] == SmartboxNodeType.PMO:
+            status = {
                 "sync_status": "ok",
                 "locked": False,
-                "power": await session.get_device_power_limit(device.dev_id, node_info),
+                "power": status,
             }
-        setup: SetupDict = await session.get_node_setup(device.dev_id, node_info)
-        samples: SamplesDict = (
-            await session.get_node_samples(
-                device.dev_id,
-                node_info,
-                int(time.time() - (3600 * 3)),
-                int(time.time()),
-            )
-        )["samples"]
-        return cls(device, node_info, session, status, setup, samples)
+        self = cls(device, node_info, session, status, setup)
+        self.timings.update(timings)
+        return self
 
     @property
     def node_info(self) -> Node:
@@ -312,28 +927,51 @@ class SmartboxNode:
         """Return the status of node."""
         return self._status
 
-    def update_status(self, status: StatusDict) -> None:
-        """Update status."""
-        _LOGGER.debug("Updating node %s status: %s", self.name, status)
-        self._status |= {**status}
+    def update_status(self, status: StatusDict) -> set[str]:
+        """Update status, return the fields that changed."""
+        status = self._keep_optimistic("status", status)
+        fields = changed_fields(self._status, status)
+        if fields:
+            _LOGGER.debug("Updating node %s status: %s", self.name, status)
+            self._status |= {**status}
+        return fields
 
     @property
     def setup(self) -> SetupDict:
         """Setup of node."""
         return self._setup
 
-    def update_setup(self, setup: SetupDict) -> None:
-        """Update setup."""
-        _LOGGER.debug("Updating node %s setup: %s", self.name, setup)
-        self._setup = setup
-
-    async def set_status(self, **status_args: StatusDict) -> StatusDict:
-        """Set status."""
-        await self._session.set_node_status(
-            self._device.dev_id, self._node_info, status_args
+    def update_setup(self, setup: SetupDict) -> set[str]:
+        """Update setup, return the fields that changed."""
+        setup = self._keep_optimistic("setup", setup)
+        fields = changed_fields(self._setup, setup, merge=False)
+        if fields:
+            _LOGGER.debug("Updating node %s setup: %s", self.name, setup)
+            self._setup = setup
+        return fields
+
+    def subscribe(
+        self, kind: str, subscriber: Callable[..., None]
+    ) -> Callable[[], None]:
+        """Subscribe to an update of the node, or of its device."""
+        key: UpdateKey = (
+            (None, None, kind)
+            if kind in DEVICE_UPDATES
+            else (self.node_type, self.addr, kind)
         )
-        # update our status locally until we get an update
-        self._status |= {**status_args}
+        return self._device.subscribers.subscribe(key, subscriber)
+
+    async def set_status(
+        self, *, force: bool = False, **status_args: StatusDict
+    ) -> StatusDict:
+        """Set status, unless it already is and no other write is pending."""
+        if self._device.skip_command(
+            matches=not self._status_writer.pending.keys() & status_args.keys()
+            and _values_match(self._status, status_args),
+            force=force,
+        ):
+            return self._status
+        await self._async_write_optimistic("status", status_args)
         return self._status
 
     @property
@@ -367,14 +1005,13 @@ class SmartboxNode:
             raise KeyError(msg)
         return self._setup["window_mode_enabled"]
 
-    async def set_window_mode(self, window_mode: bool) -> bool:
-        """Set window mode."""
-        await self._session.set_node_setup(
-            self._device.dev_id,
-            self._node_info,
-            {"window_mode_enabled": window_mode},
+    async def set_window_mode(self, window_mode: bool, *, force: bool = False) -> bool:
+        """Set window mode, unless it already is."""
+        if self._skip_setup({"window_mode_enabled": window_mode}, force=force):
+            return window_mode
+        await self._async_write_optimistic(
+            "setup", {"window_mode_enabled": window_mode}
         )
-        self._setup["window_mode_enabled"] = window_mode
         return window_mode
 
     @property
@@ -385,21 +1022,178 @@ class SmartboxNode:
             raise KeyError(msg)
         return self._setup["true_radiant_enabled"]
 
-    async def set_true_radiant(self, true_radiant: bool) -> None:
-        """Set true radiant."""
-        await self._session.set_node_setup(
-            self._device.dev_id,
-            self._node_info,
-            {"true_radiant_enabled": true_radiant},
+    async def set_true_radiant(
+        self, true_radiant: bool, *, force: bool = False
+    ) -> None:
+        """Set true radiant, unless it already is."""
+        if self._skip_setup({"true_radiant_enabled": true_radiant}, force=force):
+            return
+        await self._async_write_optimistic(
+            "setup", {"true_radiant_enabled": true_radiant}
         )
-        self._setup["true_radiant_enabled"] = true_radiant
 
     async def set_extra_options(self, options: dict[str, Any]) -> None:
-        """Set window mode."""
-        await self._session.set_node_setup(
-            self._device.dev_id,
-            self._node_info,
-            {"extra_options": options},
+        """Set extra options, merged into the current ones."""
+        await self._async_write_optimistic("setup", {"extra_options": options})
+
+    async def _async_write_optimistic(self, kind: str, values: dict[str, Any]) -> None:
+        """Write status or setup values, shown until confirmed or failed.
+
+        The values are applied and dispatched before the write, and rolled back
+        if it fails, leaving the values of the other writes alone. Once
+        written, they are kept over the updates of the node reporting other
+        values, until an update confirms them. Without any confirmation in
+        time, the state of the node is fetched again.
+        """
+        self._device.last_command = time.monotonic()
+        state = self._state(kind)
+        previous = {
+            (f"node_{kind}", self.node_type, self.addr, key): state[key]
+            for key in values.keys() & state.keys()
+        }
+        applied = self._apply_optimistic(kind, values)
+        writer = self._status_writer if kind == "status" else self._setup_writer
+        metrics = self._device.command_metrics
+        start = metrics.record_command(
+            {
+                (f"node_{kind}", self.node_type, self.addr, key): value
+                for key, value in values.items()
+            },
+            previous,
+        )
+        try:
+            await writer.async_write(values)
+        except Exception:
+            metrics.record_failed(start)
+            self._rollback(kind, applied)
+            raise
+        pending = self._optimistic[kind]
+        for key in self._own_keys(kind, applied):
+            # accepted, a later failed write of the key rolls back to it
+            pending[key] = (applied[key], applied[key])
+        if pending:
+            if (cancel := self._cancel_confirm.pop(kind, None)) is not None:
+                cancel()
+            self._cancel_confirm[kind] = async_call_later(
+                self._device.hass,
+                OPTIMISTIC_CONFIRM_TIMEOUT,
+                partial(self._async_confirm_timeout, kind),
+            )
+
+    def _state(self, kind: str) -> dict[str, Any]:
+        """Return the status or setup of the node."""
+        return self._status if kind == "status" else self._setup
+
+    def _apply_optimistic(self, kind: str, values: dict[str, Any]) -> dict[str, Any]:
+        """Apply values locally, keeping the values to roll back to.
+
+        Return the values applied, with the nested ones merged.
+        """
+        state = self._state(kind)
+        pending = self._optimistic[kind]
+        # nested values, e.g. the extra options, are merged into the current ones
+        values = {
+            key: state[key] | value
+            if isinstance(value, dict) and isinstance(state.get(key), dict)
+            else value
+            for key, value in values.items()
+        }
+        for key, value in values.items():
+            previous = pending[key][0] if key in pending else state.get(key, _MISSING)
+            pending[key] = (previous, value)
+        self._dispatch(kind, values)
+        return values
+
+    def _keep_optimistic(self, kind: str, update: dict[str, Any]) -> dict[str, Any]:
+        """Return an update of the node with the pending values kept over it.
+
+        The pending values the update reports are confirmed. The others are
+        kept, as the update may predate the command, and rolled back to the
+        reported values if the write fails.
+        """
+        pending = self._optimistic[kind]
+        kept = {}
+        for key in pending.keys() & update.keys():
+            value = pending[key][1]
+            if _value_matches(update[key], value):
+                del pending[key]
+            else:
+                pending[key] = (update[key], value)
+                kept[key] = value
+        if not pending and (cancel := self._cancel_confirm.pop(kind, None)):
+            cancel()
+        return update | kept if kept else update
+
+    def _own_keys(self, kind: str, applied: dict[str, Any]) -> list[str]:
+        """Return the keys still pending with the values applied by a write."""
+        pending = self._optimistic[kind]
+        return [
+            key
+            for key, value in applied.items()
+            if key in pending and _value_matches(pending[key][1], value)
+        ]
+
+    def _rollback(self, kind: str, applied: dict[str, Any]) -> None:
+        """Restore the values of a failed write not confirmed yet."""
+        pending = self._optimistic[kind]
+        rollback = {key: pending.pop(key)[0] for key in self._own_keys(kind, applied)}
+        if not pending and (cancel := self._cancel_confirm.pop(kind, None)):
+            cancel()
+        if rollback:
+            _LOGGER.debug("Rolling back node %s %s: %s", self.name, kind, rollback)
+            self._dispatch(kind, rollback)
+
+    @callback
+    def _async_confirm_timeout(self, kind: str, _now: datetime) -> None:
+        """Keep the written values not confirmed, and fetch the node again."""
+        self._cancel_confirm.pop(kind, None)
+        _LOGGER.debug(
+            "Node %s %s not confirmed: %s", self.name, kind, self._optimistic[kind]
+        )
+        self._optimistic[kind] = {}
+        self._device.hass.async_create_background_task(
+            self._device.async_reconcile_node(self),
+            name=f"{DOMAIN}_confirm_{self.node_id}",
+        )
+
+    def _dispatch(self, kind: str, values: dict[str, Any]) -> None:
+        """Set local values of the node and notify the changed fields."""
+        state = self._state(kind)
+        fields = changed_fields(state, values)
+        for key, value in values.items():
+            if value is _MISSING:
+                state.pop(key, None)
+            else:
+                state[key] = value
+        if fields:
+            self._device.subscribers.notify(
+                (self.node_type, self.addr, kind), self._state(kind), fields
+            )
+
+    def cancel_timers(self) -> None:
+        """Cancel the pending confirmation timeouts, the local values are kept."""
+        for cancel in self._cancel_confirm.values():
+            cancel()
+        self._cancel_confirm.clear()
+
+    def _skip_setup(self, setup: SetupDict, *, force: bool) -> bool:
+        """Return whether to skip a setup write matching the fresh setup."""
+        return self._device.skip_command(
+            matches=not self._setup_writer.pending.keys() & setup.keys()
+            and _values_match(self._setup, setup),
+            force=force,
+        )
+
+    async def _write_status(self, status: StatusDict) -> None:
+        """Send merged status arguments to the API."""
+        await self._device.command_metrics.async_acknowledge(
+            self._session.set_node_status(self._device.dev_id, self._node_info, status)
+        )
+
+    async def _write_setup(self, setup: SetupDict) -> None:
+        """Send merged setup arguments to the API."""
+        await self._device.command_metrics.async_acknowledge(
+            self._session.set_node_setup(self._device.dev_id, self._node_info, setup)
         )
 
     def is_heating(self, status: dict[str, Any]) -> str:
@@ -428,9 +1222,40 @@ class SmartboxNode:
             self._samples = sample[-2:]
             _LOGGER.debug("Updating node %s samples: %s", self.name, self._samples)
 
+    async def async_load_samples(self) -> SamplesDict | None:
+        """Load the recent samples once, concurrent callers share the request."""
+        if self._samples is None:
+            await asyncio.shield(self._schedule_samples_load())
+        return self._samples
+
+    def _schedule_samples_load(self) -> asyncio.Task:
+        if self._samples_task is None:
+            # not started eagerly, the load resets it once done
+            self._samples_task = self._device.hass.async_create_background_task(
+                self._load_samples(),
+                f"{DOMAIN}_samples_{self.node_id}",
+                eager_start=False,
+            )
+        return self._samples_task
+
+    async def _load_samples(self) -> None:
+        try:
+            with record_duration(self.timings, "samples"):
+                samples = await self.get_samples(
+                    int(time.time() - (3600 * 3)),
+                    int(time.time()),
+                )
+        except (SmartboxError, APIUnavailableError) as ex:
+            _LOGGER.warning("Unable to load samples of node %s: %s", self.name, ex)
+        else:
+            if self._samples is None:
+                self._samples = samples[-2:]
+        finally:
+            self._samples_task = None
+
     async def get_samples(self, start_time: int, end_time: int) -> SamplesDict:
         """Update the samples."""
-        return (
+        samples = (
             await self._session.get_node_samples(
                 self.device.dev_id,
                 self._node_info,
@@ -438,10 +1263,14 @@ class SmartboxNode:
                 end_time,
             )
         )["samples"]
+        if self._samples is None and samples and end_time >= time.time():
+            # Up to date samples, memoise them for total_energy
+            self._samples = samples[-2:]
+        return samples
 
     @property
     def total_energy(self) -> float | None:
-        """Get the energy used."""
+        """Get the energy used, None until the samples are loaded."""
         if not self._samples:
             return None
         return self._samples[-1]["counter"]
@@ -501,6 +1330,367 @@ class SmartboxNode:
         return (boost_end_datetime - today).total_seconds()
 
 
+class SmartboxUpdateHub:
+    """Socket updates of an account session, routed to its devices by dev_id.
+
+    The Smartbox socket API is scoped to a device, so the hub still keeps one
+    socket per dev_id, but it owns their subscriptions and tasks and routes
+    each update to the current device with that dev_id. A device set up again
+    with the same dev_id reuses the running socket.
+
+    The sockets are supervised: while the socket of a device is down or
+    silent, the status of its nodes is polled instead, at most
+    max_concurrency devices at a time, and its entities become unavailable
+    once nothing was received for stale_after seconds. The updates sent while
+    a socket is down are lost: the dev_data snapshot sent on a new connection
+    is dispatched to the nodes like any update, but socket.io reconnects its
+    namespace by itself without one. The state of the nodes of a device is
+    fetched again when its socket recovers from being polled, or when its
+    namespace reconnected and no snapshot followed by the next check.
+
+    A slow reconciler also corrects the drift of the nodes from the API: every
+    RECONCILE_INTERVAL it fetches the state of a single node, taking the
+    devices in turn and skipping those polled, resyncing or recently sent a
+    command, so it never adds more than one node of requests at a time.
+    """
+
+    def __init__(
+        self,
+        session: AsyncSmartboxSession | MagicMock,
+        hass: HomeAssistant,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENT_DEVICES,
+    ) -> None:
+        """Initialise the hub of a session."""
+        self._session = session
+        self._hass = hass
+        self._devices: dict[str, SmartboxDevice] = {}
+        self._update_managers: dict[str, UpdateManager] = {}
+        self._tasks: dict[str, asyncio.Task] = {}
+        # Monotonic time of the last message of each socket
+        self._last_message: dict[str, float] = {}
+        self._pollers: dict[str, asyncio.Task] = {}
+        self._resyncs: dict[str, asyncio.Task] = {}
+        # Devices whose namespace connected, and reconnected since the last
+        # dev_data snapshot
+        self._connected: set[str] = set()
+        self._reconnected: set[str] = set()
+        self._poll_semaphore = asyncio.Semaphore(max_concurrency)
+        self._cancel_check: CALLBACK_TYPE | None = None
+        self._cancel_reconcile: CALLBACK_TYPE | None = None
+        self._reconcile_task: asyncio.Task | None = None
+        self._reconcile_device = -1
+        # Index of the node of each device to reconcile next
+        self._reconcile_nodes: dict[str, int] = {}
+        self.journal: TrafficJournal | None = None
+        self.stale_after = DEFAULT_STALE_AFTER
+
+    @property
+    def polled_dev_ids(self) -> list[str]:
+        """Return the ids of the devices polled while their socket is down."""
+        return list(self._pollers)
+
+    @property
+    def dev_ids(self) -> list[str]:
+        """Return the ids of the connected devices."""
+        return list(self._update_managers)
+
+    def add_device(self, device: SmartboxDevice) -> None:
+        """Route the updates of the device, connecting its socket if needed."""
+        dev_id = device.dev_id
+        self._devices[dev_id] = device
+        if dev_id in self._update_managers:
+            return
+        _LOGGER.debug("Creating SocketSession for device %s", dev_id)
+        update_manager = UpdateManager(self._session, dev_id)
+        self._subscribe(update_manager, dev_id)
+        self._update_managers[dev_id] = update_manager
+        self._last_message[dev_id] = time.monotonic()
+        _LOGGER.debug("Starting UpdateManager task for device %s", dev_id)
+        self._tasks[dev_id] = self._hass.async_create_background_task(
+            update_manager.run(), f"{DOMAIN}_update_manager_{dev_id}"
+        )
+        if self._cancel_check is None:
+            self._cancel_check = async_track_time_interval(
+                self._hass,
+                self._async_check_sockets,
+                timedelta(seconds=SOCKET_CHECK_INTERVAL),
+                name=f"{DOMAIN}_check_sockets",
+                cancel_on_shutdown=True,
+            )
+        if self._cancel_reconcile is None:
+            self._cancel_reconcile = async_track_time_interval(
+                self._hass,
+                self._async_reconcile_next,
+                timedelta(seconds=RECONCILE_INTERVAL),
+                name=f"{DOMAIN}_reconcile",
+                cancel_on_shutdown=True,
+            )
+
+    def _subscribe(self, update_manager: UpdateManager, dev_id: str) -> None:
+        """Subscribe to the updates of the socket of a device."""
+        route = partial(self._route, dev_id)
+        update_manager.subscribe_to_device_connected(route("connected"))
+        update_manager.subscribe_to_device_away_status(route("away_status"))
+        update_manager.subscribe_to_node_setup(route("node_setup", "setup"))
+        update_manager.subscribe_to_device_power_limit(route("power_limit"))
+        update_manager.subscribe_to_node_status(route("node_status", "status"))
+        # the snapshots of the nodes are dispatched by the subscriptions above
+        update_manager.subscribe_to_dev_data(
+            ".nodes", partial(self._async_dev_data, dev_id)
+        )
+        # The namespace has no connection callback, its handler is wrapped.
+        # on_connect is the handler of smartbox 2.3, as pinned in manifest.json
+        namespace = update_manager.socket_session.namespace
+        on_connect = namespace.on_connect
+
+        async def _on_connect() -> None:
+            await on_connect()
+            self._async_namespace_connected(dev_id)
+
+        namespace.on_connect = _on_connect
+
+    @callback
+    def _async_namespace_connected(self, dev_id: str) -> None:
+        """Record a reconnection of the namespace of a device."""
+        if dev_id not in self._connected:
+            self._connected.add(dev_id)
+            return
+        _LOGGER.info("Socket of device %s reconnected", dev_id)
+        self._devices[dev_id].metrics.reconnects += 1
+        self._reconnected.add(dev_id)
+
+    def _route(
+        self, dev_id: str, update: str, event: str | None = None
+    ) -> Callable[..., None]:
+        """Return a callback applying an update to the current device.
+
+        The node updates have the node type and address before the payload.
+        """
+
+        def _update(*args: Any) -> None:  # noqa: ANN401
+            device = self._devices[dev_id]
+            self._last_message[dev_id] = device.last_seen = time.monotonic()
+            if self.journal is not None:
+                self.journal.record_update(dev_id, update, args)
+            changed = getattr(device, f"{update}_update")(*args)
+            device.metrics.record_message(
+                event or update, args[-1], args[:-1], changed=changed
+            )
+            device.command_metrics.record_update(update, args[:-1], args[-1])
+
+        return _update
+
+    @callback
+    def _async_dev_data(self, dev_id: str, _nodes: list[dict[str, Any]]) -> None:
+        """Record the snapshot of a device, which needs no resync."""
+        self._reconnected.discard(dev_id)
+
+    @callback
+    def _async_resync(self, dev_id: str) -> None:
+        """Resync a device in the background, unless it is already running."""
+        if (task := self._resyncs.get(dev_id)) is not None and not task.done():
+            return
+        self._resyncs[dev_id] = self._hass.async_create_background_task(
+            self._async_resync_device(self._devices[dev_id]),
+            f"{DOMAIN}_resync_{dev_id}",
+        )
+
+    async def _async_resync_device(self, device: SmartboxDevice) -> None:
+        """Fetch the state of the nodes of a device."""
+        try:
+            await device.async_resync()
+        except (SmartboxError, APIUnavailableError, InvalidAuthError) as ex:
+            _LOGGER.warning("Unable to resync device %s: %s", device.dev_id, ex)
+        finally:
+            self._resyncs.pop(device.dev_id, None)
+
+    def _socket_alive(self, dev_id: str, now: float) -> bool:
+        """Return whether the socket of a device is connected and not silent."""
+        return (
+            bool(self._update_managers[dev_id].socket_session.namespace.connected)
+            and now - self._last_message[dev_id] < SOCKET_SILENCE_TIMEOUT
+        )
+
+    @callback
+    def _async_check_sockets(self, _now: datetime | None = None) -> None:
+        """Poll the devices whose socket is down, and check their staleness."""
+        now = time.monotonic()
+        for dev_id, device in self._devices.items():
+            if self._socket_alive(dev_id, now):
+                if (poller := self._pollers.pop(dev_id, None)) is not None:
+                    _LOGGER.info("Socket of device %s is back, stop polling", dev_id)
+                    poller.cancel()
+                    self._reconnected.discard(dev_id)
+                    self._async_resync(dev_id)
+                elif dev_id in self._reconnected:
+                    _LOGGER.info(
+                        "Socket of device %s reconnected without a snapshot, "
+                        "resyncing it",
+                        dev_id,
+                    )
+                    self._reconnected.discard(dev_id)
+                    self._async_resync(dev_id)
+                device.set_stale(stale=False)
+                continue
+            if dev_id not in self._pollers:
+                _LOGGER.warning("Socket of device %s is down, polling it", dev_id)
+                self._pollers[dev_id] = self._hass.async_create_background_task(
+                    self._async_poll(device), f"{DOMAIN}_poll_{dev_id}"
+                )
+            device.set_stale(
+                stale=bool(self.stale_after)
+                and now - device.last_seen > self.stale_after
+            )
+
+    async def _async_poll(self, device: SmartboxDevice) -> None:
+        """Poll the status of a device, with a jitter and a backoff on errors."""
+        interval = POLL_INTERVAL
+        while True:
+            async with self._poll_semaphore:
+                try:
+                    await device.async_poll_status()
+                except (SmartboxError, APIUnavailableError, InvalidAuthError) as ex:
+                    interval = min(interval * 2, POLL_MAX_INTERVAL)
+                    _LOGGER.warning(
+                        "Unable to poll device %s, retrying in %ss: %s",
+                        device.dev_id,
+                        interval,
+                        ex,
+                    )
+                else:
+                    interval = POLL_INTERVAL
+                    device.set_stale(stale=False)
+            await asyncio.sleep(
+                interval * random.uniform(1 - POLL_JITTER, 1 + POLL_JITTER)  # noqa: S311
+            )
+
+    @callback
+    def _async_reconcile_next(self, _now: datetime | None = None) -> None:
+        """Reconcile the next node of the next device, if none is running."""
+        if self._reconcile_task is not None and not self._reconcile_task.done():
+            return
+        now = time.monotonic()
+        devices = [
+            device
+            for dev_id, device in self._devices.items()
+            if dev_id not in self._pollers
+            and dev_id not in self._resyncs
+            and now - device.last_command > COMMAND_QUIET_PERIOD
+            and device.get_nodes()
+        ]
+        if not devices:
+            return
+        self._reconcile_device = (self._reconcile_device + 1) % len(devices)
+        device = devices[self._reconcile_device]
+        nodes = list(device.get_nodes())
+        index = (self._reconcile_nodes.get(device.dev_id, -1) + 1) % len(nodes)
+        self._reconcile_nodes[device.dev_id] = index
+        self._reconcile_task = self._hass.async_create_background_task(
+            self._async_reconcile_node(device, nodes[index]),
+            f"{DOMAIN}_reconcile_{device.dev_id}",
+        )
+
+    async def _async_reconcile_node(
+        self, device: SmartboxDevice, node: "SmartboxNode"
+    ) -> None:
+        """Reconcile a node of a device."""
+        try:
+            await device.async_reconcile_node(node)
+        except (SmartboxError, APIUnavailableError, InvalidAuthError) as ex:
+            _LOGGER.debug("Unable to reconcile node %s: %s", node.name, ex)
+
+    def start_journal(self, path: Path) -> None:
+        """Record the socket updates and session calls to a journal."""
+        if self.journal is None:
+            _LOGGER.info("Recording the traffic to %s", path)
+            self.journal = TrafficJournal(self._hass, path)
+            self.journal.attach(self._session)
+
+    async def async_stop_journal(self) -> None:
+        """Stop recording the traffic, if it is."""
+        if self.journal is not None:
+            await self.journal.async_close()
+            self.journal = None
+
+    async def async_stop(self) -> None:
+        """Disconnect all the sockets and cancel their tasks."""
+        await self.async_stop_journal()
+        for device in self._devices.values():
+            device.cancel_timers()
+        if self._cancel_check is not None:
+            self._cancel_check()
+            self._cancel_check = None
+        if self._cancel_reconcile is not None:
+            self._cancel_reconcile()
+            self._cancel_reconcile = None
+        if self._reconcile_task is not None:
+            self._reconcile_task.cancel()
+            self._reconcile_task = None
+        for poller in self._pollers.values():
+            poller.cancel()
+        self._pollers.clear()
+        for resync in self._resyncs.values():
+            resync.cancel()
+        self._resyncs.clear()
+        self._connected.clear()
+        self._reconnected.clear()
+        for update_manager in self._update_managers.values():
+            await update_manager.cancel()
+        for task in self._tasks.values():
+            task.cancel()
+        self._update_managers.clear()
+        self._tasks.clear()
+        self._devices.clear()
+
+
+@contextmanager
+def record_duration(timings: dict[str, float], phase: str) -> Iterator[None]:
+    """Record the monotonic duration of a phase in timings, in seconds."""
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        timings[phase] = round(time.monotonic() - start, 3)
+
+
+def _values_match(current: dict[str, Any], values: dict[str, Any]) -> bool:
+    """Return whether the current values already are the values.
+
+    The API has numbers as strings, so they are compared as strings too.
+    """
+    return all(
+        key in current and _value_matches(current[key], value)
+        for key, value in values.items()
+    )
+
+
+def _value_matches(current: Any, value: Any) -> bool:  # noqa: ANN401
+    """Return whether a current value already is a value.
+
+    A nested value, e.g. the extra options, matches the current one having
+    at least its keys with the same values.
+    """
+    if isinstance(current, dict) and isinstance(value, dict):
+        return _values_match(current, value)
+    return current == value or str(current) == str(value)
+
+
+def changed_fields(
+    current: dict[str, Any], update: dict[str, Any], *, merge: bool = True
+) -> set[str]:
+    """Return the fields an update changes.
+
+    A merged update only changes the fields it has, otherwise it replaces the
+    current values and the fields it no longer has are changed too.
+    """
+    fields = {
+        key for key, value in update.items() if current.get(key, _MISSING) != value
+    }
+    if not merge:
+        fields.update(current.keys() - update.keys())
+    return fields
+
+
 def get_temperature_unit(status: StatusDict) -> None | UnitOfTemperature:
     """Get the unit of temperature."""
     if "units" not in status:
@@ -514,21 +1704,112 @@ def get_temperature_unit(status: StatusDict) -> None | UnitOfTemperature:
     raise ValueError(msg)
 
 
-async def get_devices(
-    session: AsyncSmartboxSession | MagicMock, hass: HomeAssistant
-) -> list[SmartboxDevice]:
-    """Get the devices."""
+async def get_session_devices(
+    session: AsyncSmartboxSession | MagicMock,
+) -> list[Device]:
+    """Get the devices of every home of the session."""
     homes: list[dict[str, Any]] = await session.get_homes()
-    devices: list[SmartboxDevice] = []
+    session_devices: list[Device] = []
     for home in homes:
         _home = home.copy()
         del _home["devs"]
         for session_device in home["devs"]:
             session_device["home"] = _home
-            devices.append(
-                await SmartboxDevice.initialise_nodes(session_device, session, hass)
+            session_devices.append(session_device)
+    return session_devices
+
+
+async def initialise_devices(
+    session_devices: list[Device],
+    session: AsyncSmartboxSession | MagicMock,
+    hass: HomeAssistant,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENT_DEVICES,
+    on_device: Callable[[SmartboxDevice], None] | None = None,
+) -> list[tuple[Device, Exception]]:
+    """Initialise the devices, at most max_concurrency at a time.
+
+    on_device is called as soon as each device is initialised, so that its
+    entities do not wait for the slowest device. A device failing to
+    initialise is logged and returned with its error.
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def _initialise(session_device: Device) -> None:
+        async with semaphore:
+            device = await SmartboxDevice.initialise_nodes(
+                session_device, session, hass
+            )
+        if on_device is not None:
+            on_device(device)
+
+    results = await asyncio.gather(
+        *(_initialise(session_device) for session_device in session_devices),
+        return_exceptions=True,
+    )
+    failures: list[tuple[Device, Exception]] = []
+    for session_device, result in zip(session_devices, results, strict=True):
+        if isinstance(result, Exception):
+            _LOGGER.error(
+                "Failed to initialise device %s: %s", session_device["dev_id"], result
             )
-    return devices
+            failures.append((session_device, result))
+        elif isinstance(result, BaseException):
+            raise result
+    return failures
+
+
+def devices_snapshot(
+    devices: list[SmartboxDevice], pending: list[Device] | None = None
+) -> dict[str, Any]:
+    """Return a snapshot of the devices, to be persisted for a warm start.
+
+    pending are the session devices not initialised yet, initialised again by
+    the warm start.
+    """
+    snapshot: dict[str, Any] = {"devices": [device.snapshot() for device in devices]}
+    if pending:
+        snapshot["pending"] = pending
+    return snapshot
+
+
+def devices_from_snapshot(
+    snapshot: dict[str, Any],
+    session: AsyncSmartboxSession | MagicMock,
+    hass: HomeAssistant,
+) -> list[SmartboxDevice]:
+    """Restore the devices from a snapshot."""
+    return [
+        SmartboxDevice.from_snapshot(device_snapshot, session, hass)
+        for device_snapshot in snapshot["devices"]
+    ]
+
+
+async def reconcile_devices(
+    devices: list[SmartboxDevice],
+    session: AsyncSmartboxSession | MagicMock,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENT_DEVICES,
+    pending: list[Device] | None = None,
+) -> bool:
+    """Reconcile restored devices with the live API.
+
+    Return False if the devices or nodes of the account changed since the
+    snapshot was taken, the pending devices of the snapshot included.
+    """
+    homes: list[dict[str, Any]] = await session.get_homes()
+    if {
+        session_device["dev_id"] for home in homes for session_device in home["devs"]
+    } != {device.dev_id for device in devices} | {
+        session_device["dev_id"] for session_device in pending or []
+    }:
+        return False
+
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def _reconcile(device: SmartboxDevice) -> bool:
+        async with semaphore:
+            return await device.async_reconcile()
+
+    return all(await asyncio.gather(*(_reconcile(device) for device in devices)))
 
 
 def _check_status_key(key: str, node_type: str, status: dict[str, Any]) -> None:
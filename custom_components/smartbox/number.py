@@ -13,7 +13,7 @@ from homeassistant.const import (
     UnitOfTemperature,
     UnitOfTime,
 )
-from homeassistant.core import HomeAssistant, ServiceCall
+from homeassistant.core import HomeAssistant, ServiceCall, callback
 from homeassistant.helpers import (
     config_validation as cv,
     device_registry as dr,
@@ -24,8 +24,12 @@ import voluptuous as vol
 
 from . import SmartboxConfigEntry
 from .const import ATTR_DURATION, DEFAULT_BOOST_TIME, DOMAIN, SERVICE_SET_BOOST_PARAMS
-from .entity import SmartBoxDeviceEntity, SmartBoxNodeEntity
-from .models import get_temperature_unit
+from .entity import (
+    SmartBoxDeviceEntity,
+    SmartBoxNodeEntity,
+    async_setup_device_entities,
+)
+from .models import SmartboxDevice, get_temperature_unit
 
 _LOGGER = logging.getLogger(__name__)
 _MAX_POWER_LIMIT = 9999
@@ -39,32 +43,23 @@ async def async_setup_entry(
     """Set up platform."""
     _LOGGER.debug("Setting up Smartbox number platform")
 
-    # Add power limit entities
-    async_add_entities(
-        [
-            PowerLimit(device, entry)
-            for device in entry.runtime_data.devices
-            if device.power_limit != 0
-        ],
-        update_before_add=True,
-    )
-    # Add boost temperature and duration entities for each heater
-    boost_entities = []
-    boost_entities.extend(
-        [
-            ConfigBoostTemperature(node, entry)
-            for node in entry.runtime_data.nodes
-            if node.boost_available
-        ],
-    )
-    boost_entities.extend(
-        [
-            ConfigBoostDuration(node, entry)
-            for node in entry.runtime_data.nodes
-            if node.boost_available
+    boost_entities: list[ConfigBoostTemperature | ConfigBoostDuration] = []
+
+    @callback
+    def _async_add_device(device: SmartboxDevice) -> None:
+        # Add power limit entity
+        if device.power_limit != 0:
+            async_add_entities([PowerLimit(device, entry)], update_before_add=True)
+        # Add boost temperature and duration entities for each heater
+        nodes = [node for node in device.get_nodes() if node.boost_available]
+        device_boost_entities = [
+            *(ConfigBoostTemperature(node, entry) for node in nodes),
+            *(ConfigBoostDuration(node, entry) for node in nodes),
         ]
-    )
-    async_add_entities(boost_entities, update_before_add=True)
+        boost_entities.extend(device_boost_entities)
+        async_add_entities(device_boost_entities, update_before_add=True)
+
+    async_setup_device_entities(hass, entry, _async_add_device)
 
     async def handle_set_boost_params(call: ServiceCall) -> None:  # pragma: no cover
         """Handle the service call."""
@@ -138,6 +133,7 @@ class ConfigBoostTemperature(SmartBoxNodeEntity, NumberEntity):
 
     _attr_key = "config_boost_temperature"
     _attr_websocket_event = "setup"
+    _attr_websocket_fields = frozenset({"extra_options"})
     _attr_mode = NumberMode.SLIDER
     _attr_entity_category = EntityCategory.CONFIG
     _attr_device_class = NumberDeviceClass.TEMPERATURE
@@ -168,6 +164,7 @@ class ConfigBoostDuration(SmartBoxNodeEntity, NumberEntity):
 
     _attr_key = "config_boost_duration"
     _attr_websocket_event = "setup"
+    _attr_websocket_fields = frozenset({"extra_options"})
     _attr_mode = NumberMode.SLIDER
     _attr_entity_category = EntityCategory.CONFIG
     _attr_native_unit_of_measurement = UnitOfTime.MINUTES
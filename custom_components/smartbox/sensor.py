@@ -4,6 +4,7 @@ from datetime import datetime, timedelta
 import logging
 import math
 import time
+from typing import Any
 from unittest.mock import MagicMock
 
 from dateutil import tz
@@ -29,8 +30,9 @@ from homeassistant.const import (
     UnitOfEnergy,
     UnitOfPower,
     UnitOfTemperature,
+    UnitOfTime,
 )
-from homeassistant.core import HomeAssistant
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.event import async_track_time_interval
 from homeassistant.util import dt
@@ -40,80 +42,95 @@ from .const import (
     CONF_HISTORY_CONSUMPTION,
     CONF_TIMEDELTA_POWER,
     DEFAULT_TIMEDELTA_POWER,
+    METRICS_UPDATE_INTERVAL,
     HistoryConsumptionStatus,
     SmartboxNodeType,
 )
-from .entity import SmartBoxNodeEntity
-from .models import SmartboxNode, get_temperature_unit
+from .entity import (
+    SmartBoxDeviceEntity,
+    SmartBoxNodeEntity,
+    async_setup_device_entities,
+)
+from .models import SmartboxDevice, SmartboxNode, get_temperature_unit, record_duration
 
 _LOGGER = logging.getLogger(__name__)
 SCAN_INTERVAL = timedelta(minutes=15)
+# Status fields of the lock attribute and the availability of every sensor
+_BASE_FIELDS = frozenset({"locked", "sync_status"})
 
 
 async def async_setup_entry(
-    _: HomeAssistant,
+    hass: HomeAssistant,
     entry: SmartboxConfigEntry,
     async_add_entities: AddEntitiesCallback,
 ) -> None:
     """Set up platform."""
     _LOGGER.debug("Setting up Smartbox sensor platform")
-    # Temperature
-    async_add_entities(
-        [
-            TemperatureSensor(node, entry)
-            for node in entry.runtime_data.nodes
-            if node.heater_node
-        ],
-        update_before_add=True,
-    )
-    # Power
-    async_add_entities(
-        [
-            PowerSensor(node, entry)
-            for node in entry.runtime_data.nodes
-            # if is_heater_node(node) and node.node_type != SmartboxNodeType.HTR_MOD
-        ],
-        update_before_add=True,
-    )
-    # Duty Cycle and Energy
-    # Only nodes of type 'htr' seem to report the duty cycle, which is needed
-    # to compute energy consumption
-    async_add_entities(
-        [
-            DutyCycleSensor(node, entry)
-            for node in entry.runtime_data.nodes
-            if node.node_type == SmartboxNodeType.HTR
-        ],
-        update_before_add=True,
-    )
-    async_add_entities(
-        [TotalConsumptionSensor(node, entry) for node in entry.runtime_data.nodes],
-        update_before_add=True,
-    )
-
-    # Charge Level
-    async_add_entities(
-        [
-            ChargeLevelSensor(node, entry)
-            for node in entry.runtime_data.nodes
-            if node.heater_node and node.node_type == SmartboxNodeType.ACM
-        ],
-        update_before_add=True,
-    )
-    async_add_entities(
-        [
-            BoostEndTimeSensor(node, entry)
-            for node in entry.runtime_data.nodes
-            if node.boost_available
-        ],
-        update_before_add=True,
-    )
+
+    @callback
+    def _async_add_device(device: SmartboxDevice) -> None:
+        nodes = device.get_nodes()
+        # Temperature
+        async_add_entities(
+            [TemperatureSensor(node, entry) for node in nodes if node.heater_node],
+            update_before_add=True,
+        )
+        # Power
+        async_add_entities(
+            [
+                PowerSensor(node, entry)
+                for node in nodes
+                # if is_heater_node(node) and node.node_type != SmartboxNodeType.HTR_MOD
+            ],
+            update_before_add=True,
+        )
+        # Duty Cycle and Energy
+        # Only nodes of type 'htr' seem to report the duty cycle, which is needed
+        # to compute energy consumption
+        async_add_entities(
+            [
+                DutyCycleSensor(node, entry)
+                for node in nodes
+                if node.node_type == SmartboxNodeType.HTR
+            ],
+            update_before_add=True,
+        )
+        # Samples are loaded in the background once the sensor is added
+        async_add_entities([TotalConsumptionSensor(node, entry) for node in nodes])
+
+        # Charge Level
+        async_add_entities(
+            [
+                ChargeLevelSensor(node, entry)
+                for node in nodes
+                if node.heater_node and node.node_type == SmartboxNodeType.ACM
+            ],
+            update_before_add=True,
+        )
+        async_add_entities(
+            [BoostEndTimeSensor(node, entry) for node in nodes if node.boost_available],
+            update_before_add=True,
+        )
+        # Socket metrics, disabled by default
+        if nodes:
+            async_add_entities(
+                [
+                    SocketMessageRateSensor(device, entry),
+                    DispatchLatencySensor(device, entry),
+                    CommandAckLatencySensor(device, entry),
+                    CommandRoundTripSensor(device, entry),
+                ]
+            )
+
+    async_setup_device_entities(hass, entry, _async_add_device)
     _LOGGER.debug("Finished setting up Smartbox sensor platform")
 
 
 class SmartboxSensorBase(SmartBoxNodeEntity, SensorEntity):
     """Base class for Smartbox sensor."""
 
+    _attr_websocket_fields = _BASE_FIELDS
+
     def __init__(
         self,
         node: SmartboxNode | MagicMock,
@@ -135,13 +152,17 @@ class SmartboxSensorBase(SmartBoxNodeEntity, SensorEntity):
     @property
     def available(self) -> bool:
         """Return the availability of the sensor."""
-        return self._available
+        return self._available and super().available
 
 
 class TemperatureSensor(SmartboxSensorBase):
     """Smartbox heater temperature sensor."""
 
     _attr_key = "temperature"
+    _attr_websocket_fields = _BASE_FIELDS | {
+        "mtemp",
+        "units",
+    }
     device_class = SensorDeviceClass.TEMPERATURE
     state_class = SensorStateClass.MEASUREMENT
 
@@ -167,29 +188,58 @@ class PowerSensor(SmartboxSensorBase):
     """
 
     _attr_key = "power"
+    _attr_websocket_fields = _BASE_FIELDS | {
+        "power",
+        "active",
+        "charging",
+    }
     device_class = SensorDeviceClass.POWER
     native_unit_of_measurement = UnitOfPower.WATT
     state_class = SensorStateClass.MEASUREMENT
     entity_category = EntityCategory.DIAGNOSTIC
 
+    _cancel_pmo_update: CALLBACK_TYPE | None = None
+
     async def async_added_to_hass(self) -> None:
         """When added to hass."""
         await super().async_added_to_hass()
         if self._node.node_type == SmartboxNodeType.PMO:
             self._attr_should_poll = True
-            self.async_on_remove(
-                async_track_time_interval(
-                    self.hass,
-                    self._async_update_pmo,
-                    timedelta(
-                        seconds=self.config_entry.options.get(
-                            CONF_TIMEDELTA_POWER, DEFAULT_TIMEDELTA_POWER
-                        )
-                    ),
-                    name=f"Update PMO Power - {self.name}",
-                    cancel_on_shutdown=True,
+            self._async_track_pmo_power()
+
+    async def async_will_remove_from_hass(self) -> None:
+        """When removed from hass."""
+        await super().async_will_remove_from_hass()
+        if self._cancel_pmo_update is not None:
+            self._cancel_pmo_update()
+            self._cancel_pmo_update = None
+
+    @callback
+    def _async_track_pmo_power(self) -> None:
+        """Schedule the update of the PMO power at the configured interval."""
+        if self._cancel_pmo_update is not None:
+            self._cancel_pmo_update()
+        self._cancel_pmo_update = async_track_time_interval(
+            self.hass,
+            self._async_update_pmo,
+            timedelta(
+                seconds=self.config_entry.options.get(
+                    CONF_TIMEDELTA_POWER, DEFAULT_TIMEDELTA_POWER
                 )
-            )
+            ),
+            name=f"Update PMO Power - {self.name}",
+            cancel_on_shutdown=True,
+        )
+
+    @callback
+    def _async_options_updated(self, changed: set[str]) -> None:
+        """Apply the changed options in place."""
+        super()._async_options_updated(changed)
+        if (
+            CONF_TIMEDELTA_POWER in changed
+            and self._node.node_type == SmartboxNodeType.PMO
+        ):
+            self._async_track_pmo_power()
 
     async def _async_update_pmo(self, _) -> None:  # noqa: ANN001
         """Get the latest data."""
@@ -214,6 +264,7 @@ class DutyCycleSensor(SmartboxSensorBase):
     """Smartbox heater duty cycle sensor: Represents the duty cycle for the heater."""
 
     _attr_key = "duty_cycle"
+    _attr_websocket_fields = _BASE_FIELDS | {"duty"}
     device_class = SensorDeviceClass.POWER_FACTOR
     native_unit_of_measurement = PERCENTAGE
     state_class = SensorStateClass.MEASUREMENT
@@ -249,8 +300,9 @@ class TotalConsumptionSensor(SmartboxSensorBase):
         # perform initial statistics import when sensor is added, otherwise it would take
         # 1 day when _handle_coordinator_update is triggered for the first time.
         self._available = True
-        await self.update_statistics()
-        await self._adjust_short_term_statistics()
+        with record_duration(self._node.timings, "statistics_import"):
+            await self.update_statistics()
+            await self._adjust_short_term_statistics()
         await super().async_added_to_hass()
         self.async_on_remove(
             async_track_time_interval(
@@ -261,6 +313,37 @@ class TotalConsumptionSensor(SmartboxSensorBase):
                 cancel_on_shutdown=True,
             )
         )
+        self.config_entry.async_create_background_task(
+            self.hass,
+            self._async_load_samples(),
+            f"Load samples - {self.name}",
+        )
+
+    @callback
+    def _async_options_updated(self, changed: set[str]) -> None:
+        """Apply the changed options in place."""
+        super()._async_options_updated(changed)
+        # Import the history when asked to, the sensor sets the status back
+        # to auto once done, without it being applied as a change.
+        if CONF_HISTORY_CONSUMPTION not in changed:
+            return
+        runtime_data = self.config_entry.runtime_data
+        runtime_data.history_import = (
+            self.config_entry.options.get(CONF_HISTORY_CONSUMPTION)
+            == HistoryConsumptionStatus.START
+        )
+        if runtime_data.history_import:
+            runtime_data.history_imported.discard(self._node.node_id)
+            self.config_entry.async_create_background_task(
+                self.hass,
+                self.update_statistics(),
+                f"Import history - {self.name}",
+            )
+
+    async def _async_load_samples(self) -> None:
+        """Load the samples off the setup critical path and update the state."""
+        await self._node.async_load_samples()
+        self.async_write_ha_state()
 
     async def _adjust_short_term_statistics(self) -> None:
         """Adjust the short term statistics for the sensor."""
@@ -295,14 +378,25 @@ class TotalConsumptionSensor(SmartboxSensorBase):
         )
         statistic_id = f"{self.entity_id}"
         samples_data = []
-        if history_status == HistoryConsumptionStatus.START:
-            # last 3 years
+        runtime_data = self.config_entry.runtime_data
+        if (
+            history_status != HistoryConsumptionStatus.OFF
+            and runtime_data.history_import
+            and self._node.node_id not in runtime_data.history_imported
+        ):
+            # last 3 years, the nodes of the devices set up after the first
+            # import still import it, as the options are set to auto by then
             for year in (3, 2, 1):
                 year_sample = await self._node.get_samples(
                     int(time.time() - (year * 365 * 24 * 60 * 60)),
                     int(time.time() - ((year - 1) * 365 * 24 * 60 * 60 - 3600)),
                 )
                 samples_data.extend(year_sample)
+            runtime_data.history_imported.add(self._node.node_id)
+            # the other nodes of this run still import the history
+            runtime_data.options[CONF_HISTORY_CONSUMPTION] = (
+                HistoryConsumptionStatus.AUTO
+            )
             self.hass.config_entries.async_update_entry(
                 entry=self.config_entry,
                 options={
@@ -310,7 +404,7 @@ class TotalConsumptionSensor(SmartboxSensorBase):
                     CONF_HISTORY_CONSUMPTION: HistoryConsumptionStatus.AUTO,
                 },
             )
-        elif history_status == HistoryConsumptionStatus.AUTO:
+        elif history_status != HistoryConsumptionStatus.OFF:
             # last day
             samples_data = await self._node.get_samples(
                 int(time.time() - (24 * 60 * 60)),
@@ -331,7 +425,7 @@ class TotalConsumptionSensor(SmartboxSensorBase):
         if statistics and history_status != HistoryConsumptionStatus.OFF:
             metadata: StatisticMetaData = StatisticMetaData(
                 mean_type=StatisticMeanType.NONE,
-                unit_class = None,
+                unit_class=None,
                 has_sum=True,
                 source=RECORDER_DOMAIN,
                 name=statistic_id,
@@ -339,13 +433,14 @@ class TotalConsumptionSensor(SmartboxSensorBase):
                 unit_of_measurement=self.native_unit_of_measurement,
             )
             _LOGGER.debug("Insert statistics: %s %s", metadata, statistics)
-            async_import_statistics(self.hass, metadata, statistics )
+            async_import_statistics(self.hass, metadata, statistics)
 
 
 class ChargeLevelSensor(SmartboxSensorBase):
     """Smartbox storage heater charge level sensor."""
 
     _attr_key = "charge_level"
+    _attr_websocket_fields = _BASE_FIELDS | {"charge_level"}
     device_class = SensorDeviceClass.BATTERY
     native_unit_of_measurement = PERCENTAGE
     state_class = SensorStateClass.MEASUREMENT
@@ -360,6 +455,10 @@ class BoostEndTimeSensor(SmartboxSensorBase):
     """Smartbox end boost time sensor."""
 
     _attr_key = "boost_end_time"
+    _attr_websocket_fields = _BASE_FIELDS | {
+        "boost",
+        "boost_end_min",
+    }
     device_class = SensorDeviceClass.TIMESTAMP
 
     @property
@@ -374,3 +473,131 @@ class BoostEndTimeSensor(SmartboxSensorBase):
         if boost_end_time < dt.now():
             boost_end_time = boost_end_time + timedelta(days=1)
         return boost_end_time
+
+
+class SocketMetricsSensorBase(SmartBoxDeviceEntity, SensorEntity):
+    """Base class of the socket metrics sensors of a device."""
+
+    _attr_websocket_event = "connected"
+    _attr_available_when_stale = True
+    entity_category = EntityCategory.DIAGNOSTIC
+    entity_registry_enabled_default = False
+    state_class = SensorStateClass.MEASUREMENT
+
+    async def async_added_to_hass(self) -> None:
+        """Write the metrics at a regular interval."""
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            async_track_time_interval(
+                self.hass,
+                self._async_write_metrics,
+                timedelta(seconds=METRICS_UPDATE_INTERVAL),
+                name=f"Update socket metrics - {self.entity_id}",
+                cancel_on_shutdown=True,
+            )
+        )
+
+    @callback
+    def _async_write_metrics(self, _now: datetime) -> None:
+        """Write the current metrics."""
+        self.async_write_ha_state()
+
+
+class SocketMessageRateSensor(SocketMetricsSensorBase):
+    """Socket messages per second of a device, over the last minute."""
+
+    _attr_key = "socket_message_rate"
+    native_unit_of_measurement = "msg/s"
+
+    @property
+    def native_value(self) -> float:
+        """Return the native value of the sensor."""
+        return self._device.metrics.rate
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Return the rates by event and the update counters."""
+        metrics = self._device.metrics
+        return {
+            "rates": metrics.rates(),
+            "messages": metrics.messages,
+            "duplicates": metrics.duplicates,
+            "noops": metrics.noops,
+            "reconnects": metrics.reconnects,
+            "flaps": metrics.flaps,
+        }
+
+
+class DispatchLatencySensor(SocketMetricsSensorBase):
+    """Mean delay from a socket update of a device to its state write."""
+
+    _attr_key = "dispatch_latency"
+    device_class = SensorDeviceClass.DURATION
+    native_unit_of_measurement = UnitOfTime.MILLISECONDS
+
+    @property
+    def native_value(self) -> float | None:
+        """Return the native value of the sensor."""
+        return self._device.metrics.mean_latency
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Return the histogram of the delays, by upper bound in ms."""
+        return {
+            "histogram": {
+                str(bound): count
+                for bound, count in self._device.metrics.latency_histogram.items()
+            }
+        }
+
+
+class CommandAckLatencySensor(SocketMetricsSensorBase):
+    """Mean delay from a command of a device to its acknowledgement by the API."""
+
+    _attr_key = "command_ack_latency"
+    device_class = SensorDeviceClass.DURATION
+    native_unit_of_measurement = UnitOfTime.MILLISECONDS
+
+    @property
+    def native_value(self) -> float | None:
+        """Return the native value of the sensor."""
+        return self._device.command_metrics.mean_ack
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Return the histogram of the delays, by upper bound in ms."""
+        return {
+            "histogram": {
+                str(bound): count
+                for bound, count in self._device.command_metrics.ack_histogram.items()
+            }
+        }
+
+
+class CommandRoundTripSensor(SocketMetricsSensorBase):
+    """Mean delay from a command of a device to its confirmation by the socket."""
+
+    _attr_key = "command_round_trip"
+    device_class = SensorDeviceClass.DURATION
+    native_unit_of_measurement = UnitOfTime.MILLISECONDS
+
+    @property
+    def native_value(self) -> float | None:
+        """Return the native value of the sensor."""
+        return self._device.command_metrics.mean_round_trip
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Return the histogram of the delays, and the counts of the commands."""
+        metrics = self._device.command_metrics
+        return {
+            "histogram": {
+                str(bound): count
+                for bound, count in metrics.round_trip_histogram.items()
+            },
+            "sent": metrics.sent,
+            "failed": metrics.failed,
+            "confirmed": metrics.confirmed,
+            "unconfirmed": metrics.unconfirmed,
+            "pending": metrics.pending,
+        }
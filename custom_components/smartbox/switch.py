@@ -4,26 +4,38 @@ import logging
 
 from homeassistant.components.switch import SwitchEntity
 from homeassistant.const import EntityCategory
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
 from . import SmartboxConfigEntry
-from .entity import SmartBoxNodeEntity
-from .models import true_radiant_available, window_mode_available
+from .entity import SmartBoxNodeEntity, async_setup_device_entities
+from .models import SmartboxDevice, true_radiant_available, window_mode_available
 
 _LOGGER = logging.getLogger(__name__)
 
 
 async def async_setup_entry(
-    _: HomeAssistant,
+    hass: HomeAssistant,
     entry: SmartboxConfigEntry,
     async_add_entities: AddEntitiesCallback,
-) -> None:  # pylint: disable=unused-argument
+) -> None:
     """Set up platform."""
     _LOGGER.debug("Setting up Smartbox switch platform")
 
+    @callback
+    def _async_add_device(device: SmartboxDevice) -> None:
+        async_add_entities(_device_switches(device, entry), update_before_add=True)
+
+    async_setup_device_entities(hass, entry, _async_add_device)
+    _LOGGER.debug("Finished setting up Smartbox switch platform")
+
+
+def _device_switches(
+    device: SmartboxDevice, entry: SmartboxConfigEntry
+) -> list[SwitchEntity]:
+    """Return the switches of the nodes of a device."""
     switch_entities: list[SwitchEntity] = []
-    for node in entry.runtime_data.nodes:
+    for node in device.get_nodes():
         if window_mode_available(node):
             _LOGGER.debug("Creating window_mode switch for node %s", node.name)
             switch_entities.append(WindowModeSwitch(node, entry))
@@ -43,10 +55,7 @@ async def async_setup_entry(
             switch_entities.append(boost_switch)
         else:
             _LOGGER.info("Boost mode not available for node %s", node.name)
-
-    async_add_entities(switch_entities, update_before_add=True)
-
-    _LOGGER.debug("Finished setting up Smartbox switch platform")
+    return switch_entities
 
 
 class AwaySwitch(SmartBoxNodeEntity, SwitchEntity):
@@ -77,6 +86,7 @@ class WindowModeSwitch(SmartBoxNodeEntity, SwitchEntity):
     _attr_key = "window_mode"
     _attr_entity_category = EntityCategory.CONFIG
     _attr_websocket_event = "setup"
+    _attr_websocket_fields = frozenset({"window_mode_enabled"})
 
     async def async_turn_on(self, **kwargs) -> None:  # noqa: ANN003, ARG002
         """Turn on the switch."""
@@ -98,6 +108,7 @@ class TrueRadiantSwitch(SmartBoxNodeEntity, SwitchEntity):
     _attr_key = "true_radiant"
     _attr_entity_category = EntityCategory.CONFIG
     _attr_websocket_event = "setup"
+    _attr_websocket_fields = frozenset({"true_radiant_enabled"})
 
     async def async_turn_on(self, **kwargs) -> None:  # noqa: ANN003, ARG002
         """Turn on the switch."""
@@ -127,6 +138,7 @@ class BoostSwitch(SmartBoxNodeEntity, SwitchEntity):
 
     _attr_key = "boost"
     _attr_websocket_event = "status"
+    _attr_websocket_fields = frozenset({"boost", "boost_end_min"})
     _attr_icon = "mdi:rocket-launch"
 
     @property
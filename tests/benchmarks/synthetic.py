@@ -0,0 +1,164 @@
+"""Synthetic Smartbox accounts for the benchmarks."""
+
+import asyncio
+from copy import deepcopy
+from dataclasses import dataclass
+import inspect
+import random
+from typing import Any
+
+from custom_components.smartbox.const import DOMAIN, SmartboxNodeType
+from tests.const import (
+    CONF_DEVICE_IDS,
+    MOCK_SMARTBOX_CONFIG,
+    MOCK_SMARTBOX_NODE_SETUP,
+    MOCK_SMARTBOX_NODE_STATUS,
+)
+from tests.mocks import MockSmartbox
+
+# Node templates (type, status, setup) the synthetic nodes cycle through
+_NODE_TEMPLATES = [
+    (
+        SmartboxNodeType.HTR,
+        MOCK_SMARTBOX_NODE_STATUS["device_1"][0],
+        MOCK_SMARTBOX_NODE_SETUP["device_1"][0],
+    ),
+    (
+        SmartboxNodeType.ACM,
+        MOCK_SMARTBOX_NODE_STATUS["device_1"][1],
+        MOCK_SMARTBOX_NODE_SETUP["device_1"][1],
+    ),
+    (
+        SmartboxNodeType.HTR_MOD,
+        MOCK_SMARTBOX_NODE_STATUS["device_2"][1],
+        MOCK_SMARTBOX_NODE_SETUP["device_2"][1],
+    ),
+]
+
+# Session calls delayed by the synthetic latency
+_DELAYED_CALLS = [
+    "get_homes",
+    "get_nodes",
+    "get_node_status",
+    "get_node_setup",
+    "get_node_samples",
+    "get_device_connected",
+    "get_device_away_status",
+    "get_device_power_limit",
+]
+
+
+@dataclass(frozen=True)
+class SyntheticAccount:
+    """An account of homes x devices x nodes with a per-call latency."""
+
+    homes: int
+    devices: int
+    nodes: int
+    latency: float = 0.0
+    jitter: float = 0.0
+    seed: int = 0
+
+    @classmethod
+    def parse(
+        cls, size: str, latency: float = 0.0, jitter: float = 0.0
+    ) -> "SyntheticAccount":
+        """Parse an account size such as 2x5x8 (homes x devices x nodes)."""
+        homes, devices, nodes = (int(value) for value in size.split("x"))
+        return cls(homes, devices, nodes, latency, jitter)
+
+    @property
+    def name(self) -> str:
+        """Return the name of the account, used to compare runs."""
+        return f"{self.homes}x{self.devices}x{self.nodes}@{self.latency * 1000:g}ms"
+
+    def dev_ids(self) -> list[str]:
+        """Return the ids of the devices of the account."""
+        return [
+            f"home_{home}_device_{device}"
+            for home in range(self.homes)
+            for device in range(self.devices)
+        ]
+
+    def create_mock_smartbox(self) -> MockSmartbox:
+        """Create a mock of the account, whose session has the latency."""
+        config = deepcopy(MOCK_SMARTBOX_CONFIG)
+        config[DOMAIN][CONF_DEVICE_IDS] = self.dev_ids()
+        device_info: dict[str, dict[str, Any]] = {}
+        node_info: dict[str, list[dict[str, Any]]] = {}
+        node_status: dict[str, list[dict[str, Any]]] = {}
+        node_setup: dict[str, list[dict[str, Any]]] = {}
+        for dev_id in self.dev_ids():
+            device_info[dev_id] = {
+                "dev_id": dev_id,
+                "name": dev_id,
+                "product_id": f"product_id_{dev_id}",
+                "fw_version": "fw_version",
+                "serial_id": f"serial_id_{dev_id}",
+            }
+            node_info[dev_id] = []
+            node_status[dev_id] = []
+            node_setup[dev_id] = []
+            for addr in range(self.nodes):
+                node_type, status, setup = _NODE_TEMPLATES[addr % len(_NODE_TEMPLATES)]
+                node_info[dev_id].append(
+                    {
+                        "addr": addr,
+                        "name": f"{dev_id} {addr}",
+                        "type": node_type,
+                        "product_id": f"product_id_{dev_id}_{addr}",
+                        "fw_version": "fw_version",
+                        "serial_id": f"serial_id_{dev_id}_{addr}",
+                    }
+                )
+                node_status[dev_id].append(deepcopy(status))
+                node_setup[dev_id].append(deepcopy(setup))
+        dev_ids = self.dev_ids()
+        home_info = [
+            {
+                "id": f"home_{home}",
+                "name": f"Home {home}",
+                "owner": True,
+                "devs": [
+                    device_info[dev_id]
+                    for dev_id in dev_ids[
+                        home * self.devices : (home + 1) * self.devices
+                    ]
+                ],
+            }
+            for home in range(self.homes)
+        ]
+        mock_smartbox = MockSmartbox(
+            mock_config=config,
+            mock_home_info=home_info,
+            mock_device_info=device_info,
+            mock_node_info=node_info,
+            mock_node_setup=node_setup,
+            mock_node_away={
+                dev_id: {"enabled": False, "away": False, "forced": False}
+                for dev_id in dev_ids
+            },
+            mock_device_power=dict.fromkeys(dev_ids, 1000),
+            mock_node_status=node_status,
+        )
+        mock_smartbox.session.get_node_samples.return_value = {"samples": []}
+        self._add_latency(mock_smartbox.session)
+        return mock_smartbox
+
+    def _add_latency(self, session: Any) -> None:  # noqa: ANN401
+        """Delay the read calls of the session by latency +/- jitter."""
+        rng = random.Random(self.seed)  # noqa: S311
+
+        def _wrap(call: Any) -> Any:  # noqa: ANN401
+            async def _delayed(*args: Any, **kwargs: Any) -> Any:  # noqa: ANN401
+                delay = self.latency + rng.uniform(-self.jitter, self.jitter)
+                await asyncio.sleep(max(0.0, delay))
+                result = call(*args, **kwargs)
+                if inspect.isawaitable(result):
+                    result = await result
+                return result
+
+            return _delayed
+
+        for name in _DELAYED_CALLS:
+            setattr(session, name, _wrap(getattr(session, name)))
@@ -0,0 +1,138 @@
+"""Benchmarks of the setup and update paths on synthetic accounts.
+
+They are skipped unless SMARTBOX_BENCHMARK is set, e.g.:
+
+    SMARTBOX_BENCHMARK=1 pytest tests/benchmarks
+
+Other environment variables:
+- SMARTBOX_BENCHMARK_ACCOUNTS: comma separated sizes, homes x devices x nodes
+- SMARTBOX_BENCHMARK_LATENCY / SMARTBOX_BENCHMARK_JITTER: per-call latency
+  and jitter of the mocked session, in seconds
+- SMARTBOX_BENCHMARK_RESULTS: JSON file the results are written to
+- SMARTBOX_BENCHMARK_BASELINE: JSON results of a previous run, a benchmark
+  fails when a metric regresses by more than SMARTBOX_BENCHMARK_TOLERANCE
+"""
+
+import json
+import os
+from pathlib import Path
+import time
+import tracemalloc
+from typing import Any
+from unittest.mock import patch
+
+import pytest
+
+from tests.benchmarks.synthetic import SyntheticAccount
+
+pytestmark = pytest.mark.skipif(
+    not os.environ.get("SMARTBOX_BENCHMARK"),
+    reason="Benchmarks only run when SMARTBOX_BENCHMARK is set",
+)
+
+ACCOUNTS = os.environ.get("SMARTBOX_BENCHMARK_ACCOUNTS", "1x2x4,2x5x8,4x10x10")
+LATENCY = float(os.environ.get("SMARTBOX_BENCHMARK_LATENCY", "0.02"))
+JITTER = float(os.environ.get("SMARTBOX_BENCHMARK_JITTER", "0.01"))
+RESULTS = Path(os.environ.get("SMARTBOX_BENCHMARK_RESULTS", "benchmark_results.json"))
+BASELINE = os.environ.get("SMARTBOX_BENCHMARK_BASELINE")
+TOLERANCE = float(os.environ.get("SMARTBOX_BENCHMARK_TOLERANCE", "0.25"))
+UPDATES_PER_NODE = 10
+# Metrics compared with the baseline, lower is better
+COMPARED_METRICS = ("_s", "_us", "_kib")
+
+
+def record(benchmark: str, account: SyntheticAccount, metrics: dict[str, Any]) -> None:
+    """Store the metrics of a benchmark and compare them with the baseline."""
+    results = json.loads(RESULTS.read_text()) if RESULTS.exists() else {}
+    results.setdefault(benchmark, {})[account.name] = metrics
+    RESULTS.write_text(json.dumps(results, indent=2, sort_keys=True) + "\n")
+
+    if BASELINE is None:
+        return
+    baseline = json.loads(Path(BASELINE).read_text())
+    baseline_metrics = baseline.get(benchmark, {}).get(account.name, {})
+    regressions = [
+        f"{metric}: {value:.4g} > {baseline_metrics[metric]:.4g}"
+        for metric, value in metrics.items()
+        if metric.endswith(COMPARED_METRICS)
+        and baseline_metrics.get(metric)
+        and value > baseline_metrics[metric] * (1 + TOLERANCE)
+    ]
+    assert not regressions, f"{benchmark} {account.name} regressed: {regressions}"
+
+
+@pytest.fixture(
+    params=[
+        SyntheticAccount.parse(size, LATENCY, JITTER) for size in ACCOUNTS.split(",")
+    ],
+    ids=lambda account: account.name,
+)
+def synthetic_smartbox(request):
+    account: SyntheticAccount = request.param
+    mock_smartbox = account.create_mock_smartbox()
+    with (
+        patch(
+            "custom_components.smartbox.AsyncSmartboxSession",
+            autospec=True,
+            side_effect=mock_smartbox.get_mock_session,
+        ),
+        patch(
+            "smartbox.update_manager.SocketSession",
+            autospec=True,
+            side_effect=mock_smartbox.get_mock_socket,
+        ),
+    ):
+        yield account, mock_smartbox
+
+
+async def test_setup(hass, synthetic_smartbox, config_entry):
+    account, _ = synthetic_smartbox
+    tracemalloc.start()
+    start = time.perf_counter()
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    setup_return = time.perf_counter() - start
+    await hass.async_block_till_done()
+    wall_time = time.perf_counter() - start
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert len(config_entry.runtime_data.devices) == account.homes * account.devices
+    record(
+        "setup",
+        account,
+        {
+            "setup_return_s": round(setup_return, 4),
+            "wall_time_s": round(wall_time, 4),
+            "peak_memory_kib": round(peak_memory / 1024, 1),
+            "entities": len(hass.states.async_all()),
+        },
+    )
+
+
+async def test_update_dispatch(hass, synthetic_smartbox, config_entry):
+    account, mock_smartbox = synthetic_smartbox
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+
+    mock_devices = mock_smartbox.get_devices()
+    mock_nodes = [
+        (mock_device, mock_node)
+        for mock_device in mock_devices
+        for mock_node in await mock_smartbox.session.get_nodes(mock_device["dev_id"])
+    ]
+    start = time.perf_counter()
+    for _ in range(UPDATES_PER_NODE):
+        for mock_device, mock_node in mock_nodes:
+            mock_smartbox.generate_new_socket_status(mock_device, mock_node)
+        await hass.async_block_till_done()
+    elapsed = time.perf_counter() - start
+    updates = UPDATES_PER_NODE * len(mock_nodes)
+
+    record(
+        "update_dispatch",
+        account,
+        {
+            "per_update_us": round(elapsed / updates * 1e6, 1),
+            "updates": updates,
+        },
+    )
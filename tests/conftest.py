@@ -50,6 +50,14 @@ def skip_notifications_fixture():
         yield
 
 
+# The writes are merged within a loop iteration rather than a real window
+@pytest.fixture(autouse=True)
+def no_write_merge_window():
+    """Merge the node writes without waiting."""
+    with patch("custom_components.smartbox.models.WRITE_MERGE_WINDOW", 0):
+        yield
+
+
 def _get_node_status(units: str) -> dict[str, Any]:
     data = deepcopy(MOCK_SMARTBOX_NODE_STATUS)
     if units == "F":
@@ -158,12 +166,6 @@ def mock_create_smartbox_session():
         yield mock
 
 
-@pytest.fixture
-def mock_get_devices(mock_devices):
-    with patch("custom_components.smartbox.get_devices", return_value=mock_devices):
-        yield
-
-
 @pytest.fixture
 def mock_session():
     session = AsyncMock()
@@ -1,4 +1,5 @@
 from copy import deepcopy
+from datetime import timedelta
 import logging
 from typing import Any
 from unittest.mock import AsyncMock
@@ -8,6 +9,7 @@ from homeassistant.components.number import DOMAIN as NUMBER_DOMAIN
 from homeassistant.components.sensor import DOMAIN as SENSOR_DOMAIN
 from homeassistant.components.switch import DOMAIN as SWITCH_DOMAIN
 from homeassistant.helpers import entity_registry
+from homeassistant.util import dt as dt_util
 from smartbox.reseller import SmartboxReseller
 
 from custom_components.smartbox.const import DOMAIN, HEATER_NODE_TYPES, SmartboxNodeType
@@ -207,6 +209,9 @@ class MockSmartbox:
     def _create_mock_session(self):
         mock_session = AsyncMock()
         mock_session.get_devices.return_value = self._devices
+        mock_session.access_token = "access_token"
+        mock_session.refresh_token = "refresh_token"
+        mock_session.expiry_time = dt_util.utcnow() + timedelta(hours=1)
         mock_session.reseller = SmartboxReseller(
             name="Test API name",
             api_url="test_api_name_1",
@@ -263,6 +268,11 @@ class MockSmartbox:
 
         mock_session.get_device_away_status = get_device_away_status
 
+        async def get_device_connected(dev_id):
+            return {"connected": True}
+
+        mock_session.get_device_connected = get_device_connected
+
         async def set_setup(dev_id, node, setup_updates):
             self._socket_node_setup[dev_id][node["addr"]].update(setup_updates)
             self._session_node_setup = self._socket_node_setup
@@ -0,0 +1,107 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+from homeassistant.data_entry_flow import InvalidData
+import pytest
+from smartbox.error import SmartboxError
+
+from custom_components.smartbox.coalescing import CoalescedReads
+from custom_components.smartbox.const import CONF_READ_CACHE_TTL, MAX_READ_CACHE_TTL
+
+
+def _session():
+    session = MagicMock()
+    session.get_node_samples = AsyncMock(return_value=[{"t": 1, "counter": 2}])
+    session.get_device_power_limit = AsyncMock(return_value=1000)
+    session.set_node_status = AsyncMock()
+    return session
+
+
+async def test_concurrent_reads_coalesced(hass):
+    session = _session()
+    get_node_samples = session.get_node_samples
+    reads = CoalescedReads()
+    reads.attach(session, hass)
+
+    node = {"addr": 1, "type": "htr"}
+    results = await asyncio.gather(
+        session.get_node_samples("dev", node, 0, 10),
+        session.get_node_samples("dev", node, 0, 10),
+        session.get_node_samples("dev", node, 10, 20),
+    )
+    assert results == [[{"t": 1, "counter": 2}]] * 3
+    assert get_node_samples.await_count == 2
+    assert reads.coalesced == 1
+    # the callers get their own copy
+    assert results[0] is not results[1]
+
+    # without ttl, the results are not kept
+    await session.get_node_samples("dev", node, 0, 10)
+    assert get_node_samples.await_count == 3
+
+    # a failed read fails all its callers, and is not kept
+    get_node_samples.side_effect = SmartboxError
+    results = await asyncio.gather(
+        session.get_node_samples("dev", node, 0, 10),
+        session.get_node_samples("dev", node, 0, 10),
+        return_exceptions=True,
+    )
+    assert all(isinstance(result, SmartboxError) for result in results)
+    assert get_node_samples.await_count == 4
+
+    reads.detach()
+    assert session.get_node_samples is get_node_samples
+
+
+async def test_reads_kept_for_ttl(hass):
+    session = _session()
+    get_device_power_limit = session.get_device_power_limit
+    reads = CoalescedReads(ttl=60)
+    reads.attach(session, hass)
+
+    assert await session.get_device_power_limit("dev") == 1000
+    assert await session.get_device_power_limit("dev") == 1000
+    get_device_power_limit.assert_awaited_once()
+
+    # a command drops the kept results
+    await session.set_node_status("dev", {"addr": 1}, {"stemp": "20.0"})
+    assert await session.get_device_power_limit("dev") == 1000
+    assert get_device_power_limit.await_count == 2
+
+    reads.ttl = 0
+    reads.clear()
+    await session.get_device_power_limit("dev")
+    assert get_device_power_limit.await_count == 3
+
+
+@pytest.mark.parametrize("ttl", [0, 3])
+async def test_read_cache_ttl_option(hass, mock_smartbox, config_entry, ttl):
+    hass.config_entries.async_update_entry(
+        config_entry, options={**config_entry.options, CONF_READ_CACHE_TTL: ttl}
+    )
+    get_node_status = mock_smartbox.session.get_node_status
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+    reads = config_entry.runtime_data.reads
+    assert reads.ttl == ttl
+    assert mock_smartbox.session.get_node_status is not get_node_status
+
+    hass.config_entries.async_update_entry(
+        config_entry, options={**config_entry.options, CONF_READ_CACHE_TTL: ttl + 2}
+    )
+    await hass.async_block_till_done()
+    assert config_entry.runtime_data.reads is reads
+    assert reads.ttl == ttl + 2
+
+    assert await hass.config_entries.async_unload(config_entry.entry_id)
+    await hass.async_block_till_done()
+    assert mock_smartbox.session.get_node_status is get_node_status
+
+
+async def test_read_cache_ttl_bounded(hass, config_entry):
+    result = await hass.config_entries.options.async_init(config_entry.entry_id)
+    with pytest.raises(InvalidData):
+        await hass.config_entries.options.async_configure(
+            result["flow_id"],
+            user_input={CONF_READ_CACHE_TTL: MAX_READ_CACHE_TTL + 1},
+        )
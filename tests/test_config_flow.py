@@ -49,6 +49,25 @@ async def test_integration_already_exists(
     assert result["reason"] == "already_configured"
 
 
+async def test_session_handed_over_to_setup(
+    hass: HomeAssistant, mock_smartbox, reseller
+) -> None:
+    """Test the session validated by the flow is reused by the setup."""
+    # the reads of the session are coalesced once it is set up
+    health_check = mock_smartbox.session.health_check
+    result = await hass.config_entries.flow.async_init(
+        DOMAIN,
+        context={"source": config_entries.SOURCE_USER},
+        data=MOCK_SMARTBOX_CONFIG[DOMAIN],
+    )
+    await hass.async_block_till_done()
+
+    assert result["type"] is FlowResultType.CREATE_ENTRY
+    assert result["result"].state is config_entries.ConfigEntryState.LOADED
+    health_check.assert_awaited_once()
+    mock_smartbox.session.check_refresh_auth.assert_awaited_once()
+
+
 async def test_option_flow(hass: HomeAssistant, config_entry) -> None:
     """Test config flow options."""
     valid_option = {
@@ -0,0 +1,27 @@
+from custom_components.smartbox.diagnostics import async_get_config_entry_diagnostics
+
+
+async def test_startup_timings(hass, mock_smartbox, config_entry):
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+
+    diagnostics = await async_get_config_entry_diagnostics(hass, config_entry)
+    timings = diagnostics["runtime_data"]["startup_timings"]
+    assert set(timings["entry"]) == {
+        "session",
+        "get_homes",
+        "platforms",
+        "devices",
+        "startup",
+    }
+    for device in config_entry.runtime_data.devices:
+        assert set(timings["devices"][device.dev_id]) == {
+            "nodes",
+            "node_states",
+            "total",
+        }
+    for node in config_entry.runtime_data.nodes:
+        assert "state" in timings["nodes"][node.node_id]
+        assert all(
+            duration >= 0 for duration in timings["nodes"][node.node_id].values()
+        )
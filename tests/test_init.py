@@ -1,7 +1,21 @@
+import asyncio
+from datetime import timedelta
 from unittest.mock import AsyncMock, patch
 
+from aiohttp import ClientResponseError, RequestInfo
+from homeassistant.components.climate import DOMAIN as CLIMATE_DOMAIN
+from homeassistant.config_entries import ConfigEntryState
+from homeassistant.const import CONF_TOKEN, EVENT_STATE_CHANGED
+from homeassistant.core import callback
 from homeassistant.exceptions import ConfigEntryAuthFailed, ConfigEntryNotReady
+from homeassistant.util import dt as dt_util
+from multidict import CIMultiDict, CIMultiDictProxy
 import pytest
+from pytest_homeassistant_custom_component.common import (
+    MockConfigEntry,
+    async_fire_time_changed,
+)
+from yarl import URL
 
 from custom_components.smartbox import (
     APIUnavailableError,
@@ -11,6 +25,16 @@ from custom_components.smartbox import (
     create_smartbox_session_from_entry,
     update_listener,
 )
+from custom_components.smartbox.const import (
+    CONF_DISPLAY_ENTITY_PICTURES,
+    CONF_HISTORY_CONSUMPTION,
+    CONF_TIMEDELTA_POWER,
+    DOMAIN,
+    SNAPSHOT_STORAGE_KEY,
+    HistoryConsumptionStatus,
+)
+
+from .const import MOCK_SMARTBOX_CONFIG
 
 
 @pytest.mark.asyncio
@@ -106,3 +130,379 @@ async def test_update_listener(hass, config_entry):
     with patch.object(hass.config_entries, "async_reload", AsyncMock()) as mock_reload:
         await update_listener(hass, config_entry)
         mock_reload.assert_called_once_with(config_entry.entry_id)
+
+
+async def test_update_listener_history_consumption(hass, mock_smartbox, config_entry):
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+    with patch.object(hass.config_entries, "async_reload", AsyncMock()) as mock_reload:
+        hass.config_entries.async_update_entry(
+            config_entry,
+            options={
+                **config_entry.options,
+                CONF_HISTORY_CONSUMPTION: HistoryConsumptionStatus.OFF,
+            },
+        )
+        await hass.async_block_till_done()
+        mock_reload.assert_not_called()
+
+
+async def test_update_listener_applies_options_in_place(
+    hass, mock_smartbox, config_entry
+):
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+    devices = list(config_entry.runtime_data.devices)
+    entity_id = hass.states.async_entity_ids(CLIMATE_DOMAIN)[0]
+    assert "entity_picture" not in hass.states.get(entity_id).attributes
+
+    with patch.object(hass.config_entries, "async_reload", AsyncMock()) as mock_reload:
+        hass.config_entries.async_update_entry(
+            config_entry,
+            options={
+                **config_entry.options,
+                CONF_DISPLAY_ENTITY_PICTURES: True,
+                CONF_TIMEDELTA_POWER: 30,
+            },
+        )
+        await hass.async_block_till_done()
+        mock_reload.assert_not_called()
+        assert config_entry.runtime_data.devices == devices
+        assert (
+            hass.states.get(entity_id)
+            .attributes["entity_picture"]
+            .endswith("img/favicon.ico")
+        )
+
+        # Unknown options still need a reload
+        hass.config_entries.async_update_entry(
+            config_entry, options={**config_entry.options, "unknown": True}
+        )
+        await hass.async_block_till_done()
+        mock_reload.assert_called_once_with(config_entry.entry_id)
+
+
+async def test_warm_start_from_snapshot(hass, mock_smartbox, config_entry):
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+    nodes = len(config_entry.runtime_data.nodes)
+    assert await hass.config_entries.async_unload(config_entry.entry_id)
+    await hass.async_block_till_done()
+
+    # Sockets are created again when the entry is set up again
+    mock_smartbox._sockets.clear()
+    with (
+        patch(
+            "custom_components.smartbox.initialise_devices"
+        ) as mock_initialise_devices,
+        patch(
+            "custom_components.smartbox.reconcile_devices", return_value=True
+        ) as mock_reconcile,
+    ):
+        assert await hass.config_entries.async_setup(config_entry.entry_id)
+        await hass.async_block_till_done(wait_background_tasks=True)
+        mock_initialise_devices.assert_not_called()
+        mock_reconcile.assert_awaited_once()
+    assert len(config_entry.runtime_data.nodes) == nodes
+
+
+async def test_warm_start_topology_changed(
+    hass, hass_storage, mock_smartbox, config_entry
+):
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+    assert await hass.config_entries.async_unload(config_entry.entry_id)
+    await hass.async_block_till_done()
+
+    mock_smartbox._sockets.clear()
+    with (
+        patch("custom_components.smartbox.reconcile_devices", return_value=False),
+        patch.object(hass.config_entries, "async_schedule_reload") as mock_reload,
+    ):
+        assert await hass.config_entries.async_setup(config_entry.entry_id)
+        await hass.async_block_till_done(wait_background_tasks=True)
+        mock_reload.assert_called_once_with(config_entry.entry_id)
+    assert f"{SNAPSHOT_STORAGE_KEY}.{config_entry.entry_id}" not in hass_storage
+
+
+async def test_warm_start_topology_changed_reload(
+    hass, hass_storage, mock_smartbox, config_entry
+):
+    """The reload of a changed topology starts cold, without looping."""
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+    assert await hass.config_entries.async_unload(config_entry.entry_id)
+    await hass.async_block_till_done()
+
+    mock_smartbox._sockets.clear()
+    up_to_date = iter([False, True])
+
+    async def _reconcile_devices(*_args):
+        # the sockets are created again by the reload
+        mock_smartbox._sockets.clear()
+        return next(up_to_date)
+
+    with patch(
+        "custom_components.smartbox.reconcile_devices",
+        side_effect=_reconcile_devices,
+    ) as mock_reconcile:
+        assert await hass.config_entries.async_setup(config_entry.entry_id)
+        async with asyncio.timeout(5):
+            await hass.async_block_till_done(wait_background_tasks=True)
+    mock_reconcile.assert_called_once()
+    assert config_entry.state is ConfigEntryState.LOADED
+    # saved again by the cold start
+    assert f"{SNAPSHOT_STORAGE_KEY}.{config_entry.entry_id}" in hass_storage
+
+
+async def test_warm_start_initialises_pending_devices(
+    hass, hass_storage, mock_smartbox, config_entry
+):
+    """A device failing to initialise does not prevent a warm start."""
+    # the entry is unloaded while its entities are still added, without the
+    # history import updating the entry meanwhile
+    hass.config_entries.async_update_entry(
+        config_entry,
+        options={
+            **config_entry.options,
+            CONF_HISTORY_CONSUMPTION: HistoryConsumptionStatus.OFF,
+        },
+    )
+    get_nodes = mock_smartbox.session.get_nodes.side_effect
+    failing = True
+    calls: list[str] = []
+    retried = asyncio.Event()
+
+    def failing_get_nodes(dev_id):
+        calls.append(dev_id)
+        if calls.count("device_2") > 1:
+            retried.set()
+        if failing and dev_id == "device_2":
+            raise SmartboxError
+        return get_nodes(dev_id)
+
+    mock_smartbox.session.get_nodes.side_effect = failing_get_nodes
+    key = f"{SNAPSHOT_STORAGE_KEY}.{config_entry.entry_id}"
+    with patch("custom_components.smartbox.DEVICE_RETRY_MIN_DELAY", 0):
+        assert await hass.config_entries.async_setup(config_entry.entry_id)
+        # saved after the first pass, while device_2 is retried
+        async with asyncio.timeout(5):
+            await retried.wait()
+    snapshot = hass_storage[key]["data"]
+    assert [device["device"]["dev_id"] for device in snapshot["devices"]] == [
+        "device_1"
+    ]
+    assert [device["dev_id"] for device in snapshot["pending"]] == ["device_2"]
+    assert await hass.config_entries.async_unload(config_entry.entry_id)
+    await hass.async_block_till_done()
+
+    failing = False
+    mock_smartbox._sockets.clear()
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    assert [device.dev_id for device in config_entry.runtime_data.devices] == [
+        "device_1"
+    ]
+    await hass.async_block_till_done(wait_background_tasks=True)
+    assert config_entry.state is ConfigEntryState.LOADED
+    assert [device.dev_id for device in config_entry.runtime_data.devices] == [
+        "device_1",
+        "device_2",
+    ]
+    snapshot = hass_storage[key]["data"]
+    assert [device["device"]["dev_id"] for device in snapshot["devices"]] == [
+        "device_1",
+        "device_2",
+    ]
+    assert "pending" not in snapshot
+
+
+async def test_progressive_setup(hass, mock_smartbox, config_entry):
+    get_nodes = mock_smartbox.session.get_nodes.side_effect
+    device_1_published = asyncio.Event()
+
+    async def slow_get_nodes(dev_id):
+        if dev_id == "device_2":
+            # device_2 only gets ready once device_1 entities are published
+            await device_1_published.wait()
+        return get_nodes(dev_id)
+
+    @callback
+    def _state_changed(event):
+        if event.data["entity_id"].startswith(f"{CLIMATE_DOMAIN}.device_1"):
+            device_1_published.set()
+
+    hass.bus.async_listen(EVENT_STATE_CHANGED, _state_changed)
+    mock_smartbox.session.get_nodes.side_effect = slow_get_nodes
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    assert config_entry.state is ConfigEntryState.LOADED
+    async with asyncio.timeout(5):
+        await hass.async_block_till_done()
+    assert [device.dev_id for device in config_entry.runtime_data.devices] == [
+        "device_1",
+        "device_2",
+    ]
+    assert len(hass.states.async_entity_ids(CLIMATE_DOMAIN)) == len(
+        [node for node in config_entry.runtime_data.nodes if node.heater_node]
+    )
+
+
+async def test_progressive_setup_retry(hass, mock_smartbox, config_entry):
+    get_nodes = mock_smartbox.session.get_nodes.side_effect
+    calls: list[str] = []
+
+    def failing_get_nodes(dev_id):
+        calls.append(dev_id)
+        if calls.count(dev_id) == 1 and dev_id == "device_2":
+            # The socket of the failed device is created again on retry
+            del mock_smartbox._sockets[dev_id]
+            raise SmartboxError
+        return get_nodes(dev_id)
+
+    mock_smartbox.session.get_nodes.side_effect = failing_get_nodes
+    with patch("custom_components.smartbox.DEVICE_RETRY_MIN_DELAY", 0):
+        assert await hass.config_entries.async_setup(config_entry.entry_id)
+        await hass.async_block_till_done()
+    assert calls.count("device_2") == 2
+    assert {device.dev_id for device in config_entry.runtime_data.devices} == {
+        "device_1",
+        "device_2",
+    }
+
+
+@pytest.mark.parametrize(("token_validity", "sessions"), [(3600, 1), (60, 2)])
+async def test_reload_reuses_session(hass, mock_smartbox, token_validity, sessions):
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        unique_id="test_api_name_1_test_username_1",
+        data=MOCK_SMARTBOX_CONFIG[DOMAIN],
+    )
+    # the reads of the session are coalesced once it is set up
+    health_check = mock_smartbox.session.health_check
+    entry.add_to_hass(hass)
+    assert await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+    mock_smartbox.session.expiry_time = dt_util.utcnow() + timedelta(
+        seconds=token_validity
+    )
+
+    mock_smartbox._sockets.clear()
+    assert await hass.config_entries.async_reload(entry.entry_id)
+    await hass.async_block_till_done()
+    assert entry.state is ConfigEntryState.LOADED
+    # An expiring session is replaced, from the persisted token without login
+    health_check.assert_awaited_once()
+    assert mock_smartbox.session.check_refresh_auth.await_count == sessions
+
+
+async def test_token_persisted_and_restored(hass, mock_smartbox, config_entry):
+    # the reads of the session are coalesced once it is set up
+    health_check = mock_smartbox.session.health_check
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+    assert config_entry.data[CONF_TOKEN] == {
+        "access_token": "access_token",
+        "refresh_token": "refresh_token",
+        "expires_at": mock_smartbox.session.expiry_time.isoformat(),
+    }
+    assert await hass.config_entries.async_unload(config_entry.entry_id)
+    await hass.async_block_till_done()
+
+    # A restart restores the token instead of logging in
+    mock_smartbox._sockets.clear()
+    health_check.reset_mock()
+    mock_smartbox.session._access_token = ""
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+    health_check.assert_not_awaited()
+    assert mock_smartbox.session._access_token == "access_token"
+    assert mock_smartbox.session._refresh_token == "refresh_token"
+
+
+def _rejected_token_error() -> SmartboxError:
+    """Return the error of a request whose token is rejected."""
+    error = SmartboxError()
+    error.__cause__ = ClientResponseError(
+        RequestInfo(
+            URL("https://api.helki.com"), "GET", CIMultiDictProxy(CIMultiDict())
+        ),
+        (),
+        status=401,
+    )
+    return error
+
+
+@pytest.mark.parametrize("warm_start", [True, False])
+async def test_revoked_token_logs_in_again(
+    hass, hass_storage, mock_smartbox, config_entry, warm_start
+):
+    session = mock_smartbox.session
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+    assert await hass.config_entries.async_unload(config_entry.entry_id)
+    await hass.async_block_till_done()
+    if not warm_start:
+        del hass_storage[f"{SNAPSHOT_STORAGE_KEY}.{config_entry.entry_id}"]
+
+    # The persisted token is still valid but was revoked
+    get_homes = session.get_homes.side_effect
+    revoked = _rejected_token_error()
+    session.get_homes.side_effect = [revoked, get_homes()]
+    session.get_homes.reset_mock()
+    session.check_refresh_auth.reset_mock()
+    mock_smartbox._sockets.clear()
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done(wait_background_tasks=True)
+    assert config_entry.state is ConfigEntryState.LOADED
+    assert session.get_homes.await_count == 2
+    # Logged in again with the password, the new token being persisted
+    assert session.check_refresh_auth.await_count == 2
+    assert session._access_token == ""
+    assert config_entry.data[CONF_TOKEN]["access_token"] == "access_token"
+    assert not hass.config_entries.flow.async_progress()
+
+
+async def test_rejected_token_kept_when_not_restored(hass, mock_smartbox, config_entry):
+    revoked = _rejected_token_error()
+    mock_smartbox.session.get_homes.side_effect = revoked
+    assert not await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+    assert config_entry.state is ConfigEntryState.SETUP_RETRY
+    mock_smartbox.session.get_homes.assert_awaited_once()
+
+
+async def test_token_refreshed_ahead_of_expiry(hass, mock_smartbox, config_entry):
+    session = mock_smartbox.session
+    session.expiry_time = dt_util.utcnow() + timedelta(seconds=400)
+
+    async def authentication(credentials):
+        assert credentials == {
+            "grant_type": "refresh_token",
+            "refresh_token": "refresh_token",
+        }
+        session.access_token = "new_access_token"
+        session.expiry_time = dt_util.utcnow() + timedelta(hours=1)
+
+    session._authentication = AsyncMock(side_effect=authentication)
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+    session._authentication.assert_not_awaited()
+
+    async_fire_time_changed(hass, dt_util.utcnow() + timedelta(seconds=101))
+    await hass.async_block_till_done()
+    session._authentication.assert_awaited_once()
+    assert config_entry.data[CONF_TOKEN]["access_token"] == "new_access_token"
+
+
+async def test_failed_setup_leaves_no_token_refresh(hass, mock_smartbox, config_entry):
+    session = mock_smartbox.session
+    session.expiry_time = dt_util.utcnow() + timedelta(seconds=400)
+    session._authentication = AsyncMock()
+    with patch(
+        "custom_components.smartbox.get_session_devices", side_effect=SmartboxError
+    ):
+        assert not await hass.config_entries.async_setup(config_entry.entry_id)
+        await hass.async_block_till_done()
+        assert config_entry.state is ConfigEntryState.SETUP_RETRY
+        async_fire_time_changed(hass, dt_util.utcnow() + timedelta(seconds=101))
+        await hass.async_block_till_done()
+    session._authentication.assert_not_awaited()
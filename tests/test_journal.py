@@ -0,0 +1,121 @@
+import json
+from unittest.mock import patch
+
+from homeassistant.config_entries import ConfigEntryState
+from smartbox.error import SmartboxError
+
+from custom_components.smartbox.const import CONF_RECORD_TRAFFIC
+from custom_components.smartbox.journal import (
+    JournalSession,
+    TrafficJournal,
+    load_journal,
+    replay_journal,
+)
+from custom_components.smartbox.models import SmartboxDevice
+
+
+def _node_statuses(devices):
+    return sorted(
+        json.dumps(node.status, sort_keys=True)
+        for device in devices
+        for node in device.get_nodes()
+    )
+
+
+async def test_record_and_replay(hass, mock_smartbox, config_entry, tmp_path):
+    hass.config.config_dir = str(tmp_path)
+    hass.config_entries.async_update_entry(
+        config_entry, options={**config_entry.options, CONF_RECORD_TRAFFIC: True}
+    )
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+    devices = config_entry.runtime_data.devices
+    for device in devices:
+        for node in device.get_nodes():
+            if not node.heater_node:
+                continue
+            mock_smartbox.generate_new_socket_status(
+                {"dev_id": device.dev_id}, node.node_info
+            )
+    await hass.async_block_till_done()
+    path = config_entry.runtime_data.hub.journal.path
+    assert await hass.config_entries.async_unload(config_entry.entry_id)
+    await hass.async_block_till_done()
+
+    journal = await hass.async_add_executor_job(path.read_text)
+    for device in devices:
+        assert device.dev_id not in journal
+        assert device.device["name"] not in journal
+    messages = await hass.async_add_executor_job(load_journal, path)
+    updates = [message for message in messages if message["kind"] == "update"]
+    assert {message["name"] for message in updates} == {"node_status"}
+
+    # the devices are set up from the recorded calls, and updated by the replay
+    session = JournalSession(messages)
+    replayed = {
+        session_device["dev_id"]: await SmartboxDevice.initialise_nodes(
+            session_device, session, hass
+        )
+        for home in await session.get_homes()
+        for session_device in home["devs"]
+    }
+    assert sorted(replayed) == [f"dev_{index}" for index in range(len(devices))]
+    assert _node_statuses(replayed.values()) != _node_statuses(devices)
+    assert await replay_journal(messages, replayed, speed=100) == len(updates)
+    assert _node_statuses(replayed.values()) == _node_statuses(devices)
+
+
+async def test_record_traffic_option(hass, mock_smartbox, config_entry, tmp_path):
+    hass.config.config_dir = str(tmp_path)
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+    hub = config_entry.runtime_data.hub
+    assert hub.journal is None
+
+    hass.config_entries.async_update_entry(
+        config_entry, options={**config_entry.options, CONF_RECORD_TRAFFIC: True}
+    )
+    await hass.async_block_till_done()
+    assert config_entry.runtime_data.hub is hub
+    assert hub.journal is not None
+
+    hass.config_entries.async_update_entry(
+        config_entry, options={**config_entry.options, CONF_RECORD_TRAFFIC: False}
+    )
+    await hass.async_block_till_done()
+    assert hub.journal is None
+
+
+async def test_journal_stopped_on_failed_setup(
+    hass, mock_smartbox, config_entry, tmp_path
+):
+    hass.config.config_dir = str(tmp_path)
+    hass.config_entries.async_update_entry(
+        config_entry, options={**config_entry.options, CONF_RECORD_TRAFFIC: True}
+    )
+    get_homes = mock_smartbox.session.get_homes
+    with patch(
+        "custom_components.smartbox.get_session_devices", side_effect=SmartboxError
+    ):
+        assert not await hass.config_entries.async_setup(config_entry.entry_id)
+        await hass.async_block_till_done()
+    assert config_entry.state is ConfigEntryState.SETUP_RETRY
+    assert config_entry.runtime_data.hub.journal is None
+    assert mock_smartbox.session.get_homes is get_homes
+
+
+async def test_journal_rotated(hass, tmp_path):
+    path = tmp_path / "journal.jsonl"
+    journal = TrafficJournal(hass, path)
+    journal.record_update("device_1", "away_status", [{"away": True}])
+    await journal.async_close()
+    with patch("custom_components.smartbox.journal.JOURNAL_MAX_SIZE", 1):
+        journal = TrafficJournal(hass, path)
+        journal.record_update("device_1", "away_status", [{"away": False}])
+        await journal.async_close()
+    rotated = await hass.async_add_executor_job(
+        load_journal, tmp_path / "journal.jsonl.1"
+    )
+    assert [message["args"] for message in rotated] == [[{"away": True}]]
+    current = await hass.async_add_executor_job(load_journal, path)
+    assert [message["args"] for message in current] == [[{"away": False}]]
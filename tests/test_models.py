@@ -1,6 +1,9 @@
+import asyncio
+from copy import deepcopy
 from datetime import datetime, timedelta
 import logging
-from unittest.mock import AsyncMock, MagicMock, NonCallableMock, patch
+import time
+from unittest.mock import AsyncMock, MagicMock, NonCallableMock, call, patch
 
 from dateutil import tz
 from homeassistant.components.climate import (
@@ -12,7 +15,10 @@ from homeassistant.components.climate import (
     HVACMode,
     UnitOfTemperature,
 )
+from homeassistant.util import dt as dt_util
 import pytest
+from pytest_homeassistant_custom_component.common import async_fire_time_changed
+from smartbox.error import SmartboxError
 
 from custom_components.smartbox.const import (
     PRESET_FROST,
@@ -21,17 +27,28 @@ from custom_components.smartbox.const import (
     SmartboxNodeType,
 )
 from custom_components.smartbox.models import (
+    CommandMetrics,
+    MergedWriter,
     SmartboxDevice,
     SmartboxNode,
+    SmartboxUpdateHub,
+    UpdateMetrics,
+    UpdateSubscribers,
+    changed_fields,
+    devices_from_snapshot,
+    devices_snapshot,
     get_hvac_mode,
+    get_session_devices,
     get_target_temperature,
     get_temperature_unit,
+    initialise_devices,
+    reconcile_devices,
     set_hvac_mode_args,
     set_preset_mode_status_update,
     set_temperature_args,
 )
 
-from .const import MOCK_SMARTBOX_DEVICE_INFO
+from .const import MOCK_SMARTBOX_DEVICE_INFO, MOCK_SMARTBOX_HOME_INFO
 from .test_utils import assert_log_message
 
 _LOGGER = logging.getLogger(__name__)
@@ -55,14 +72,14 @@ async def test_smartbox_device_dev_data_updates(hass):
         }
 
         mock_dev_data = {"away": True}
-        device._away_status_update(mock_dev_data)
+        device.away_status_update(mock_dev_data)
         assert device.away
 
         mock_dev_data = {"away": False}
-        device._away_status_update(mock_dev_data)
+        device.away_status_update(mock_dev_data)
         assert not device.away
 
-        device._power_limit_update(1045)
+        device.power_limit_update(1045)
         assert device.power_limit == 1045
 
 
@@ -83,13 +100,212 @@ async def test_smartbox_device_connected_updates(hass):
             (SmartboxNodeType.ACM, 2): mock_node_2,
         }
 
-        device._connected(connected=True)
+        device.connected_update(connected=True)
         assert device.connected
 
-        device._connected(connected=False)
+        device.connected_update(connected=False)
         assert not device.connected
 
 
+async def test_merged_writer(hass):
+    """Writes within the window are merged, the last value of a key wins."""
+    write = AsyncMock()
+    writer = MergedWriter(hass, write)
+    results = await asyncio.gather(
+        writer.async_write({"stemp": "20.0", "units": "C"}),
+        writer.async_write({"stemp": "21.0", "extra_options": {"boost_temp": "22"}}),
+        writer.async_write({"extra_options": {"boost_time": 60}}),
+    )
+    assert results == [None, None, None]
+    write.assert_awaited_once_with(
+        {
+            "stemp": "21.0",
+            "units": "C",
+            "extra_options": {"boost_temp": "22", "boost_time": 60},
+        }
+    )
+
+    # a failed write fails all its callers
+    write.side_effect = SmartboxError
+    results = await asyncio.gather(
+        writer.async_write({"stemp": "19.0"}),
+        writer.async_write({"stemp": "18.0"}),
+        return_exceptions=True,
+    )
+    assert all(isinstance(result, SmartboxError) for result in results)
+    assert write.await_args.args == ({"stemp": "18.0"},)
+
+
+async def test_matching_commands_suppressed(hass):
+    """Commands matching the fresh state are skipped, unless forced."""
+    mock_session = AsyncMock()
+    device = SmartboxDevice(MOCK_SMARTBOX_DEVICE_INFO["device_1"], mock_session, hass)
+    node = SmartboxNode(
+        device,
+        {"addr": 1, "name": "Heater", "type": SmartboxNodeType.HTR},
+        mock_session,
+        {"stemp": "21.0", "boost": True},
+        {"window_mode_enabled": False},
+    )
+
+    await node.set_status(stemp=21.0, boost=True)
+    await node.set_window_mode(window_mode=False)
+    await device.set_away_status(away=False)
+    await device.set_power_limit(0)
+    mock_session.set_node_status.assert_not_called()
+    mock_session.set_node_setup.assert_not_called()
+    mock_session.set_device_away_status.assert_not_called()
+    mock_session.set_device_power_limit.assert_not_called()
+    assert device.metrics.suppressed_commands == 4
+
+    await node.set_status(stemp="21.0", force=True)
+    mock_session.set_node_status.assert_awaited_once()
+    await node.set_status(stemp="22.0")
+    assert mock_session.set_node_status.await_count == 2
+
+    # the state is not fresh anymore
+    device.last_seen -= 3600
+    await device.set_away_status(away=False)
+    mock_session.set_device_away_status.assert_awaited_once()
+    assert device.metrics.suppressed_commands == 4
+
+
+async def test_optimistic_commands(hass):
+    """Commands are shown until confirmed, and rolled back if they fail."""
+    mock_session = AsyncMock()
+    device = SmartboxDevice(MOCK_SMARTBOX_DEVICE_INFO["device_1"], mock_session, hass)
+    node = SmartboxNode(
+        device,
+        {"addr": 1, "name": "Heater", "type": SmartboxNodeType.HTR},
+        mock_session,
+        {"stemp": "21.0", "mtemp": "19.0", "mode": "auto"},
+        {"window_mode_enabled": False, "extra_options": {"boost_time": 60}},
+    )
+    device._nodes = {(node.node_type, node.addr): node}
+    subscriber = MagicMock()
+    device.subscribers.subscribe((SmartboxNodeType.HTR, 1, "status"), subscriber)
+    device.subscribers.subscribe((SmartboxNodeType.HTR, 1, "setup"), subscriber)
+
+    # the values are shown before the write
+    written = asyncio.Event()
+
+    async def _write(*_args):
+        assert node.status["stemp"] == "22.0"
+        # an update predating the command doesn't revert it
+        assert node.update_status({"stemp": "21.0", "mtemp": "19.5"}) == {"mtemp"}
+        written.set()
+
+    mock_session.set_node_status.side_effect = _write
+    await node.set_status(stemp="22.0")
+    assert written.is_set()
+    assert subscriber.call_args_list[0].args[1] == {"stemp"}
+    assert node.status == {"stemp": "22.0", "mtemp": "19.5", "mode": "auto"}
+    assert node.update_status({"stemp": "21.0", "mtemp": "19.5"}) == set()
+    assert node.status["stemp"] == "22.0"
+
+    # until confirmed
+    node.update_status({"stemp": "22.0", "mtemp": "19.5"})
+    assert node.update_status({"stemp": "21.0"}) == {"stemp"}
+    assert node.status["stemp"] == "21.0"
+
+    # the extra options are merged, kept and fetched again without confirmation
+    mock_session.get_node_status.return_value = dict(node.status)
+    mock_session.get_node_setup.return_value = {
+        "window_mode_enabled": False,
+        "extra_options": {"boost_time": 60, "boost_temp": "24"},
+    }
+    await node.set_extra_options({"boost_temp": "24"})
+    assert node.setup["extra_options"] == {"boost_time": 60, "boost_temp": "24"}
+    async_fire_time_changed(hass, dt_util.utcnow() + timedelta(seconds=31))
+    await hass.async_block_till_done()
+    mock_session.get_node_setup.assert_awaited_once()
+    assert node.setup["extra_options"] == {"boost_time": 60, "boost_temp": "24"}
+
+    # a failed write is rolled back
+    mock_session.set_node_setup.side_effect = SmartboxError
+    with pytest.raises(SmartboxError):
+        await node.set_window_mode(window_mode=True)
+    assert not node.window_mode
+    assert subscriber.call_args.args == (node.setup, {"window_mode_enabled"})
+
+
+async def test_optimistic_commands_partial_rollback(hass):
+    """A failed write rolls back its own values, not the accepted ones."""
+    mock_session = AsyncMock()
+    device = SmartboxDevice(MOCK_SMARTBOX_DEVICE_INFO["device_1"], mock_session, hass)
+    node = SmartboxNode(
+        device,
+        {"addr": 1, "name": "Heater", "type": SmartboxNodeType.HTR},
+        mock_session,
+        {"stemp": "20.0", "mode": "auto"},
+        {},
+    )
+    device._nodes = {(node.node_type, node.addr): node}
+
+    await node.set_status(stemp="22.0")
+    mock_session.set_node_status.side_effect = SmartboxError
+    with pytest.raises(SmartboxError):
+        await node.set_status(mode="manual")
+    assert node.status == {"stemp": "22.0", "mode": "auto"}
+
+    # the accepted value is still confirmed by the next update
+    assert node.update_status({"stemp": "22.0", "mode": "auto"}) == set()
+    assert node.update_status({"stemp": "20.0", "mode": "auto"}) == {"stemp"}
+
+
+async def test_optimistic_commands_survive_connectivity(hass):
+    """A connectivity update keeps the confirmation timeout of the nodes."""
+    mock_session = AsyncMock()
+    device = SmartboxDevice(MOCK_SMARTBOX_DEVICE_INFO["device_1"], mock_session, hass)
+    node = SmartboxNode(
+        device,
+        {"addr": 1, "name": "Heater", "type": SmartboxNodeType.HTR},
+        mock_session,
+        {"stemp": "20.0"},
+        {},
+    )
+    device._nodes = {(node.node_type, node.addr): node}
+    mock_session.get_node_status.return_value = {"stemp": "20.0"}
+    mock_session.get_node_setup.return_value = {}
+
+    await node.set_status(stemp="22.0")
+    device.connected_update(connected=True)
+    async_fire_time_changed(hass, dt_util.utcnow() + timedelta(seconds=31))
+    await hass.async_block_till_done(wait_background_tasks=True)
+    mock_session.get_node_status.assert_awaited_once()
+    assert node.status["stemp"] == "20.0"
+    # no longer kept over the updates
+    assert node.update_status({"stemp": "19.0"}) == {"stemp"}
+
+
+async def test_smartbox_device_connected_debounce(hass):
+    """Connectivity transitions are dispatched once they lasted the debounce."""
+    device = SmartboxDevice(MOCK_SMARTBOX_DEVICE_INFO["device_1"], MagicMock(), hass)
+    device.connected_update(connected=True)
+    device.connected_debounce = 30
+    subscriber = MagicMock()
+    device.subscribers.subscribe((None, None, "connected"), subscriber)
+
+    # a flap within the debounce is dropped
+    device.connected_update(connected=False)
+    device.connected_update(connected=True)
+    async_fire_time_changed(hass, dt_util.utcnow() + timedelta(seconds=31))
+    await hass.async_block_till_done(wait_background_tasks=True)
+    subscriber.assert_not_called()
+    assert device.connected
+    assert device.metrics.flaps == 2
+
+    device.connected_update(connected=False)
+    async_fire_time_changed(hass, dt_util.utcnow() + timedelta(seconds=10))
+    await hass.async_block_till_done()
+    assert device.connected
+    async_fire_time_changed(hass, dt_util.utcnow() + timedelta(seconds=31))
+    await hass.async_block_till_done()
+    assert not device.connected
+    assert subscriber.call_args_list == [call(device.connected)]
+    assert device.metrics.flaps == 3
+
+
 async def test_smartbox_device_node_status_update(hass, caplog):
     """Independently test node status updates usually called by UpdateManager."""
     dev_id = "device_1"
@@ -110,19 +326,19 @@ async def test_smartbox_device_node_status_update(hass, caplog):
         }
 
         mock_status = {"foo": "bar"}
-        device._node_status_update(SmartboxNodeType.HTR, 1, mock_status)
+        device.node_status_update(SmartboxNodeType.HTR, 1, mock_status)
         mock_node_1.update_status.assert_called_with(mock_status)
         mock_node_2.update_status.assert_not_called()
 
         mock_node_1.reset_mock()
         mock_node_2.reset_mock()
-        device._node_status_update(SmartboxNodeType.ACM, 2, mock_status)
+        device.node_status_update(SmartboxNodeType.ACM, 2, mock_status)
         mock_node_2.update_status.assert_called_with(mock_status)
         mock_node_1.update_status.assert_not_called()
 
         mock_node_1.reset_mock()
         mock_node_2.reset_mock()
-        device._node_status_update(SmartboxNodeType.PMO, 3, mock_status)
+        device.node_status_update(SmartboxNodeType.PMO, 3, mock_status)
         mock_node_3.update_status.assert_not_called()
         mock_node_1.update_status.assert_not_called()
         mock_node_2.update_status.assert_not_called()
@@ -130,7 +346,7 @@ async def test_smartbox_device_node_status_update(hass, caplog):
         # test unknown node
         mock_node_1.reset_mock()
         mock_node_2.reset_mock()
-        device._node_status_update(SmartboxNodeType.HTR, 3, mock_status)
+        device.node_status_update(SmartboxNodeType.HTR, 3, mock_status)
         mock_node_1.update_status.assert_not_called()
         mock_node_2.update_status.assert_not_called()
         assert_log_message(
@@ -159,20 +375,20 @@ async def test_smartbox_device_node_setup_update(hass, caplog):
         }
 
         mock_setup = {"foo": "bar"}
-        device._node_setup_update(SmartboxNodeType.HTR, 1, mock_setup)
+        device.node_setup_update(SmartboxNodeType.HTR, 1, mock_setup)
         mock_node_1.update_setup.assert_called_with(mock_setup)
         mock_node_2.update_setup.assert_not_called()
 
         mock_node_1.reset_mock()
         mock_node_2.reset_mock()
-        device._node_setup_update(SmartboxNodeType.ACM, 2, mock_setup)
+        device.node_setup_update(SmartboxNodeType.ACM, 2, mock_setup)
         mock_node_2.update_setup.assert_called_with(mock_setup)
         mock_node_1.update_setup.assert_not_called()
 
         # test unknown node
         mock_node_1.reset_mock()
         mock_node_2.reset_mock()
-        device._node_setup_update(SmartboxNodeType.HTR, 3, mock_setup)
+        device.node_setup_update(SmartboxNodeType.HTR, 3, mock_setup)
         mock_node_1.update_setup.assert_not_called()
         mock_node_2.update_setup.assert_not_called()
         assert_log_message(
@@ -188,6 +404,10 @@ async def test_smartbox_node(hass):
     mock_device = AsyncMock()
     mock_device.dev_id = dev_id
     mock_device.away = False
+    mock_device.skip_command = MagicMock(return_value=False)
+    mock_device.subscribers = MagicMock()
+    mock_device.command_metrics = CommandMetrics()
+    mock_device.hass = hass
     node_addr = 3
     node_type = SmartboxNodeType.HTR
     node_name = "Bathroom Heater"
@@ -216,8 +436,9 @@ async def test_smartbox_node(hass):
 
     assert node.status == initial_status
     new_status = {"mtemp": "21.6", "stemp": "22.5"}
-    node.update_status(new_status)
+    assert node.update_status(new_status) == {"mtemp"}
     assert node.status == new_status
+    assert node.update_status({"mtemp": "21.6"}) == set()
 
     await node.set_status(stemp=23.5)
     mock_session.set_node_status.assert_called_with(dev_id, node_info, {"stemp": 23.5})
@@ -246,6 +467,13 @@ async def test_smartbox_node(hass):
         node.true_radiant
 
 
+def test_changed_fields():
+    current = {"mtemp": "21.4", "duty": 10}
+    assert changed_fields(current, {"duty": 10}) == set()
+    assert changed_fields(current, {"duty": 20, "power": 0}) == {"duty", "power"}
+    assert changed_fields(current, {"duty": 10}, merge=False) == {"mtemp"}
+
+
 def test_get_target_temperature():
     assert get_target_temperature(SmartboxNodeType.HTR, {"stemp": "22.5"}) == 22.5
     assert get_target_temperature(SmartboxNodeType.ACM, {"stemp": "12.6"}) == 12.6
@@ -724,3 +952,635 @@ async def test_remaining_boost_time(hass):
     boost_end_datetime = today.replace(hour=0, minute=30).astimezone(tz.tzlocal())
     expected_remaining_time = (boost_end_datetime - today).total_seconds()
     assert node.remaining_boost_time == expected_remaining_time
+
+
+async def test_initialise_devices_concurrently(hass, caplog):
+    """Devices are initialised in parallel, bounded, and failures are isolated."""
+    mock_session = AsyncMock()
+    mock_session.get_homes.return_value = deepcopy(MOCK_SMARTBOX_HOME_INFO)
+    session_devices = await get_session_devices(mock_session)
+    running = 0
+    max_running = 0
+
+    async def initialise_nodes(device, session, hass):
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0)
+        running -= 1
+        if device["dev_id"] == "device_1":
+            msg = "boom"
+            raise SmartboxError(msg)
+        return device["dev_id"]
+
+    with patch(
+        "custom_components.smartbox.models.SmartboxDevice.initialise_nodes",
+        side_effect=initialise_nodes,
+    ):
+        devices = []
+        failures = await initialise_devices(
+            session_devices,
+            mock_session,
+            hass,
+            max_concurrency=2,
+            on_device=devices.append,
+        )
+        assert devices == ["device_2"]
+        assert [(device["dev_id"], type(error)) for device, error in failures] == [
+            ("device_1", SmartboxError)
+        ]
+        assert max_running == 2
+        assert_log_message(
+            caplog,
+            "custom_components.smartbox.models",
+            logging.ERROR,
+            "Failed to initialise device device_1: boom",
+        )
+
+        max_running = 0
+        await initialise_devices(session_devices, mock_session, hass, max_concurrency=1)
+        assert max_running == 1
+
+    with patch(
+        "custom_components.smartbox.models.SmartboxDevice.initialise_nodes",
+        side_effect=SmartboxError,
+    ):
+        failures = await initialise_devices(session_devices, mock_session, hass)
+    assert [device for device, _ in failures] == session_devices
+
+
+async def test_initialise_nodes(hass):
+    """Device level calls are made once and nodes are created concurrently."""
+    dev_id = "device_1"
+    mock_session = AsyncMock()
+    node_infos = [
+        {"addr": 0, "name": "Heater", "type": SmartboxNodeType.HTR},
+        {"addr": 1, "name": "Monitor", "type": SmartboxNodeType.PMO},
+        {"addr": 2, "name": "Storage", "type": SmartboxNodeType.ACM},
+    ]
+    mock_session.get_nodes.return_value = node_infos
+    mock_session.get_device_connected.return_value = {"connected": True}
+    mock_session.get_device_away_status.return_value = {"away": True}
+    mock_session.get_device_power_limit.return_value = 1000
+    mock_session.get_node_status.return_value = {"mtemp": "21.4"}
+    mock_session.get_node_setup.return_value = {}
+    mock_session.get_node_samples.return_value = {"samples": []}
+
+    device = await SmartboxDevice.initialise_nodes(
+        MOCK_SMARTBOX_DEVICE_INFO[dev_id], mock_session, hass
+    )
+
+    assert device.connected is True
+    assert device.away is True
+    assert device.power_limit == 1000
+    mock_session.get_device_away_status.assert_awaited_once_with(dev_id)
+    mock_session.get_device_connected.assert_awaited_once_with(dev_id)
+    # once for the device, once for the PMO node status
+    assert mock_session.get_device_power_limit.await_count == 2
+    assert mock_session.get_node_status.await_count == 2
+    assert mock_session.get_node_setup.await_count == 3
+    assert list(device._nodes) == [
+        (SmartboxNodeType.HTR, 0),
+        (SmartboxNodeType.PMO, 1),
+        (SmartboxNodeType.ACM, 2),
+    ]
+    assert device._nodes[(SmartboxNodeType.PMO, 1)].status["power"] == 1000
+
+
+def test_update_subscribers():
+    subscribers = UpdateSubscribers()
+    callback_1 = MagicMock()
+    callback_2 = MagicMock()
+    key = (SmartboxNodeType.HTR, 1, "status")
+    unsubscribe_1 = subscribers.subscribe(key, callback_1)
+    subscribers.subscribe(key, callback_2)
+    subscribers.subscribe((None, None, "away_status"), callback_2)
+
+    subscribers.notify(key, {"mtemp": "21.4"}, {"mtemp"})
+    callback_1.assert_called_once_with({"mtemp": "21.4"}, {"mtemp"})
+    callback_2.assert_called_once_with({"mtemp": "21.4"}, {"mtemp"})
+
+    unsubscribe_1()
+    subscribers.notify((None, None, "away_status"), {"away": True})
+    subscribers.notify(key, {"mtemp": "21.6"}, {"mtemp"})
+    callback_1.assert_called_once()
+    assert callback_2.call_count == 3
+    # nothing subscribed to a setup update
+    subscribers.notify((SmartboxNodeType.HTR, 1, "setup"), {}, set())
+
+
+async def test_node_subscribe(hass):
+    """Device updates reach the entities of every node of the device."""
+    device = SmartboxDevice(MOCK_SMARTBOX_DEVICE_INFO["device_1"], MagicMock(), hass)
+    nodes = [
+        SmartboxNode(
+            device, {"addr": addr, "name": "Heater", "type": "htr"}, MagicMock(), {}, {}
+        )
+        for addr in (1, 2)
+    ]
+    device._nodes = {(node.node_type, node.addr): node for node in nodes}
+    away_callbacks = [MagicMock(), MagicMock()]
+    status_callbacks = [MagicMock(), MagicMock()]
+    for node, away_callback, status_callback in zip(
+        nodes, away_callbacks, status_callbacks, strict=True
+    ):
+        node.subscribe("away_status", away_callback)
+        node.subscribe("status", status_callback)
+
+    device.away_status_update({"away": True})
+    for away_callback in away_callbacks:
+        away_callback.assert_called_once_with(device.away)
+
+    device.node_status_update("htr", 2, {"mtemp": "21.4"})
+    status_callbacks[0].assert_not_called()
+    status_callbacks[1].assert_called_once_with({"mtemp": "21.4"}, {"mtemp"})
+
+
+async def test_update_hub(hass):
+    """Devices with the same dev_id share a socket, updates go to the last one."""
+    mock_session = MagicMock()
+    device_1 = MagicMock(dev_id="device_1")
+    device_1_again = MagicMock(dev_id="device_1")
+    device_2 = MagicMock(dev_id="device_2")
+    with patch(
+        "custom_components.smartbox.models.UpdateManager", autospec=True
+    ) as mock_update_manager:
+        hub = SmartboxUpdateHub(mock_session, hass)
+        hub.add_device(device_1)
+        hub.add_device(device_2)
+        hub.add_device(device_1_again)
+        await hass.async_block_till_done()
+
+        assert hub.dev_ids == ["device_1", "device_2"]
+        assert mock_update_manager.call_count == 2
+        assert mock_update_manager.return_value.run.call_count == 2
+        mock_update_manager.assert_any_call(mock_session, "device_1")
+
+        update_manager = mock_update_manager.return_value
+        away = update_manager.subscribe_to_device_away_status.call_args_list[0]
+        away.args[0]({"away": True})
+        device_1.away_status_update.assert_not_called()
+        device_1_again.away_status_update.assert_called_once_with({"away": True})
+        update_manager.subscribe_to_node_status.call_args_list[1].args[0](
+            SmartboxNodeType.HTR, 1, {"mtemp": "21.4"}
+        )
+        device_2.node_status_update.assert_called_once_with(
+            SmartboxNodeType.HTR, 1, {"mtemp": "21.4"}
+        )
+
+        await hub.async_stop()
+        assert update_manager.cancel.await_count == 2
+        assert hub.dev_ids == []
+
+
+async def test_update_hub_polls_when_socket_down(hass):
+    """A device is polled while its socket is down, and stale without updates."""
+    dev_id = "device_1"
+    mock_session = AsyncMock()
+    mock_session.get_node_status.return_value = {"mtemp": "19.0"}
+    device = SmartboxDevice(MOCK_SMARTBOX_DEVICE_INFO[dev_id], mock_session, hass)
+    node = SmartboxNode(
+        device,
+        {"addr": 1, "name": "Heater", "type": SmartboxNodeType.HTR},
+        mock_session,
+        {"mtemp": "21.4"},
+        {},
+    )
+    device._nodes = {(node.node_type, node.addr): node}
+    stale_subscriber = MagicMock()
+    node.subscribe("stale", stale_subscriber)
+    with patch(
+        "custom_components.smartbox.models.UpdateManager", autospec=True
+    ) as mock_update_manager:
+        update_manager = mock_update_manager.return_value
+        hub = SmartboxUpdateHub(mock_session, hass)
+        hub.stale_after = 10
+        hub.add_device(device)
+
+        # the socket is connected, nothing is polled
+        hub._async_check_sockets()
+        assert hub.polled_dev_ids == []
+
+        # the socket is down, the node status is polled
+        update_manager.socket_session.namespace.connected = False
+        hub._async_check_sockets()
+        for _ in range(3):
+            await asyncio.sleep(0)
+        assert hub.polled_dev_ids == [dev_id]
+        mock_session.get_node_status.assert_awaited_once_with(dev_id, node.node_info)
+        assert node.status["mtemp"] == "19.0"
+        stale_subscriber.assert_not_called()
+
+        # nothing received for too long
+        device.last_seen -= 60
+        hub._async_check_sockets()
+        assert device.stale
+        assert stale_subscriber.call_args_list == [call(device.stale)]
+
+        # the socket is back and sends an update
+        update_manager.socket_session.namespace.connected = True
+        update_manager.subscribe_to_node_status.call_args.args[0](
+            SmartboxNodeType.HTR, 1, {"mtemp": "20.0"}
+        )
+        hub._async_check_sockets()
+        assert hub.polled_dev_ids == []
+        assert not device.stale
+        assert node.status["mtemp"] == "20.0"
+
+        await hub.async_stop()
+
+
+async def test_update_hub_resyncs_on_reconnect(hass):
+    """A reconnection without a snapshot fetches the nodes of the device.
+
+    Only the changed nodes dispatch.
+    """
+    dev_id = "device_1"
+    mock_session = AsyncMock()
+    device = SmartboxDevice(MOCK_SMARTBOX_DEVICE_INFO[dev_id], mock_session, hass)
+    nodes = [
+        SmartboxNode(
+            device,
+            {"addr": addr, "name": f"Heater {addr}", "type": SmartboxNodeType.HTR},
+            mock_session,
+            {"mtemp": "21.4"},
+            {"window_mode_enabled": False},
+        )
+        for addr in (1, 2)
+    ]
+    device._nodes = {(node.node_type, node.addr): node for node in nodes}
+    mock_session.get_node_status.side_effect = lambda _, node_info: {
+        "mtemp": "19.0" if node_info["addr"] == 1 else "21.4"
+    }
+    mock_session.get_node_setup.return_value = {"window_mode_enabled": False}
+    with patch(
+        "custom_components.smartbox.models.UpdateManager", autospec=True
+    ) as mock_update_manager:
+        update_manager = mock_update_manager.return_value
+        namespace = update_manager.socket_session.namespace
+        on_connect = namespace.on_connect = AsyncMock()
+        hub = SmartboxUpdateHub(mock_session, hass)
+        hub.add_device(device)
+        dev_data = update_manager.subscribe_to_dev_data.call_args.args[1]
+
+        # the first connection is not resynced
+        await namespace.on_connect()
+        dev_data([])
+        hub._async_check_sockets()
+        await hass.async_block_till_done(wait_background_tasks=True)
+
+        # the snapshot sent on a reconnection needs no resync
+        await namespace.on_connect()
+        dev_data([])
+        hub._async_check_sockets()
+        await hass.async_block_till_done(wait_background_tasks=True)
+        mock_session.get_node_status.assert_not_called()
+        assert device.metrics.reconnects == 1
+
+        # a reconnection of the namespace alone is resynced by the next check
+        await namespace.on_connect()
+        await hass.async_block_till_done(wait_background_tasks=True)
+        mock_session.get_node_status.assert_not_called()
+        with patch.object(device.subscribers, "notify") as mock_notify:
+            hub._async_check_sockets()
+            await hass.async_block_till_done(wait_background_tasks=True)
+        assert on_connect.await_count == 3
+        assert mock_session.get_node_status.await_count == 2
+        assert mock_session.get_node_setup.await_count == 2
+        assert mock_notify.call_args_list == [
+            call((SmartboxNodeType.HTR, 1, "status"), {"mtemp": "19.0"}, {"mtemp"})
+        ]
+        assert nodes[0].status["mtemp"] == "19.0"
+        assert device.metrics.reconnects == 2
+
+        # once only
+        hub._async_check_sockets()
+        await hass.async_block_till_done(wait_background_tasks=True)
+        assert mock_session.get_node_status.await_count == 2
+
+        await hub.async_stop()
+
+
+async def test_update_hub_metrics(hass):
+    """The socket messages of a device are counted by event."""
+    dev_id = "device_1"
+    mock_session = AsyncMock()
+    device = SmartboxDevice(MOCK_SMARTBOX_DEVICE_INFO[dev_id], mock_session, hass)
+    node = SmartboxNode(
+        device,
+        {"addr": 1, "name": "Heater", "type": SmartboxNodeType.HTR},
+        mock_session,
+        {"mtemp": "21.4"},
+        {},
+    )
+    device._nodes = {(node.node_type, node.addr): node}
+    with patch(
+        "custom_components.smartbox.models.UpdateManager", autospec=True
+    ) as mock_update_manager:
+        update_manager = mock_update_manager.return_value
+        update_manager.socket_session.namespace.on_connect = AsyncMock()
+        hub = SmartboxUpdateHub(mock_session, hass)
+        hub.add_device(device)
+        node_status = update_manager.subscribe_to_node_status.call_args.args[0]
+        for mtemp in ("19.0", "19.0", "20.0"):
+            node_status(SmartboxNodeType.HTR, 1, {"mtemp": mtemp})
+        update_manager.subscribe_to_device_away_status.call_args.args[0](
+            {"away": False}
+        )
+        namespace = update_manager.socket_session.namespace
+        await namespace.on_connect()
+        await namespace.on_connect()
+        await hass.async_block_till_done()
+        await hub.async_stop()
+
+    metrics = device.metrics.as_dict()
+    assert metrics["messages"] == {"status": 3, "away_status": 1}
+    assert metrics["rates"] == {"status": 0.05, "away_status": 0.017}
+    assert metrics["duplicates"] == 1
+    assert metrics["noops"] == 2
+    assert metrics["reconnects"] == 1
+    assert device.metrics.rate == 0.067
+
+
+def test_update_metrics_latency():
+    metrics = UpdateMetrics()
+    assert metrics.mean_latency is None
+    for seconds in (0.0005, 0.003, 0.0035, 2):
+        metrics.record_latency(seconds)
+    assert metrics.mean_latency == 501.75
+    assert metrics.as_dict()["latency_histogram_ms"] == {
+        "1": 1,
+        "5": 2,
+        "10": 0,
+        "50": 0,
+        "100": 0,
+        "500": 0,
+        "1000": 0,
+        "inf": 1,
+    }
+
+
+async def test_update_hub_command_metrics(hass):
+    """Commands are timed to their acknowledgement and socket confirmation."""
+    mock_session = AsyncMock()
+    device = SmartboxDevice(MOCK_SMARTBOX_DEVICE_INFO["device_1"], mock_session, hass)
+    node = SmartboxNode(
+        device,
+        {"addr": 1, "name": "Heater", "type": SmartboxNodeType.HTR},
+        mock_session,
+        {"mtemp": "21.4", "stemp": "21.0", "units": "C", "mode": "auto"},
+        {},
+    )
+    device._nodes = {(node.node_type, node.addr): node}
+    metrics = device.command_metrics
+    assert metrics.mean_ack is None
+    assert metrics.mean_round_trip is None
+    with patch(
+        "custom_components.smartbox.models.UpdateManager", autospec=True
+    ) as mock_update_manager:
+        update_manager = mock_update_manager.return_value
+        hub = SmartboxUpdateHub(mock_session, hass)
+        hub.add_device(device)
+        node_status = update_manager.subscribe_to_node_status.call_args.args[0]
+        away_status = update_manager.subscribe_to_device_away_status.call_args.args[0]
+
+        await node.set_status(stemp="22.0", units="C")
+        await device.set_away_status(away=True)
+        assert metrics.pending == 2
+        # an update predating the command doesn't confirm it, though it
+        # reports the units sent along
+        node_status(
+            SmartboxNodeType.HTR, 1, {"mtemp": "21.5", "stemp": "21.0", "units": "C"}
+        )
+        assert metrics.pending == 2
+        node_status(SmartboxNodeType.HTR, 1, {"mtemp": "21.4", "stemp": "22.0"})
+        away_status({"away": True})
+        assert metrics.pending == 0
+
+        # all the changed values must be reported
+        await node.set_status(stemp="20.0", mode="manual")
+        node_status(SmartboxNodeType.HTR, 1, {"stemp": "20.0", "mode": "auto"})
+        assert metrics.pending == 1
+        node_status(SmartboxNodeType.HTR, 1, {"stemp": "20.0", "mode": "manual"})
+        assert metrics.pending == 0
+
+        mock_session.set_device_power_limit.side_effect = SmartboxError
+        with pytest.raises(SmartboxError):
+            await device.set_power_limit(100)
+
+        with patch("custom_components.smartbox.models.OPTIMISTIC_CONFIRM_TIMEOUT", -1):
+            await node.set_status(stemp="23.0")
+            assert metrics.pending == 0
+        await hub.async_stop()
+
+    assert metrics.as_dict() | {"mean_ack_ms": None, "mean_round_trip_ms": None} == {
+        "sent": 5,
+        "failed": 1,
+        "confirmed": 3,
+        "unconfirmed": 1,
+        "pending": 0,
+        "mean_ack_ms": None,
+        "mean_round_trip_ms": None,
+        "ack_histogram_ms": {
+            "100": 4,
+            "250": 0,
+            "500": 0,
+            "1000": 0,
+            "2500": 0,
+            "5000": 0,
+            "10000": 0,
+            "inf": 0,
+        },
+        "round_trip_histogram_ms": {
+            "100": 3,
+            "250": 0,
+            "500": 0,
+            "1000": 0,
+            "2500": 0,
+            "5000": 0,
+            "10000": 0,
+            "inf": 0,
+        },
+    }
+    assert metrics.mean_ack is not None
+    assert metrics.mean_round_trip is not None
+
+
+async def test_command_ack_excludes_merge_window(hass):
+    """The acknowledgement is the API call only, not the merge window."""
+    mock_session = AsyncMock()
+    device = SmartboxDevice(MOCK_SMARTBOX_DEVICE_INFO["device_1"], mock_session, hass)
+    node = SmartboxNode(
+        device,
+        {"addr": 1, "name": "Heater", "type": SmartboxNodeType.HTR},
+        mock_session,
+        {"stemp": "21.0"},
+        {},
+    )
+    with patch("custom_components.smartbox.models.WRITE_MERGE_WINDOW", 0.2):
+        await node.set_status(stemp="22.0")
+    assert device.command_metrics.ack_histogram[100] == 1
+    assert device.command_metrics.mean_ack < 100
+
+
+async def test_update_hub_reconciles_nodes_in_turn(hass):
+    """One node is reconciled at a time, skipping devices sent a command."""
+    mock_session = AsyncMock()
+    mock_session.get_node_status.return_value = {"mtemp": "19.0"}
+    mock_session.get_node_setup.return_value = {}
+    devices = {}
+    for dev_id in ("device_1", "device_2"):
+        device = SmartboxDevice(MOCK_SMARTBOX_DEVICE_INFO[dev_id], mock_session, hass)
+        device._nodes = {
+            (SmartboxNodeType.HTR, addr): SmartboxNode(
+                device,
+                {"addr": addr, "name": f"Heater {addr}", "type": SmartboxNodeType.HTR},
+                mock_session,
+                {"mtemp": "19.0"},
+                {},
+            )
+            for addr in (1, 2)
+        }
+        devices[dev_id] = device
+    with patch("custom_components.smartbox.models.UpdateManager", autospec=True):
+        hub = SmartboxUpdateHub(mock_session, hass)
+        for device in devices.values():
+            hub.add_device(device)
+
+        reconciled = []
+        for _ in range(4):
+            hub._async_reconcile_next()
+            # nothing else is fetched while a node is being reconciled
+            hub._async_reconcile_next()
+            await hass.async_block_till_done(wait_background_tasks=True)
+            reconciled.append(mock_session.get_node_status.call_args.args)
+        assert [(dev_id, node["addr"]) for dev_id, node in reconciled] == [
+            ("device_1", 1),
+            ("device_2", 1),
+            ("device_1", 2),
+            ("device_2", 2),
+        ]
+
+        # a node that drifted is corrected, a device sent a command is skipped
+        mock_session.get_node_status.reset_mock()
+        mock_session.get_node_status.return_value = {"mtemp": "21.0"}
+        await devices["device_2"].set_away_status(away=True)
+        with patch.object(devices["device_1"].subscribers, "notify") as mock_notify:
+            hub._async_reconcile_next()
+            await hass.async_block_till_done(wait_background_tasks=True)
+        mock_session.get_node_status.assert_awaited_once()
+        assert mock_session.get_node_status.call_args.args[0] == "device_1"
+        mock_notify.assert_called_once_with(
+            (SmartboxNodeType.HTR, 1, "status"), {"mtemp": "21.0"}, {"mtemp"}
+        )
+
+        await hub.async_stop()
+
+
+async def test_snapshot_and_reconcile(hass):
+    """Devices restored from a snapshot only dispatch what changed."""
+    dev_id = "device_1"
+    mock_session = AsyncMock()
+    node_info = {"addr": 0, "name": "Heater", "type": SmartboxNodeType.HTR}
+    snapshot = {
+        "devices": [
+            {
+                "device": MOCK_SMARTBOX_DEVICE_INFO[dev_id],
+                "connected": True,
+                "away": False,
+                "power_limit": 0,
+                "nodes": [
+                    {
+                        "node_info": node_info,
+                        "status": {"mtemp": "21.4", "stemp": "22.5"},
+                        "setup": {"window_mode_enabled": False},
+                    }
+                ],
+            }
+        ]
+    }
+    devices = devices_from_snapshot(snapshot, mock_session, hass)
+    mock_session.get_nodes.assert_not_called()
+    assert devices_snapshot(devices) == snapshot
+    device = devices[0]
+    node = next(iter(device.get_nodes()))
+    assert node.status["mtemp"] == "21.4"
+    # the restored state is not fresh, a command matching it is sent
+    await device.set_away_status(away=False)
+    mock_session.set_device_away_status.assert_awaited_once()
+
+    mock_session.get_homes.return_value = [{"devs": [{"dev_id": dev_id}]}]
+    mock_session.get_nodes.return_value = [node_info]
+    mock_session.get_device_connected.return_value = {"connected": True}
+    mock_session.get_device_away_status.return_value = {"away": True}
+    mock_session.get_node_status.return_value = {"mtemp": "19.0", "stemp": "22.5"}
+    mock_session.get_node_setup.return_value = {"window_mode_enabled": False}
+    with patch.object(device.subscribers, "notify") as mock_notify:
+        assert await reconcile_devices(devices, mock_session)
+        updates = [call.args[0] for call in mock_notify.call_args_list]
+    assert updates == [
+        (None, None, "away_status"),
+        (SmartboxNodeType.HTR, 0, "status"),
+    ]
+    assert device.away
+    assert node.status["mtemp"] == "19.0"
+    assert mock_notify.call_args_list[1].args[2] == {"mtemp"}
+    # until reconciled
+    await device.set_away_status(away=True)
+    mock_session.set_device_away_status.assert_awaited_once()
+
+    # a new node means the snapshot can't be trusted anymore
+    mock_session.get_nodes.return_value = [
+        node_info,
+        {"addr": 1, "name": "Other", "type": SmartboxNodeType.HTR},
+    ]
+    assert not await reconcile_devices(devices, mock_session)
+
+    # as well as a new device
+    mock_session.get_homes.return_value = [
+        {"devs": [{"dev_id": dev_id}, {"dev_id": "device_2"}]}
+    ]
+    assert not await reconcile_devices(devices, mock_session)
+
+
+async def test_lazy_samples(hass):
+    dev_id = "test_device_id_1"
+    mock_device = AsyncMock()
+    mock_device.dev_id = dev_id
+    mock_device.hass = hass
+    node_info = {"addr": 3, "name": "Bathroom Heater", "type": SmartboxNodeType.HTR}
+    mock_session = AsyncMock()
+    mock_session.get_node_samples.return_value = {
+        "samples": [{"counter": 100}, {"counter": 200}, {"counter": 300}]
+    }
+
+    node = SmartboxNode(mock_device, node_info, mock_session, {}, {})
+    # Reading the energy loads nothing, the sensor loads the samples
+    assert node.total_energy is None
+    await hass.async_block_till_done(wait_background_tasks=True)
+    mock_session.get_node_samples.assert_not_called()
+    results = await asyncio.gather(node.async_load_samples(), node.async_load_samples())
+    assert results == [[{"counter": 200}, {"counter": 300}]] * 2
+    mock_session.get_node_samples.assert_awaited_once()
+    assert node.total_energy == 300
+
+    # Memoised afterwards
+    await node.async_load_samples()
+    mock_session.get_node_samples.assert_awaited_once()
+
+    # Up to date samples fetched for the statistics are reused
+    node = SmartboxNode(mock_device, node_info, mock_session, {}, {})
+    await node.get_samples(0, int(time.time() + 3600))
+    assert node.total_energy == 300
+    await node.async_load_samples()
+    assert mock_session.get_node_samples.await_count == 2
+
+    # Failures are logged and retried later
+    node = SmartboxNode(mock_device, node_info, mock_session, {}, {})
+    mock_session.get_node_samples.side_effect = SmartboxError
+    assert await node.async_load_samples() is None
+    assert node.total_energy is None
+    assert node.total_energy is None
+    assert mock_session.get_node_samples.await_count == 3
+    mock_session.get_node_samples.side_effect = None
+    assert await node.async_load_samples() == [{"counter": 200}, {"counter": 300}]
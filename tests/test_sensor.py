@@ -1,24 +1,39 @@
-from datetime import datetime
+import asyncio
+from datetime import datetime, timedelta
 import logging
 import time
 from unittest.mock import AsyncMock, patch
 
 from dateutil import tz
+from homeassistant.components.binary_sensor import DOMAIN as BINARY_SENSOR_DOMAIN
 from homeassistant.components.sensor import DOMAIN as SENSOR_DOMAIN
 from homeassistant.const import ATTR_FRIENDLY_NAME, ATTR_LOCKED, STATE_UNAVAILABLE
 from homeassistant.helpers.entity_component import async_update_entity
+from homeassistant.util import dt
 import pytest
-from pytest_homeassistant_custom_component.common import MockConfigEntry
+from pytest_homeassistant_custom_component.common import (
+    MockConfigEntry,
+    async_fire_time_changed,
+)
 
 from custom_components.smartbox.const import (
     CONF_HISTORY_CONSUMPTION,
+    CONF_STATE_WRITE_WINDOW,
+    CONF_TIMEDELTA_POWER,
     DOMAIN,
     HistoryConsumptionStatus,
     SmartboxNodeType,
 )
+from custom_components.smartbox.models import UpdateMetrics
 from custom_components.smartbox.sensor import (
     BoostEndTimeSensor,
+    CommandAckLatencySensor,
+    CommandRoundTripSensor,
+    DispatchLatencySensor,
+    DutyCycleSensor,
     PowerSensor,
+    SocketMessageRateSensor,
+    TemperatureSensor,
     TotalConsumptionSensor,
 )
 
@@ -300,6 +315,9 @@ async def test_basic_charge_level(hass, mock_smartbox, recorder_mock, config_ent
 
 @pytest.mark.asyncio
 async def test_update_statistics_start(hass, mock_smartbox, config_entry):
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+
     mock_node = AsyncMock()
     mock_node.get_samples.return_value = [{"t": 1739966400, "counter": 100}]
     sensor = TotalConsumptionSensor(mock_node, config_entry)
@@ -332,13 +350,6 @@ async def test_update_statistics_start(hass, mock_smartbox, config_entry):
 
 
 async def test_update_statistics_auto(hass, mock_smartbox, config_entry):
-    assert await hass.config_entries.async_setup(config_entry.entry_id)
-    await hass.async_block_till_done()
-
-    mock_node = AsyncMock()
-    mock_node.get_samples.return_value = [{"t": 1739966400, "counter": 100}]
-    sensor = TotalConsumptionSensor(mock_node, config_entry)
-    sensor.hass = hass
     hass.config_entries.async_update_entry(
         entry=config_entry,
         options={
@@ -346,6 +357,13 @@ async def test_update_statistics_auto(hass, mock_smartbox, config_entry):
             CONF_HISTORY_CONSUMPTION: HistoryConsumptionStatus.AUTO,
         },
     )
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+
+    mock_node = AsyncMock()
+    mock_node.get_samples.return_value = [{"t": 1739966400, "counter": 100}]
+    sensor = TotalConsumptionSensor(mock_node, config_entry)
+    sensor.hass = hass
 
     with patch(
         "custom_components.smartbox.sensor.async_import_statistics"
@@ -358,6 +376,9 @@ async def test_update_statistics_auto(hass, mock_smartbox, config_entry):
 
 @pytest.mark.asyncio
 async def test_update_statistics_off(hass, mock_smartbox, config_entry):
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+
     mock_node = AsyncMock()
     mock_node.get_samples = AsyncMock(return_value=[{"t": time.time(), "counter": 100}])
     sensor = TotalConsumptionSensor(mock_node, config_entry)
@@ -408,6 +429,101 @@ async def test_async_update_pmo_non_pmo_node(hass, mock_smartbox, config_entry):
         mock_write_ha_state.assert_not_called()
 
 
+async def test_pmo_power_interval_applied_in_place(hass, mock_smartbox, config_entry):
+    mock_node = AsyncMock()
+    mock_node.node_type = SmartboxNodeType.PMO
+    sensor = PowerSensor(mock_node, config_entry)
+    sensor.hass = hass
+    sensor._attr_name = "Power"
+
+    with patch(
+        "custom_components.smartbox.sensor.async_track_time_interval"
+    ) as mock_track:
+        sensor._async_track_pmo_power()
+        hass.config_entries.async_update_entry(
+            config_entry,
+            options={**config_entry.options, CONF_TIMEDELTA_POWER: 30},
+        )
+        sensor._async_options_updated({CONF_TIMEDELTA_POWER})
+
+        assert mock_track.call_count == 2
+        mock_track.return_value.assert_called_once()
+        assert mock_track.call_args.args[2] == timedelta(seconds=30)
+
+
+async def test_history_imported_by_all_devices(hass, mock_smartbox, config_entry):
+    """The devices set up after the first import still import the history."""
+    hass.config_entries.async_update_entry(
+        config_entry,
+        options={
+            **config_entry.options,
+            CONF_HISTORY_CONSUMPTION: HistoryConsumptionStatus.START,
+        },
+    )
+    get_nodes = mock_smartbox.session.get_nodes.side_effect
+    device_1_imported = asyncio.Event()
+
+    async def slow_get_nodes(dev_id):
+        if dev_id == "device_2":
+            await device_1_imported.wait()
+        return get_nodes(dev_id)
+
+    def _update_entry(*args, **kwargs):
+        device_1_imported.set()
+        return update_entry(*args, **kwargs)
+
+    update_entry = hass.config_entries.async_update_entry
+    mock_smartbox.session.get_nodes.side_effect = slow_get_nodes
+    with patch.object(
+        hass.config_entries, "async_update_entry", side_effect=_update_entry
+    ):
+        assert await hass.config_entries.async_setup(config_entry.entry_id)
+        async with asyncio.timeout(5):
+            await hass.async_block_till_done()
+    runtime_data = config_entry.runtime_data
+    assert {device.dev_id for device in runtime_data.devices} == {
+        "device_1",
+        "device_2",
+    }
+    assert runtime_data.history_imported == {
+        node.node_id for node in runtime_data.nodes
+    }
+    assert (
+        config_entry.options[CONF_HISTORY_CONSUMPTION] == HistoryConsumptionStatus.AUTO
+    )
+
+
+async def test_history_import_applied_in_place(hass, mock_smartbox, config_entry):
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+
+    sensor = TotalConsumptionSensor(AsyncMock(), config_entry)
+    sensor.hass = hass
+    sensor._attr_name = "Total consumption"
+
+    with patch.object(sensor, "update_statistics") as mock_update_statistics:
+        hass.config_entries.async_update_entry(
+            config_entry,
+            options={
+                **config_entry.options,
+                CONF_HISTORY_CONSUMPTION: HistoryConsumptionStatus.AUTO,
+            },
+        )
+        sensor._async_options_updated({CONF_HISTORY_CONSUMPTION})
+        mock_update_statistics.assert_not_called()
+
+        hass.config_entries.async_update_entry(
+            config_entry,
+            options={
+                **config_entry.options,
+                CONF_HISTORY_CONSUMPTION: HistoryConsumptionStatus.START,
+            },
+        )
+        sensor._async_options_updated({CONF_HISTORY_CONSUMPTION})
+        await hass.async_block_till_done()
+        mock_update_statistics.assert_called_once()
+
+
 @pytest.mark.asyncio
 async def test_adjust_short_term_statistics(hass, mock_smartbox, config_entry):
     mock_node = AsyncMock()
@@ -502,3 +618,131 @@ async def test_native_value_boost_end_time_sensor(hass, mock_smartbox, config_en
         # Test no boost
         mock_node.boost = False
         assert sensor.native_value is None
+
+
+async def test_update_only_for_used_fields(hass, mock_smartbox, config_entry):
+    mock_node = AsyncMock()
+    duty_sensor = DutyCycleSensor(mock_node, config_entry)
+    temperature_sensor = TemperatureSensor(mock_node, config_entry)
+
+    with (
+        patch.object(duty_sensor, "_async_schedule_write") as mock_duty_write,
+        patch.object(
+            temperature_sensor, "_async_schedule_write"
+        ) as mock_temperature_write,
+    ):
+        for sensor in (duty_sensor, temperature_sensor):
+            sensor._async_update({"duty": 50}, {"duty"})
+        mock_duty_write.assert_called_once()
+        mock_temperature_write.assert_not_called()
+
+        # the lock attribute is used by every sensor
+        for sensor in (duty_sensor, temperature_sensor):
+            sensor._async_update({"locked": True}, {"locked"})
+        assert mock_duty_write.call_count == 2
+        mock_temperature_write.assert_called_once()
+
+
+@pytest.mark.parametrize("window", [0, 100])
+async def test_state_writes_coalesced(hass, mock_smartbox, config_entry, window):
+    hass.config_entries.async_update_entry(
+        config_entry,
+        options={**config_entry.options, CONF_STATE_WRITE_WINDOW: window},
+    )
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+    state_writes = dict(config_entry.runtime_data.state_writes)
+    mock_node = AsyncMock()
+    mock_node.device.metrics = UpdateMetrics()
+    sensor = DutyCycleSensor(mock_node, config_entry)
+    sensor.hass = hass
+
+    with patch.object(sensor, "async_write_ha_state") as mock_write:
+        for duty in (10, 20, 30):
+            sensor._async_update({"duty": duty}, {"duty"})
+        mock_write.assert_not_called()
+        await hass.async_block_till_done()
+        async_fire_time_changed(hass, dt.utcnow() + timedelta(seconds=1))
+        await hass.async_block_till_done()
+        mock_write.assert_called_once()
+
+    assert config_entry.runtime_data.state_writes == {
+        "written": state_writes["written"] + 1,
+        "coalesced": state_writes["coalesced"] + 2,
+    }
+    assert sum(mock_node.device.metrics.latency_histogram.values()) == 1
+
+
+async def test_unavailable_when_stale(hass, mock_smartbox, config_entry):
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+    device = config_entry.runtime_data.devices[0]
+    mock_node = next(
+        mock_node
+        for mock_node in await mock_smartbox.session.get_nodes(device.dev_id)
+        if is_heater_node(mock_node)
+    )
+    entity_id = get_sensor_entity_id(mock_node, "temperature")
+    assert hass.states.get(entity_id).state != STATE_UNAVAILABLE
+    mock_device = next(
+        mock_device
+        for mock_device in mock_smartbox.get_devices()
+        if mock_device["dev_id"] == device.dev_id
+    )
+    connected_id = get_entity_id_from_unique_id(
+        hass,
+        BINARY_SENSOR_DOMAIN,
+        get_node_unique_id(mock_device, mock_node, "connected"),
+    )
+
+    device.set_stale(stale=True)
+    await hass.async_block_till_done()
+    assert hass.states.get(entity_id).state == STATE_UNAVAILABLE
+    # the connectivity and the socket metrics are still shown
+    assert hass.states.get(connected_id).state != STATE_UNAVAILABLE
+    assert SocketMessageRateSensor(device, config_entry).available
+
+    device.set_stale(stale=False)
+    await hass.async_block_till_done()
+    assert hass.states.get(entity_id).state != STATE_UNAVAILABLE
+
+
+async def test_socket_metrics_sensors(hass, mock_smartbox, config_entry):
+    assert await hass.config_entries.async_setup(config_entry.entry_id)
+    await hass.async_block_till_done()
+    for mock_device in mock_smartbox.get_devices():
+        mock_node = (await mock_smartbox.session.get_nodes(mock_device["dev_id"]))[0]
+        for key in (
+            "socket_message_rate",
+            "dispatch_latency",
+            "command_ack_latency",
+            "command_round_trip",
+        ):
+            entity_id = get_entity_id_from_unique_id(
+                hass, SENSOR_DOMAIN, get_node_unique_id(mock_device, mock_node, key)
+            )
+            # disabled by default
+            assert hass.states.get(entity_id) is None
+
+    device = config_entry.runtime_data.devices[0]
+    device.metrics.record_message("status", {"mtemp": "21.0"}, changed=True)
+    device.metrics.record_latency(0.002)
+    rate_sensor = SocketMessageRateSensor(device, config_entry)
+    assert rate_sensor.native_value == 0.017
+    assert rate_sensor.extra_state_attributes["messages"]["status"] >= 1
+    latency_sensor = DispatchLatencySensor(device, config_entry)
+    assert latency_sensor.native_value is not None
+    assert latency_sensor.extra_state_attributes["histogram"]["5"] >= 1
+
+    await device.command_metrics.async_track(asyncio.sleep(0), {("power_limit",): 500})
+    ack_sensor = CommandAckLatencySensor(device, config_entry)
+    assert ack_sensor.native_value is not None
+    assert ack_sensor.extra_state_attributes["histogram"]["100"] == 1
+    round_trip_sensor = CommandRoundTripSensor(device, config_entry)
+    assert round_trip_sensor.native_value is None
+    assert round_trip_sensor.extra_state_attributes["pending"] == 1
+    device.command_metrics.record_update("power_limit", (), 1000)
+    assert round_trip_sensor.native_value is None
+    device.command_metrics.record_update("power_limit", (), 500)
+    assert round_trip_sensor.native_value is not None
+    assert round_trip_sensor.extra_state_attributes["confirmed"] == 1